@@ -1,10 +1,167 @@
+from django import forms
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils.functional import cached_property
 
+from . import ledger
 from .models import *
 
-admin.site.register(Store)
-admin.site.register(Product)
-admin.site.register(Stock)
-admin.site.register(Supplier)
-admin.site.register(Sale)
-admin.site.register(Purchase)
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Pages a changelist without a ``COUNT(*)`` over the whole table.
+
+    Unfiltered lists use the database's estimate of the table size:
+    ``pg_class.reltuples`` on PostgreSQL, and on SQLite the highest primary
+    key, which is exact until rows are deleted. Filtered lists, and tables
+    estimated below ``exact_below`` rows, are counted.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+def estimated_count(queryset):
+    """An estimate of the number of rows in ``queryset``'s table, or None."""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table is first vacuumed or analyzed.
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite':
+        return queryset.model._default_manager.using(queryset.db).aggregate(last=Max('pk'))['last']
+    return None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class LowStockFilter(admin.SimpleListFilter):
+    title = 'stock level'
+    parameter_name = 'low'
+
+    def lookups(self, request, model_admin):
+        return [('1', 'At or below reorder level')]
+
+    def queryset(self, request, queryset):
+        # Served by the partial stock_low_idx index.
+        if self.value() == '1':
+            return queryset.filter(LOW_STOCK)
+        return queryset
+
+
+@admin.register(Store)
+class StoreAdmin(admin.ModelAdmin):
+    list_display = ('name', 'address')
+    search_fields = ('name',)
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('name', 'price')
+    search_fields = ('name',)
+
+
+@admin.register(Supplier)
+class SupplierAdmin(admin.ModelAdmin):
+    list_display = ('name', 'address')
+    search_fields = ('name',)
+
+
+class LedgerEntryAdmin(LargeTableAdmin):
+    """
+    Sales and purchases are added through ``inventory.ledger``, which records
+    the stock movement, costs it and updates alerts and summaries. The ledger
+    has no way to take one back, so they cannot be changed or deleted here;
+    corrections are new entries or stock adjustments.
+    """
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Stock)
+class StockAdmin(LargeTableAdmin):
+    list_display = ('product', 'store', 'quantity', 'reorder_level', 'cost_value')
+    list_select_related = ('product', 'store')
+    list_filter = ('store', LowStockFilter)
+    autocomplete_fields = ('store', 'product')
+    search_fields = ('product__name',)
+    readonly_fields = ('cost_value',)
+
+    # Written through the ledger, like the update stock form.
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if not change:
+                if obj.quantity:
+                    ledger.adjust_stock(obj.store, obj.product, obj.quantity)
+                stock, _ = Stock.objects.get_or_create(store=obj.store, product=obj.product, defaults={'quantity': 0})
+                obj.pk = stock.pk
+            stock = ledger.set_stock(obj.pk, obj.store, obj.product, obj.quantity, obj.reorder_level)
+        obj.cost_value = stock.cost_value
+
+    def delete_model(self, request, obj):
+        ledger.delete_stock(obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for pk in queryset.values_list('pk', flat=True):
+                ledger.delete_stock(pk)
+
+
+class SaleForm(forms.ModelForm):
+    def clean(self):
+        cleaned_data = super().clean()
+        store, product, quantity = (cleaned_data.get(field) for field in ('store', 'product', 'quantity'))
+        if store and product and quantity:
+            held = Stock.objects.filter(store=store, product=product).values_list('quantity', flat=True).first() or 0
+            if held < quantity:
+                raise forms.ValidationError(f'{store} only has {held} of {product} in stock.')
+        return cleaned_data
+
+
+@admin.register(Sale)
+class SaleAdmin(LedgerEntryAdmin):
+    list_display = ('id', 'product', 'store', 'quantity', 'unit_price', 'cost', 'sale_date')
+    list_select_related = ('product', 'store')
+    list_filter = ('store',)
+    date_hierarchy = 'sale_date'
+    autocomplete_fields = ('store', 'product')
+    search_fields = ('product__name',)
+    form = SaleForm
+    # Receipts are only made by checkout.
+    readonly_fields = ('receipt', 'cost')
+
+    def save_model(self, request, obj, form, change):
+        obj.pk = ledger.record_sale(obj.store, obj.product, obj.quantity, obj.unit_price, obj.sale_date).pk
+
+
+@admin.register(Purchase)
+class PurchaseAdmin(LedgerEntryAdmin):
+    list_display = ('id', 'product', 'store', 'supplier', 'quantity', 'unit_price', 'purchase_date')
+    list_select_related = ('product', 'store', 'supplier')
+    list_filter = ('store',)
+    date_hierarchy = 'purchase_date'
+    autocomplete_fields = ('store', 'product', 'supplier')
+    search_fields = ('product__name',)
+
+    def save_model(self, request, obj, form, change):
+        obj.pk = ledger.record_purchase(
+            obj.store, obj.product, obj.supplier, obj.quantity, obj.unit_price, obj.purchase_date,
+        ).pk
@@ -0,0 +1,107 @@
+# inventory/alerts.py
+"""
+Low-stock alerts.
+
+A store's stock of a product is low when it is at or below the
+``Stock.reorder_level`` set for it. ``Stock.objects.filter(LOW_STOCK)`` is
+served by a partial index that only holds the low rows.
+
+The ledger calls ``evaluate()`` with the pairs each stock change touched,
+which opens a ``StockAlert`` for the pairs that became low and resolves the
+alerts of those that recovered, so nothing ever scans the whole table.
+``signals.low_stock`` is sent for the alerts opened.
+"""
+
+import math
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from . import signals
+from .models import LOW_STOCK, Sale, Stock, StockAlert
+
+
+# Sales velocity is averaged over this many days...
+VELOCITY_DAYS = 28
+# ...and a reorder should cover this many days of it beyond the reorder level.
+COVER_DAYS = 14
+
+
+def evaluate(pairs):
+    """Open or resolve the alerts of the given ``(store_id, product_id)`` pairs."""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    # Rows of every store and product involved, narrowed down to the pairs
+    # here; one OR term per pair would not scale to large import batches.
+    nearby = {
+        'store_id__in': {store_id for store_id, _ in pairs},
+        'product_id__in': {product_id for _, product_id in pairs},
+    }
+    low = {
+        pair for pair in Stock.objects.filter(LOW_STOCK, **nearby).values_list('store_id', 'product_id')
+        if pair in pairs
+    }
+    alerted = {
+        (store_id, product_id): pk
+        for pk, store_id, product_id in StockAlert.objects.filter(resolved_at__isnull=True, **nearby).values_list(
+            'pk', 'store_id', 'product_id',
+        )
+        if (store_id, product_id) in pairs
+    }
+
+    opened = [StockAlert(store_id=store_id, product_id=product_id) for store_id, product_id in low - alerted.keys()]
+    if opened:
+        # Another writer may open the same alert first; the partial unique
+        # constraint on open alerts drops the duplicate.
+        StockAlert.objects.bulk_create(opened, ignore_conflicts=True)
+        signals.low_stock.send(sender=StockAlert, alerts=opened)
+    recovered = [pk for pair, pk in alerted.items() if pair not in low]
+    if recovered:
+        StockAlert.objects.filter(pk__in=recovered).update(resolved_at=timezone.now())
+
+
+def suggested_quantity(quantity, reorder_level, daily_sales, cover_days=COVER_DAYS):
+    """Units to order to get back to the reorder level plus ``cover_days`` of sales."""
+    return max(reorder_level + math.ceil(daily_sales * cover_days) - quantity, 0)
+
+
+def current(store=None, limit=None, today=None):
+    """
+    The pairs low right now, emptiest first, as dicts with the stock, reorder
+    level, when the alert opened, average daily sales over the last
+    ``REORDER_VELOCITY_DAYS`` and a suggested reorder quantity. Two queries.
+    """
+    today = today or date.today()
+    velocity_days = getattr(settings, 'REORDER_VELOCITY_DAYS', VELOCITY_DAYS)
+    cover_days = getattr(settings, 'REORDER_COVER_DAYS', COVER_DAYS)
+
+    rows = Stock.objects.filter(LOW_STOCK)
+    if store is not None:
+        rows = rows.filter(store_id=store)
+    rows = rows.annotate(opened_at=Subquery(
+        StockAlert.objects.filter(
+            store_id=OuterRef('store_id'), product_id=OuterRef('product_id'), resolved_at__isnull=True,
+        ).values('opened_at')[:1]
+    )).order_by('quantity', 'store__name', 'product__name').values(
+        'store_id', 'product_id', 'quantity', 'reorder_level', 'opened_at',
+        store_name=F('store__name'), product_name=F('product__name'),
+    )
+    rows = list(rows[:limit] if limit else rows)
+    if not rows:
+        return []
+
+    # Trailing sales of every low pair in one grouped query.
+    sold = dict(((row['store_id'], row['product_id']), row['units']) for row in Sale.objects.filter(
+        sale_date__gt=today - timedelta(days=velocity_days),
+        store_id__in={row['store_id'] for row in rows},
+        product_id__in={row['product_id'] for row in rows},
+    ).values('store_id', 'product_id').annotate(units=Sum('quantity')).order_by())
+
+    for row in rows:
+        daily_sales = (sold.get((row['store_id'], row['product_id'])) or 0) / velocity_days
+        row['daily_sales'] = round(daily_sales, 2)
+        row['suggested_quantity'] = suggested_quantity(row['quantity'], row['reorder_level'], daily_sales, cover_days)
+    return rows
@@ -0,0 +1,99 @@
+# inventory/assets.py
+"""
+What a page makes the browser download from ``STATIC_ROOT``.
+
+``weigh()`` picks the stylesheets, scripts, icons and images out of a
+page's HTML and adds up the size of each static one as collected and as
+WhiteNoise sends it: gzipped, or brotli-compressed for browsers that accept
+it. Files referenced from inside stylesheets (fonts, images) are not
+followed, since browsers only fetch the ones they use.
+
+Assets whose name carries no content hash cannot be cached for long, so
+browsers revalidate them on every visit; they are listed as ``unhashed``.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+
+# How ManifestStaticFilesStorage names its copies, e.g. app.0123456789ab.js
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.')
+
+LINK_RELS = {'stylesheet', 'icon', 'preload', 'modulepreload'}
+
+
+class AssetParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ('script', 'img'):
+            url = attrs.get('src')
+        elif tag == 'link' and LINK_RELS & set((attrs.get('rel') or '').lower().split()):
+            url = attrs.get('href')
+        else:
+            return
+        if url and url not in self.urls:
+            self.urls.append(url)
+
+
+def page_assets(html):
+    """The asset URLs in ``html``, in order and without duplicates."""
+    parser = AssetParser()
+    parser.feed(html)
+    parser.close()
+    return parser.urls
+
+
+@dataclass
+class PageWeight:
+    files: int = 0
+    bytes: int = 0
+    gzip_bytes: int = 0
+    brotli_bytes: int = 0
+    unhashed: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+    external: list = field(default_factory=list)
+
+
+def _size(path, default):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return default
+
+
+def weigh(html, root=None, static_url=None):
+    """Return the ``PageWeight`` of the static assets ``html`` loads."""
+    root = root or settings.STATIC_ROOT
+    static_url = static_url or settings.STATIC_URL
+    weight = PageWeight()
+    for url in page_assets(html):
+        parts = urlsplit(url)
+        if parts.netloc:
+            weight.external.append(url)
+            continue
+        if not parts.path.startswith(static_url):
+            continue
+        name = parts.path[len(static_url):]
+        path = os.path.join(root, name)
+        if not os.path.isfile(path):
+            weight.missing.append(name)
+            continue
+        size = os.path.getsize(path)
+        # WhiteNoise skips compressing files that would not shrink.
+        gzip_size = _size(path + '.gz', size)
+        weight.files += 1
+        weight.bytes += size
+        weight.gzip_bytes += gzip_size
+        weight.brotli_bytes += _size(path + '.br', gzip_size)
+        if not HASHED_NAME.search(os.path.basename(name)):
+            weight.unhashed.append(name)
+    return weight
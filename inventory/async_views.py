@@ -0,0 +1,103 @@
+# inventory/async_views.py
+"""
+Async variants of the read-only dashboard, report and JSON views.
+
+They return the same pages as their counterparts in ``views.py`` through
+the async ORM. Querysets are fully evaluated before rendering, since
+templates may not touch the database from async code.
+
+On Django 4.2 the async ORM still runs each query in a single worker thread,
+so queries are awaited one after another: gathering them would not run them
+in parallel, and trips up asgiref when sync middleware sits in the chain.
+The gain is that the event loop keeps serving other requests while queries
+run, rather than faster individual pages. Serve them through ``asgi.py`` with
+uvicorn or daphne; under WSGI they work but run one request at a time.
+"""
+
+from django.db.models import DecimalField, F, Sum
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from . import dashboard
+from .decorators import async_login_required, super_admin_required
+from .models import Sale, Stock, Store, StoreSummary
+from .reports import LINE_PROFIT, LINE_VALUE, aperiod_report
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+@async_login_required
+@super_admin_required
+async def homepage(request):
+    return render(request, 'inventory/homepage.html', await dashboard.aget())
+
+
+@async_login_required
+@super_admin_required
+async def stock_data(request):
+    stocks = await _alist(Stock.objects.values_list('product__name', 'quantity'))
+    return JsonResponse({
+        'labels': [name for name, _ in stocks],
+        'quantity': [quantity for _, quantity in stocks],
+    })
+
+
+@async_login_required
+@super_admin_required
+async def sales_report(request):
+    report = await aperiod_report(Sale.objects.all(), 'sale_date', sales=LINE_VALUE, profit=LINE_PROFIT)
+    return render(request, 'inventory/sales_reports.html', {'sales': report['sales'], 'profit': report['profit']})
+
+
+@async_login_required
+@super_admin_required
+async def purchase_report(request):
+    store_totals = await _alist(StoreSummary.objects.select_related('store'))
+    totals = await StoreSummary.aperiod_totals()
+    return render(request, 'inventory/sales_report.html', {'store_totals': store_totals, 'totals': totals})
+
+
+@async_login_required
+@super_admin_required
+async def store_purchases(request):
+    store_totals = await _alist(StoreSummary.objects.values('store__name', 'total_value'))
+    totals = await StoreSummary.aperiod_totals()
+    return render(request, 'inventory/summary.html', {'store_totals': store_totals, 'totals': totals})
+
+
+@async_login_required
+@super_admin_required
+async def inventory_value_report(request):
+    inventory = await _alist(Stock.objects.annotate(total_value=F('cost_value')).values('product__name', 'total_value'))
+    total = await Stock.objects.aaggregate(total_value=Sum('cost_value'))
+    return render(request, 'inventory/inventory_value_report.html', {
+        'inventory': inventory,
+        'total_inventory_value': total['total_value'],
+    })
+
+
+@async_login_required
+@super_admin_required
+async def sales_report_by_store(request):
+    stores = await _alist(Store.objects.select_related('storereport').order_by('pk'))
+    if all(hasattr(store, 'storereport') for store in stores):
+        data = [{
+            'store': store,
+            'total_quantity': store.storereport.sales_quantity,
+            'total_revenue': store.storereport.sales_value,
+            'report': store.storereport,
+        } for store in stores]
+        computed_at = min((store.storereport.computed_at for store in stores), default=None)
+    else:
+        stores = await _alist(Store.objects.order_by('pk').annotate(
+            total_quantity=Sum('sale__quantity'),
+            total_revenue=Sum(F('sale__quantity') * F('sale__unit_price'), output_field=DecimalField()),
+        ))
+        data = [
+            {'store': store, 'total_quantity': store.total_quantity or 0, 'total_revenue': store.total_revenue or 0}
+            for store in stores
+        ]
+        computed_at = None
+    return render(request, 'inventory/sales_report_by_store.html', {'data': data, 'computed_at': computed_at})
@@ -0,0 +1,37 @@
+# inventory/backends/sqlite3/base.py
+"""
+SQLite backend for the production database profile.
+
+Two extra ``OPTIONS`` are understood on top of Django's SQLite backend:
+
+``pragmas``
+    ``{name: value}`` applied to every new connection, e.g. WAL journaling.
+
+``transaction_mode``
+    ``'IMMEDIATE'`` starts ``atomic()`` blocks with ``BEGIN IMMEDIATE`` so a
+    writer takes the write lock up front and waits out the busy timeout,
+    instead of failing with "database is locked" when a read transaction
+    later tries to write.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,189 @@
+# inventory/benchmarks.py
+"""
+Benchmark harness for the inventory views.
+
+``run()`` requests every URL in ``inventory.urls`` with the test client as a
+superuser and records the status, SQL query count and best-of-N wall time of
+each. URL arguments are filled with the first store, product and stock rows.
+The cache is cleared before each request, so cached views are measured
+doing their full work.
+
+Results are compared with a stored baseline by ``regressions()``: more
+queries than the baseline is always a regression, a slower time only past
+the given tolerance (and ``MIN_SLOWDOWN_MS``), since timings vary between
+machines.
+"""
+
+import asyncio
+import json
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import URLPattern, reverse
+
+from . import synthetic, urls
+from .exports import EXPORTS
+from .models import Job, Product, Receipt, Stock, Store
+
+
+# Slowdowns smaller than this are timer noise, whatever the tolerance.
+MIN_SLOWDOWN_MS = 5
+
+# Sync view URL name -> its async variant
+ASYNC_VARIANTS = {
+    'home': 'async_home',
+    'stock': 'async_stock',
+    'sales_reports': 'async_sales_reports',
+    'purchase_value': 'async_purchase_value',
+    'summary': 'async_summary',
+    'inventory_value': 'async_inventory_value',
+    'sales_report_by_store': 'async_sales_report_by_store',
+}
+
+# Views that only accept POST; a GET would just measure the 405.
+POST_ONLY = {'enqueue_export', 'enqueue_profit_loss', 'api_checkout'}
+
+
+def url_arguments():
+    stock = Stock.objects.order_by('pk').first()
+    return {
+        'store_id': Store.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'product_id': Product.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'stock_id': stock.pk if stock else None,
+        'report': next(iter(EXPORTS)),
+        'kind': 'product',
+        'receipt_id': Receipt.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'job_id': Job.objects.filter(status=Job.DONE).order_by('pk').values_list('pk', flat=True).first(),
+    }
+
+
+def view_urls():
+    """``{url name: path}`` for every named pattern in ``inventory.urls``."""
+    arguments = url_arguments()
+    result = {}
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in POST_ONLY:
+            continue
+        kwargs = {name: arguments[name] for name in pattern.pattern.converters}
+        if None in kwargs.values():
+            continue
+        result[pattern.name] = reverse(pattern.name, kwargs=kwargs)
+    return result
+
+
+def _get(client, path):
+    for cache in caches.all():
+        cache.clear()
+    started = perf_counter()
+    response = client.get(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response, (perf_counter() - started) * 1000
+
+
+def run(client, repeat=3, names=None):
+    """Return ``{url name: {'status', 'queries', 'ms'}}``."""
+    results = {}
+    for name, path in view_urls().items():
+        if names and name not in names:
+            continue
+        with CaptureQueriesContext(connection) as queries:
+            response, elapsed = _get(client, path)
+        # Read now: later requests reset the query log the count is taken from.
+        query_count = len(queries)
+        timings = [elapsed] + [_get(client, path)[1] for _ in range(repeat - 1)]
+        results[name] = {
+            'status': response.status_code,
+            'queries': query_count,
+            'ms': round(min(timings), 2),
+        }
+    return results
+
+
+def compare_async(client, async_client, requests=20):
+    """
+    Time ``requests`` requests to each sync view one after another through
+    the WSGI handler, and the same number to its async variant concurrently
+    through the ASGI handler. Returns ``{url name: {'wsgi_ms', 'asgi_ms'}}``
+    with the total time of each batch. Caching is disabled so every request
+    does its full work.
+    """
+    async def batch(path):
+        responses = await asyncio.gather(*[async_client.get(path) for _ in range(requests)])
+        return [response.status_code for response in responses]
+
+    results = {}
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+        for sync_name, async_name in ASYNC_VARIANTS.items():
+            started = perf_counter()
+            statuses = [client.get(reverse(sync_name)).status_code for _ in range(requests)]
+            wsgi_ms = (perf_counter() - started) * 1000
+
+            started = perf_counter()
+            statuses += asyncio.run(batch(reverse(async_name)))
+            asgi_ms = (perf_counter() - started) * 1000
+            results[sync_name] = {
+                'status': max(statuses),
+                'wsgi_ms': round(wsgi_ms, 2),
+                'asgi_ms': round(asgi_ms, 2),
+            }
+    return results
+
+
+@contextmanager
+def seeded_database(sizes, staticfiles_storage='django.contrib.staticfiles.storage.StaticFilesStorage'):
+    """
+    Create a throwaway test database, seed it with ``synthetic.seed(**sizes)``
+    and yield logged-in ``(Client, AsyncClient)`` for a superuser. Pages link
+    to static files through ``staticfiles_storage``, which by default needs
+    no collectstatic run.
+    """
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(STATICFILES_STORAGE=staticfiles_storage):
+            synthetic.seed(**sizes)
+            user = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+            client, async_client = Client(), AsyncClient()
+            client.force_login(user)
+            async_client.force_login(user)
+            yield client, async_client
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def regressions(results, baseline, tolerance=0.5):
+    """Messages for each view that got worse than ``baseline``."""
+    problems = []
+    for name, result in sorted(results.items()):
+        if result['status'] >= 400:
+            problems.append(f'{name}: status {result["status"]}')
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            problems.append(f'{name}: {result["queries"]} queries, baseline {expected["queries"]}')
+        slowdown = result['ms'] - expected['ms']
+        if result['ms'] > expected['ms'] * (1 + tolerance) and slowdown > MIN_SLOWDOWN_MS:
+            problems.append(f'{name}: {result["ms"]:.1f} ms, baseline {expected["ms"]:.1f} ms')
+    return problems
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)['views']
+
+
+def save(path, results, sizes):
+    with open(path, 'w') as f:
+        json.dump({'sizes': sizes, 'views': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.checks import Error, Tags, register
+
+
+def jazzmin_static_files():
+    """The static files jazzmin's admin pages load that depend on its settings."""
+    from jazzmin.settings import DARK_THEMES, THEMES
+
+    tweaks = getattr(settings, 'JAZZMIN_UI_TWEAKS', {})
+    show_ui_builder = getattr(settings, 'JAZZMIN_SETTINGS', {}).get('show_ui_builder')
+    if show_ui_builder:
+        # The UI builder switches between all of them.
+        themes = set(THEMES)
+    else:
+        # Resolved as jazzmin does, falling back on unknown names.
+        theme = tweaks.get('theme', 'default')
+        themes = {theme if theme in THEMES else 'default'}
+        dark_mode_theme = tweaks.get('dark_mode_theme')
+        if dark_mode_theme:
+            themes.add(dark_mode_theme if dark_mode_theme in DARK_THEMES else 'darkly')
+    files = [THEMES[theme] for theme in sorted(themes)]
+    if show_ui_builder:
+        files.append('jazzmin/js/ui-builder.js')
+    return files
+
+
+@register(Tags.staticfiles)
+def check_ignored_static_files(app_configs, **kwargs):
+    if not apps.is_installed('jazzmin'):
+        return []
+    patterns = apps.get_app_config('staticfiles').ignore_patterns
+    return [
+        Error(
+            f'{path} is left out by STATICFILES_IGNORE_PATTERNS but jazzmin loads it.',
+            hint='Keep the theme in settings.JAZZMIN_THEMES, or stop ignoring the file.',
+            id='inventory.E001',
+        )
+        for path in jazzmin_static_files() if matches_patterns(path, patterns)
+    ]
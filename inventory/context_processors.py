@@ -0,0 +1,19 @@
+# inventory/context_processors.py
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from . import versioning
+
+
+def fragment_cache(request):
+    """
+    ``ledger_version`` and ``fragment_timeout`` for caching report tables:
+
+        {% cache fragment_timeout 'inventory-value' ledger_version %}
+
+    The version is only looked up by templates that use it.
+    """
+    return {
+        'ledger_version': SimpleLazyObject(versioning.ledger_version),
+        'fragment_timeout': getattr(settings, 'REPORT_FRAGMENT_TIMEOUT', 3600),
+    }
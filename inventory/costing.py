@@ -0,0 +1,321 @@
+# inventory/costing.py
+"""
+Cost of goods sold and inventory valuation.
+
+Stock is valued at what was paid for it. Each (store, product) pair holds
+``CostLayer`` rows: lots of stock received at one unit cost, the purchase's
+``unit_price``, or for other additions (opening stock, adjustments) the
+pair's current average cost, falling back to ``Product.price``. Removals
+take stock off the layers oldest first (``'fifo'``) or at their weighted
+average cost (``'average'``, where a pair only ever has one layer),
+depending on the ``INVENTORY_COSTING`` setting.
+
+The ledger hands each batch of movements to ``record()``, which costs them
+against the pair's open layers and stores the cost of each sale in
+``Sale.cost`` and the value of what is left in ``Stock.cost_value``, so
+profit and inventory value are plain sums over those columns.
+
+Movements are costed in ``(occurred_on, pk)`` order, so a back-dated one
+changes the cost of everything after it. As costing moves a pair into a new
+month it saves the pair's layers at the end of the month before as
+``CostCheckpoint`` rows. Pairs that already have movements dated after the
+earliest one in a batch are restored from their latest checkpoint before
+it and replayed from there, so a back-dated movement costs the movements
+since the start of its month rather than the pair's whole history, and only
+the sales whose cost changed are rewritten. ``rebuild()`` replays every
+pair from its first movement and rewrites the checkpoints, e.g. after
+changing ``INVENTORY_COSTING``.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Max
+
+from .models import CostCheckpoint, CostLayer, Sale, Stock, StockMovement, Store
+from .signals import ledger_changed
+
+
+FIFO = 'fifo'
+AVERAGE = 'average'
+
+CENT = Decimal('0.01')
+UNIT_COST = Decimal('0.0001')
+
+BATCH_SIZE = 500
+
+# (pk, store_id, product_id, delta, occurred_on, sale_id, purchase cost, list price, current sale cost)
+ROW_FIELDS = (
+    'pk', 'store_id', 'product_id', 'delta', 'occurred_on', 'sale_id',
+    'purchase__unit_price', 'product__price', 'sale__cost',
+)
+
+
+def method():
+    costing = getattr(settings, 'INVENTORY_COSTING', FIFO)
+    if costing not in (FIFO, AVERAGE):
+        raise ImproperlyConfigured(f'INVENTORY_COSTING must be {FIFO!r} or {AVERAGE!r}, not {costing!r}')
+    return costing
+
+
+class Layers:
+    """The open cost layers of one pair, oldest first, as ``[quantity, unit_cost, received_on]``."""
+
+    def __init__(self, costing, fallback_cost, layers=()):
+        self.costing = costing
+        # Unit cost of stock no layer accounts for, e.g. stock held before
+        # costing started.
+        self.fallback_cost = fallback_cost
+        self.layers = [list(layer) for layer in layers]
+
+    @property
+    def quantity(self):
+        return sum(layer[0] for layer in self.layers)
+
+    @property
+    def value(self):
+        return sum((quantity * unit_cost for quantity, unit_cost, _ in self.layers), Decimal(0)).quantize(CENT)
+
+    def average_cost(self):
+        quantity = self.quantity
+        if not quantity:
+            return self.fallback_cost
+        return (sum(q * unit_cost for q, unit_cost, _ in self.layers) / quantity).quantize(UNIT_COST)
+
+    def add(self, quantity, unit_cost, day):
+        if self.costing == AVERAGE and self.layers:
+            held, held_cost, _ = self.layers[0]
+            total = held + quantity
+            self.layers = [[total, ((held * held_cost + quantity * unit_cost) / total).quantize(UNIT_COST), day]]
+        else:
+            self.layers.append([quantity, unit_cost, day])
+
+    def remove(self, quantity):
+        """Take ``quantity`` off the oldest layers and return what it cost."""
+        cost = Decimal(0)
+        while quantity and self.layers:
+            layer = self.layers[0]
+            taken = min(quantity, layer[0])
+            cost += taken * layer[1]
+            layer[0] -= taken
+            quantity -= taken
+            if not layer[0]:
+                del self.layers[0]
+        return (cost + quantity * self.fallback_cost).quantize(CENT)
+
+
+def _nearby(pairs):
+    # Rows of every store and product involved; callers keep the pairs they want.
+    return {
+        'store_id__in': {store_id for store_id, _ in pairs},
+        'product_id__in': {product_id for _, product_id in pairs},
+    }
+
+
+def _rows(movements):
+    return movements.order_by('occurred_on', 'pk').values_list(*ROW_FIELDS)
+
+
+def _checkpoint(pair, layers, as_of):
+    store_id, product_id = pair
+    return [
+        CostCheckpoint(
+            store_id=store_id, product_id=product_id, as_of=as_of,
+            quantity=quantity, unit_cost=unit_cost, received_on=received_on,
+        )
+        for quantity, unit_cost, received_on in layers.layers or [[0, Decimal(0), as_of]]
+    ]
+
+
+def _cost(rows, layers, months=None):
+    """
+    Cost ``rows`` against ``layers`` (``{pair: Layers}``), updating them.
+    ``months`` has the first day of the month of each pair's last costed
+    movement, where known. Returns ``{sale_id: (stored cost, new cost)}``
+    and the checkpoints of the months the rows move on from.
+    """
+    months = dict(months or {})
+    costs = {}
+    checkpoints = []
+    for _, store_id, product_id, delta, day, sale_id, purchase_cost, _, sale_cost in rows:
+        pair = layers[(store_id, product_id)]
+        month = day.replace(day=1)
+        if months.get((store_id, product_id)) != month:
+            # Nothing to restore for a pair seen for the first time.
+            if pair.layers or months.get((store_id, product_id)) is not None:
+                checkpoints += _checkpoint((store_id, product_id), pair, month - timedelta(days=1))
+            months[(store_id, product_id)] = month
+        if delta > 0:
+            pair.add(delta, pair.average_cost() if purchase_cost is None else purchase_cost, day)
+        elif delta < 0:
+            cost = pair.remove(-delta)
+            if sale_id is not None:
+                costs[sale_id] = (sale_cost, cost)
+    return costs, checkpoints
+
+
+def _save(layers, costs, stale, checkpoints, stale_checkpoints=None):
+    stale.delete()
+    if stale_checkpoints is not None:
+        stale_checkpoints.delete()
+    CostCheckpoint.objects.bulk_create(checkpoints, batch_size=BATCH_SIZE)
+    CostLayer.objects.bulk_create([
+        CostLayer(store_id=store_id, product_id=product_id, quantity=quantity, unit_cost=unit_cost, received_on=day)
+        for (store_id, product_id), pair in layers.items()
+        for quantity, unit_cost, day in pair.layers
+    ], batch_size=BATCH_SIZE)
+    Sale.objects.bulk_update(
+        [Sale(pk=pk, cost=new) for pk, (old, new) in costs.items() if old != new], ['cost'], batch_size=BATCH_SIZE,
+    )
+    stock = Stock.objects.filter(**_nearby(layers)).values_list('pk', 'store_id', 'product_id', 'cost_value')
+    Stock.objects.bulk_update([
+        Stock(pk=pk, cost_value=layers[(store_id, product_id)].value)
+        for pk, store_id, product_id, cost_value in stock
+        if (store_id, product_id) in layers and cost_value != layers[(store_id, product_id)].value
+    ], ['cost_value'], batch_size=BATCH_SIZE)
+
+
+def _forward(rows, months):
+    # Cost rows dated after everything recorded for their pairs against the
+    # pairs' stored layers.
+    costing = method()
+    layers = {}
+    for row in rows:
+        layers.setdefault((row[1], row[2]), Layers(costing, row[7]))
+    stale = []
+    for pk, store_id, product_id, quantity, unit_cost, day in CostLayer.objects.filter(**_nearby(layers)).order_by(
+        'pk'
+    ).values_list('pk', 'store_id', 'product_id', 'quantity', 'unit_cost', 'received_on'):
+        if (store_id, product_id) in layers:
+            layers[(store_id, product_id)].layers.append([quantity, unit_cost, day])
+            stale.append(pk)
+    costs, checkpoints = _cost(rows, layers, months)
+    _save(layers, costs, CostLayer.objects.filter(pk__in=stale), checkpoints)
+
+
+def _checkpoints(starts):
+    """
+    The latest checkpoint of each pair dated before its date in ``starts``,
+    as ``({pair: as_of}, {pair: [[quantity, unit_cost, received_on], ...]})``.
+    """
+    bounded = {pair: start for pair, start in starts.items() if start is not None}
+    as_of = {}
+    if bounded:
+        dates = CostCheckpoint.objects.filter(as_of__lt=max(bounded.values()), **_nearby(bounded)).values_list(
+            'store_id', 'product_id', 'as_of',
+        ).distinct()
+        for store_id, product_id, day in dates:
+            pair = (store_id, product_id)
+            if pair in bounded and day < bounded[pair] and day > as_of.get(pair, day - timedelta(days=1)):
+                as_of[pair] = day
+    layers = {pair: [] for pair in as_of}
+    if as_of:
+        rows = CostCheckpoint.objects.filter(as_of__in=set(as_of.values()), **_nearby(as_of)).order_by('pk')
+        for store_id, product_id, day, quantity, unit_cost, received_on in rows.values_list(
+            'store_id', 'product_id', 'as_of', 'quantity', 'unit_cost', 'received_on',
+        ):
+            if as_of.get((store_id, product_id)) == day and quantity:
+                layers[(store_id, product_id)].append([quantity, unit_cost, received_on])
+    return as_of, layers
+
+
+def _replay(starts):
+    """
+    Re-cost the pairs of ``starts`` from their latest checkpoint before the
+    date given for each, or from their first movement when that is None or
+    there is no such checkpoint.
+    """
+    costing = method()
+    as_of, restored = _checkpoints(starts)
+    movements = StockMovement.objects.filter(**_nearby(starts))
+    checkpoints = CostCheckpoint.objects.filter(**_nearby(starts))
+    if len(as_of) == len(starts):
+        movements = movements.filter(occurred_on__gt=min(as_of.values()))
+        checkpoints = checkpoints.filter(as_of__gte=min(as_of.values()))
+    rows = [
+        row for row in _rows(movements)
+        if (row[1], row[2]) in starts and ((row[1], row[2]) not in as_of or row[4] > as_of[(row[1], row[2])])
+    ]
+    layers = {}
+    for row in rows:
+        if (row[1], row[2]) not in layers:
+            layers[(row[1], row[2])] = Layers(costing, row[7], restored.get((row[1], row[2]), ()))
+    stale = [
+        pk for pk, store_id, product_id in CostLayer.objects.filter(**_nearby(starts)).values_list(
+            'pk', 'store_id', 'product_id',
+        )
+        if (store_id, product_id) in starts
+    ]
+    # The restored checkpoint is written again as the replay leaves its month.
+    stale_checkpoints = [
+        pk for pk, store_id, product_id, day in checkpoints.values_list('pk', 'store_id', 'product_id', 'as_of')
+        if (store_id, product_id) in starts and day >= as_of.get((store_id, product_id), day)
+    ]
+    costs, checkpoints = _cost(rows, layers, {pair: day.replace(day=1) for pair, day in as_of.items()})
+    _save(
+        layers, costs, CostLayer.objects.filter(pk__in=stale), checkpoints,
+        CostCheckpoint.objects.filter(pk__in=stale_checkpoints),
+    )
+
+
+def record(movements):
+    """Cost a batch of just-saved ``StockMovement`` instances. Called by the ledger."""
+    ids = [movement.pk for movement in movements if movement.pk is not None]
+    # Backends that do not return ids from bulk inserts leave nothing to
+    # look the rows up by; their pairs are replayed from the earliest.
+    replay = {}
+    for movement in movements:
+        if movement.pk is None:
+            pair = (movement.store_id, movement.product_id)
+            replay[pair] = min(replay.get(pair, movement.occurred_on), movement.occurred_on)
+    rows = list(_rows(StockMovement.objects.filter(pk__in=ids)))
+
+    earliest = {}
+    for row in rows:
+        pair = (row[1], row[2])
+        earliest[pair] = min(earliest.get(pair, row[4]), row[4])
+    months = {}
+    if earliest:
+        # Each pair's last movement from the batch's first month on: after
+        # the batch, the pair is replayed; before it, _cost() needs its month.
+        later = StockMovement.objects.filter(
+            occurred_on__gte=min(earliest.values()).replace(day=1), **_nearby(earliest),
+        ).exclude(pk__in=ids).values_list('store_id', 'product_id').annotate(last=Max('occurred_on')).order_by()
+        for store_id, product_id, last in later:
+            pair = (store_id, product_id)
+            if pair not in earliest:
+                continue
+            if last > earliest[pair]:
+                replay[pair] = min(replay.get(pair, earliest[pair]), earliest[pair])
+            else:
+                months[pair] = last.replace(day=1)
+
+    forward = [row for row in rows if (row[1], row[2]) not in replay]
+    if forward:
+        _forward(forward, months)
+    if replay:
+        _replay(replay)
+
+
+def rebuild(progress=None):
+    """
+    Replay every pair from its first movement, one store per transaction,
+    rewriting its checkpoints.
+    ``progress`` is called with ``(stores done, stores)`` after each one.
+    Returns the number of pairs replayed.
+    """
+    store_ids = list(Store.objects.order_by('pk').values_list('pk', flat=True))
+    count = 0
+    for done, store_id in enumerate(store_ids, 1):
+        with transaction.atomic():
+            pairs = set(StockMovement.objects.filter(store_id=store_id).values_list('store_id', 'product_id').distinct())
+            if pairs:
+                _replay(dict.fromkeys(pairs))
+                ledger_changed.send(sender=Stock)
+        count += len(pairs)
+        if progress:
+            progress(done, len(store_ids))
+    return count
@@ -0,0 +1,83 @@
+# inventory/dashboard.py
+"""
+The homepage dashboard, computed once and kept in the cache.
+
+The payload is rebuilt on the first request after any write to the sales,
+purchases or stock tables; ``inventory.signals`` deletes it on every such
+write. ``DASHBOARD_CACHE`` names the cache alias to use and
+``DASHBOARD_CACHE_TIMEOUT`` bounds how long a payload can live regardless.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Sum
+
+from . import alerts
+from .models import Purchase, Sale, SalesSummary, Store, StoreSummary
+
+
+CACHE_KEY = 'inventory:dashboard'
+
+# Low-stock alerts shown on the dashboard.
+ALERT_LIMIT = 10
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE', 'default')]
+
+
+def _querysets():
+    return {
+        'sales': Sale.objects.select_related('product').order_by('-sale_date')[:5],
+        'purchases': Purchase.objects.select_related('product', 'supplier').order_by('-purchase_date')[:5],
+        # Stock on hand for every store in one grouped query.
+        'store_stock': Store.objects.order_by('name').annotate(
+            total_stock=Sum('stock__quantity'),
+        ).values('name', 'total_stock'),
+        'store_purchases': StoreSummary.objects.values('store__name').annotate(total_purchase_value=F('total_value')),
+    }
+
+
+def build():
+    """Compute the dashboard context. Every value is fully evaluated so it can be pickled."""
+    payload = {name: list(queryset) for name, queryset in _querysets().items()}
+    # Running totals are kept per store in the summary tables, so these
+    # read one row per store instead of aggregating the whole ledger.
+    payload['total_purchase_value'] = StoreSummary.period_totals().total
+    payload['total_sales_value'] = SalesSummary.period_totals().total
+    payload['low_stock'] = alerts.current(limit=ALERT_LIMIT)
+    return payload
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def abuild():
+    """``build()`` through the async ORM."""
+    payload = {name: await _alist(queryset) for name, queryset in _querysets().items()}
+    payload['total_purchase_value'] = (await StoreSummary.aperiod_totals()).total
+    payload['total_sales_value'] = (await SalesSummary.aperiod_totals()).total
+    payload['low_stock'] = await sync_to_async(alerts.current)(limit=ALERT_LIMIT)
+    return payload
+
+
+def get():
+    payload = _cache().get(CACHE_KEY)
+    if payload is None:
+        payload = build()
+        _cache().set(CACHE_KEY, payload, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return payload
+
+
+async def aget():
+    payload = await _cache().aget(CACHE_KEY)
+    if payload is None:
+        payload = await abuild()
+        await _cache().aset(CACHE_KEY, payload, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return payload
+
+
+def invalidate():
+    _cache().delete(CACHE_KEY)
@@ -1,6 +1,33 @@
 # decorators.py
 
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.contrib.auth.decorators import user_passes_test
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_user_passes_test(test_func):
+    """
+    ``user_passes_test`` for async views, which Django 4.2's decorators do not
+    support. ``request.user`` is loaded lazily from the database, so the test
+    runs in a sync thread.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if await sync_to_async(test_func)(request.user):
+                return await view_func(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path())
+        return wrapper
+    return decorator
+
+
+def async_login_required(view_func):
+    return async_user_passes_test(lambda u: u.is_authenticated)(view_func)
+
 
 def super_admin_required(view_func):
+    if iscoroutinefunction(view_func):
+        return async_user_passes_test(lambda u: u.is_superuser)(view_func)
     return user_passes_test(lambda u: u.is_superuser)(view_func)
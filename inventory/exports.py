@@ -0,0 +1,123 @@
+# inventory/exports.py
+"""
+Streaming CSV exports of the reports.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` and written to
+the response as they are produced, so memory use stays flat however large
+the ledger is. Exports take the same filter parameters as the listing API
+behind the report pages.
+"""
+
+import csv
+import re
+import zlib
+
+from django.db.models import DecimalField, F, Q, Sum
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .listings import LISTINGS
+from .models import Store
+from .reports import LINE_VALUE
+
+
+CHUNK_SIZE = 2000
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class Echo:
+    # File-like object for csv.writer that hands back each line instead of
+    # storing it.
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header).encode()
+    for row in rows:
+        yield writer.writerow(row).encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def inventory_value(params):
+    stock = LISTINGS['stock'].filter(params).order_by('product__name', 'store__name')
+    return (
+        ['Product', 'Store', 'Quantity', 'List Price', 'Cost Value'],
+        stock.values_list('product__name', 'store__name', 'quantity', 'product__price', 'cost_value'),
+    )
+
+
+def product_stock(params):
+    stock = LISTINGS['stock'].filter(params).order_by('product__name', 'store__name')
+    return ['Product', 'Store', 'Quantity'], stock.values_list('product__name', 'store__name', 'quantity')
+
+
+def sales_by_store(params):
+    # One row per store; the date range limits which sales are counted.
+    sales = Q()
+    if params.get('start'):
+        sales &= Q(sale__sale_date__gte=params['start'])
+    if params.get('end'):
+        sales &= Q(sale__sale_date__lte=params['end'])
+    sales = sales or None
+    stores = Store.objects.all()
+    if params.get('store') is not None:
+        stores = stores.filter(pk=params['store'])
+    return (
+        ['Store', 'Total Quantity', 'Total Revenue'],
+        stores.order_by('name').annotate(
+            total_quantity=Sum('sale__quantity', filter=sales),
+            total_revenue=Sum(F('sale__quantity') * F('sale__unit_price'), filter=sales, output_field=DecimalField()),
+        ).values_list('name', 'total_quantity', 'total_revenue'),
+    )
+
+
+def supplier_purchases(params):
+    purchases = LISTINGS['purchases'].filter(params).order_by('supplier__name', 'purchase_date', 'pk')
+    return (
+        ['Supplier', 'Product', 'Store', 'Unit Price', 'Quantity', 'Total Price', 'Date Purchased'],
+        purchases.values_list(
+            'supplier__name', 'product__name', 'store__name', 'unit_price', 'quantity', LINE_VALUE, 'purchase_date',
+        ),
+    )
+
+
+EXPORTS = {
+    'inventory-value': inventory_value,
+    'product-stock': product_stock,
+    'sales-by-store': sales_by_store,
+    'supplier-purchases': supplier_purchases,
+}
+
+
+def export_response(name, params, compress=False, accept_encoding=''):
+    """
+    Stream export ``name`` as CSV. ``compress`` sends a .csv.gz download;
+    otherwise the CSV is gzipped in transit when ``accept_encoding`` (the
+    request's Accept-Encoding) allows it, and saved uncompressed.
+    """
+    header, rows = EXPORTS[name](params)
+    chunks = csv_lines(header, rows.iterator(chunk_size=CHUNK_SIZE))
+    filename = f'{name}.csv'
+    encode = not compress and ACCEPTS_GZIP.search(accept_encoding)
+    if compress or encode:
+        chunks = gzipped(chunks)
+    if compress:
+        filename += '.gz'
+    response = StreamingHttpResponse(chunks, content_type='application/gzip' if compress else 'text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if encode:
+        response['Content-Encoding'] = 'gzip'
+    if not compress:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -1,3 +1,5 @@
+import codecs
+
 from django import forms
 from .models import *
 
@@ -6,3 +8,72 @@ class StockForm(forms.ModelForm):
     class Meta:
         model = Stock
         fields = '__all__'
+
+
+class ImportTransactionsForm(forms.Form):
+    file = forms.FileField(help_text='CSV or JSON Lines with type, store, product, supplier, quantity, unit_price and date columns.')
+    format = forms.ChoiceField(choices=[('', 'From file extension'), ('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False)
+    batch_size = forms.IntegerField(min_value=1, initial=1000)
+
+    def clean_file(self):
+        # Checked before importing, since rows are committed batch by batch
+        # and a decoding error halfway through would leave the earlier ones.
+        upload = self.cleaned_data['file']
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for chunk in upload.chunks():
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            raise forms.ValidationError('The file must be UTF-8 text.')
+        upload.seek(0)
+        return upload
+
+
+class DateRangeForm(forms.Form):
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError('The start date must not be after the end date.')
+        return cleaned_data
+
+
+class ListingForm(DateRangeForm):
+    store = forms.IntegerField(required=False)
+    product = forms.IntegerField(required=False)
+    supplier = forms.IntegerField(required=False)
+    sort = forms.CharField(required=False)
+    cursor = forms.CharField(required=False)
+    limit = forms.IntegerField(required=False, min_value=1)
+
+
+class TimeSeriesForm(DateRangeForm):
+    granularity = forms.ChoiceField(
+        choices=[('day', 'Daily'), ('week', 'Weekly'), ('month', 'Monthly')], required=False
+    )
+    store = forms.IntegerField(required=False)
+    max_points = forms.IntegerField(required=False, min_value=2)
+
+
+class AlertsForm(forms.Form):
+    store = forms.IntegerField(required=False)
+    limit = forms.IntegerField(required=False, min_value=1)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(required=False)
+    limit = forms.IntegerField(required=False, min_value=1)
+
+
+class CheckoutForm(forms.Form):
+    store = forms.IntegerField()
+
+
+class CheckoutLineForm(forms.Form):
+    product = forms.IntegerField()
+    quantity = forms.IntegerField(min_value=1)
+    unit_price = forms.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
@@ -0,0 +1,228 @@
+# inventory/importers.py
+"""
+Bulk import of purchase and sale lines from CSV or JSON Lines.
+
+Each input row has the columns ``type`` (``purchase`` or ``sale``), ``store``,
+``product``, ``supplier`` (purchases only), ``quantity``, ``unit_price`` and an
+optional ``date`` (YYYY-MM-DD, default today). Stores, products and suppliers
+are referenced by name.
+
+Input is read lazily and written in batches: each batch is one transaction
+with one ``bulk_create`` per model and one stock update. Rows that fail
+validation are reported and skipped without aborting their batch.
+"""
+
+import csv
+import json
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import ledger
+from .models import Product, Purchase, Sale, Store, Supplier
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Columns that must be text when present; JSON Lines rows may hold anything.
+TEXT_FIELDS = ('type', 'store', 'product', 'supplier', 'date')
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.purchases = 0
+        self.sales = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def imported(self):
+        return self.purchases + self.sales
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class NameCache:
+    """
+    Name -> id lookups for one model. Unknown names in a batch are fetched
+    together with a single ``name__in`` query; misses are remembered too.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+
+    def load(self, names):
+        names = {name for name in names if name and name not in self.ids}
+        if not names:
+            return
+        # Order by pk so duplicate names resolve to the oldest row.
+        for pk, name in self.model.objects.filter(name__in=names).order_by('-pk').values_list('pk', 'name'):
+            self.ids[name] = pk
+        for name in names:
+            self.ids.setdefault(name, None)
+
+    def get(self, name):
+        pk = self.ids.get(name)
+        if pk is None:
+            raise RowError(f'unknown {self.model._meta.verbose_name} {name!r}')
+        return pk
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, row_dict)`` from a text stream, one row at a time."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield line_number, row
+    else:
+        raise ValueError(f'Unknown import format {fmt!r}')
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+class TransactionImporter:
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.stores = NameCache(Store)
+        self.products = NameCache(Product)
+        self.suppliers = NameCache(Supplier)
+
+    def run(self, rows, progress=None):
+        """
+        Import ``(line_number, row)`` pairs. ``progress`` is called with the
+        running ``ImportResult`` after each batch.
+        """
+        result = ImportResult()
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch, result)
+            result.elapsed = time.monotonic() - result.started
+            if progress:
+                progress(result)
+        result.elapsed = time.monotonic() - result.started
+        result.errors.sort()
+        return result
+
+    def import_batch(self, batch, result):
+        result.rows += len(batch)
+        rows = []
+        for line, row in batch:
+            if not isinstance(row, dict):
+                result.errors.append((line, f'invalid row: {row}'))
+                continue
+            try:
+                check_text_fields(row)
+            except RowError as e:
+                result.errors.append((line, str(e)))
+                continue
+            rows.append((line, row))
+
+        self.stores.load(row.get('store') for _, row in rows)
+        self.products.load(row.get('product') for _, row in rows)
+        self.suppliers.load(row.get('supplier') for _, row in rows)
+
+        parsed = []
+        for line, row in rows:
+            try:
+                parsed.append((line, self.parse(row)))
+            except RowError as e:
+                result.errors.append((line, str(e)))
+
+        with transaction.atomic():
+            # Check sales against stock as it will be after the earlier rows
+            # of this batch, so a rejected sale does not sink the whole batch.
+            levels = ledger.stock_levels((obj.store_id, obj.product_id) for _, obj in parsed)
+            purchases, sales = [], []
+            for line, obj in parsed:
+                pair = (obj.store_id, obj.product_id)
+                if isinstance(obj, Sale):
+                    if levels.get(pair, 0) < obj.quantity:
+                        result.errors.append((line, 'insufficient stock'))
+                        continue
+                    levels[pair] = levels.get(pair, 0) - obj.quantity
+                    sales.append(obj)
+                else:
+                    levels[pair] = levels.get(pair, 0) + obj.quantity
+                    purchases.append(obj)
+            ledger.record_batch(purchases, sales)
+
+        result.purchases += len(purchases)
+        result.sales += len(sales)
+
+    def parse(self, row):
+        kind = (row.get('type') or '').strip().lower()
+        if kind not in ('purchase', 'sale'):
+            raise RowError(f"type must be 'purchase' or 'sale', not {row.get('type')!r}")
+
+        quantity = parse_quantity(row.get('quantity'))
+        if quantity <= 0:
+            raise RowError('quantity must be positive')
+
+        try:
+            unit_price = Sale._meta.get_field('unit_price').clean(row.get('unit_price'), None)
+        except ValidationError:
+            raise RowError(f"invalid unit_price {row.get('unit_price')!r}")
+        if unit_price < 0:
+            raise RowError('unit_price must not be negative')
+
+        try:
+            day = date.fromisoformat(row['date']) if row.get('date') else date.today()
+        except (TypeError, ValueError):
+            raise RowError(f"invalid date {row.get('date')!r}")
+
+        fields = {
+            'store_id': self.stores.get(row.get('store')),
+            'product_id': self.products.get(row.get('product')),
+            'quantity': quantity,
+            'unit_price': unit_price,
+        }
+        if kind == 'purchase':
+            return Purchase(supplier_id=self.suppliers.get(row.get('supplier')), purchase_date=day, **fields)
+        return Sale(sale_date=day, **fields)
+
+
+def check_text_fields(row):
+    for field in TEXT_FIELDS:
+        value = row.get(field)
+        if value is not None and not isinstance(value, str):
+            raise RowError(f'{field} must be text, not {value!r}')
+
+
+def parse_quantity(value):
+    """A whole number from a CSV string or a JSON number; 2.0 is accepted, 2.7 is not."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise RowError(f'invalid quantity {value!r}')
+    try:
+        quantity = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise RowError(f'invalid quantity {value!r}')
+    if not quantity.is_finite() or quantity != quantity.to_integral_value():
+        raise RowError(f'quantity must be a whole number, not {value!r}')
+    return int(quantity)
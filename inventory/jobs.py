@@ -0,0 +1,193 @@
+# inventory/jobs.py
+"""
+A small database-backed job queue for reports too slow to build inside a
+request.
+
+Views ``enqueue()`` a ``Job`` with the request's query parameters and return
+at once; ``manage.py run_worker`` claims queued jobs and runs them in a
+process pool, storing each result under ``MEDIA_ROOT``. A job is claimed
+with a conditional ``UPDATE ... WHERE status = 'queued'``, so several
+workers can share a queue without a broker or row locks.
+"""
+
+import logging
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from multiprocessing import get_context
+
+import django
+from django.core.files import File
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .exports import CHUNK_SIZE, EXPORTS, csv_lines, gzipped
+from .forms import DateRangeForm, ListingForm
+from .models import Job, Purchase, Sale, Stock, Store
+from .reports import profit_loss
+
+
+logger = logging.getLogger('inventory.jobs')
+
+
+class JobError(Exception):
+    pass
+
+
+def _cleaned(form_class, params):
+    form = form_class(params)
+    if not form.is_valid():
+        raise JobError(form.errors.as_text())
+    return form.cleaned_data
+
+
+def export_csv(job, output):
+    """Write one of the ``exports.EXPORTS`` reports as CSV (gzipped with ``gzip=1``)."""
+    report = job.params.get('report')
+    if report not in EXPORTS:
+        raise JobError(f'Unknown report {report!r}')
+    header, rows = EXPORTS[report](_cleaned(ListingForm, job.params))
+    chunks = csv_lines(header, rows.iterator(chunk_size=CHUNK_SIZE))
+    filename = f'{report}.csv'
+    if job.params.get('gzip') == '1':
+        chunks = gzipped(chunks)
+        filename += '.gz'
+    for chunk in chunks:
+        output.write(chunk)
+    return filename
+
+
+def profit_loss_report(job, output):
+    """Render a store's whole profit/loss report, every row on one page."""
+    store = Store.objects.filter(pk=job.params.get('store')).first()
+    if store is None:
+        raise JobError(f'Unknown store {job.params.get("store")!r}')
+    period = _cleaned(DateRangeForm, job.params)
+    purchases, sales, totals = profit_loss(
+        Purchase.objects.filter(store=store),
+        Sale.objects.filter(store=store),
+        Stock.objects.filter(store=store),
+        period['start'],
+        period['end'],
+    )
+    html = render_to_string('inventory/profit_loss_full.html', {
+        'store': store,
+        'period': period,
+        'purchases': purchases.select_related('product').order_by('-purchase_date', '-pk').iterator(chunk_size=CHUNK_SIZE),
+        'sales': sales.select_related('product').order_by('-sale_date', '-pk').iterator(chunk_size=CHUNK_SIZE),
+        'stock': Stock.objects.filter(store=store).select_related('product').order_by('product__name'),
+        'generated_at': timezone.now(),
+        **totals,
+    })
+    output.write(html.encode())
+    return f'profit-loss-{store.pk}.html'
+
+
+HANDLERS = {
+    'export': export_csv,
+    'profit-loss': profit_loss_report,
+}
+
+
+def enqueue(kind, params, user=None):
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    return Job.objects.create(kind=kind, params=params, created_by=user)
+
+
+def claim(limit=1):
+    """Mark up to ``limit`` of the oldest queued jobs as running and return their ids."""
+    claimed = []
+    queued = Job.objects.filter(status=Job.QUEUED).order_by('created_at', 'pk')
+    for pk in queued.values_list('pk', flat=True)[:limit]:
+        # Another worker may have claimed it since the SELECT.
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(status=Job.RUNNING, started_at=timezone.now()):
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale(timeout):
+    """Put back jobs left running longer than ``timeout`` by a worker that died."""
+    return Job.objects.filter(
+        status=Job.RUNNING, started_at__lt=timezone.now() - timeout,
+    ).update(status=Job.QUEUED, started_at=None)
+
+
+def execute(job_id):
+    """Run a claimed job and record its result or error. Returns the final status."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        with tempfile.TemporaryFile() as output:
+            filename = HANDLERS[job.kind](job, output)
+            output.seek(0)
+            job.result.save(f'{job.pk}-{filename}', File(output), save=False)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        job.status = Job.FAILED
+        job.error = traceback.format_exc(limit=5)
+    else:
+        job.status = Job.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job.status
+
+
+def _fail(job_id, error):
+    Job.objects.filter(pk=job_id).update(status=Job.FAILED, error=error, finished_at=timezone.now())
+
+
+def _serve(pool, processes, poll, once):
+    # Returns the number of jobs run, and whether the pool broke.
+    count = 0
+    running = {}
+    while True:
+        for job_id in claim(processes - len(running)):
+            running[pool.submit(execute, job_id)] = job_id
+        if not running:
+            if once:
+                return count, False
+            time.sleep(poll)
+            continue
+        done, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+        broken = False
+        for future in done:
+            job_id = running.pop(future)
+            count += 1
+            try:
+                logger.info('Job %s %s', job_id, future.result())
+            except BrokenProcessPool as exc:
+                # A pool process died, taking every job in flight with it.
+                _fail(job_id, repr(exc))
+                broken = True
+        if broken:
+            for job_id in running.values():
+                _fail(job_id, 'Worker pool restarted')
+            return count + len(running), True
+
+
+def run_worker(processes=None, poll=2.0, once=False, stale_after=timedelta(hours=1)):
+    """
+    Claim and run jobs in a pool of ``processes`` until interrupted, or with
+    ``once`` until the queue is empty. Returns the number of jobs run.
+    """
+    processes = processes or os.cpu_count() or 1
+    requeued = requeue_stale(stale_after)
+    if requeued:
+        logger.warning('Requeued %d stale jobs', requeued)
+
+    total = 0
+    while True:
+        # Pool processes are spawned rather than forked, so they set Django
+        # up afresh and open their own database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(processes, mp_context=get_context('spawn'), initializer=django.setup) as pool:
+            count, broken = _serve(pool, processes, poll, once)
+        total += count
+        if not broken:
+            return total
+        logger.error('A worker process died; starting a new pool')
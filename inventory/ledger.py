@@ -0,0 +1,282 @@
+# inventory/ledger.py
+"""
+Stock mutations.
+
+Every change to ``Stock.quantity`` goes through this module. Quantities are
+changed with ``F()`` expressions inside ``transaction.atomic()`` so concurrent
+tills cannot overwrite each other's updates, and a purchase or sale is written
+together with its stock change or not at all. Each change is also recorded as
+a ``StockMovement``, costed by ``inventory.costing``, and the low-stock alerts
+of the pairs it touched are re-evaluated.
+"""
+
+from collections import defaultdict
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Case, F, When
+
+from . import alerts, costing, snapshots
+from .models import Product, Purchase, Receipt, Sale, SalesSummary, Stock, StockMovement, StoreSummary
+from .signals import ledger_changed
+
+
+class InsufficientStock(Exception):
+    def __init__(self, store, product, quantity):
+        self.store = store
+        self.product = product
+        self.quantity = quantity
+        super().__init__(f'Insufficient stock of {product} in {store} to remove {quantity}')
+
+
+def _for_update(queryset):
+    # SQLite serialises writers itself and has no row locks.
+    if connection.features.has_select_for_update:
+        return queryset.select_for_update()
+    return queryset
+
+
+def record_movements(movements, pairs=()):
+    """
+    Save unsaved ``StockMovement`` instances, cost them and evaluate the
+    alerts of their pairs, plus any other ``(store_id, product_id)`` in
+    ``pairs``.
+    """
+    StockMovement.objects.bulk_create(movements)
+    costing.record(movements)
+    snapshots.add_back_dated(movements)
+    alerts.evaluate({(movement.store_id, movement.product_id) for movement in movements} | set(pairs))
+
+
+def adjust_stock(store, product, delta, kind=StockMovement.ADJUSTMENT, **movement):
+    """
+    Add ``delta`` (which may be negative) to the store's stock of ``product``
+    and record it as a ``kind`` movement; ``movement`` holds any other
+    ``StockMovement`` fields (``occurred_on``, ``purchase``, ``sale``).
+
+    Raises ``InsufficientStock`` rather than letting the quantity go below zero.
+    """
+    with transaction.atomic():
+        stock = _for_update(Stock.objects.filter(store=store, product=product)).first()
+        created = False
+        if stock is None:
+            if delta < 0:
+                raise InsufficientStock(store, product, -delta)
+            # Another writer may create the row first; the unique constraint
+            # turns that into a plain update below.
+            stock, created = Stock.objects.get_or_create(store=store, product=product, defaults={'quantity': delta})
+
+        if not created:
+            # The quantity guard makes the decrement conditional in the
+            # database itself, and the column's CHECK constraint backs it up.
+            rows = Stock.objects.filter(pk=stock.pk, quantity__gte=max(-delta, 0))
+            if not rows.update(quantity=F('quantity') + delta):
+                raise InsufficientStock(store, product, -delta)
+            ledger_changed.send(sender=Stock)
+        record_movements([StockMovement(store=store, product=product, delta=delta, kind=kind, **movement)])
+
+
+def record_purchase(store, product, supplier, quantity, unit_price, purchase_date=None):
+    with transaction.atomic():
+        purchase = Purchase.objects.create(
+            store=store, product=product, supplier=supplier, quantity=quantity, unit_price=unit_price,
+            purchase_date=purchase_date or date.today(),
+        )
+        adjust_stock(
+            store, product, quantity,
+            kind=StockMovement.PURCHASE, occurred_on=purchase.purchase_date, purchase=purchase,
+        )
+    return purchase
+
+
+def record_sale(store, product, quantity, unit_price, sale_date=None):
+    with transaction.atomic():
+        sale = Sale.objects.create(
+            store=store, product=product, quantity=quantity, unit_price=unit_price, sale_date=sale_date or date.today(),
+        )
+        adjust_stock(store, product, -quantity, kind=StockMovement.SALE, occurred_on=sale.sale_date, sale=sale)
+    return sale
+
+
+def set_stock(stock_id, store, product, quantity, reorder_level=None):
+    """Overwrite a stock row, as done from the update stock form."""
+    with transaction.atomic():
+        stock = _for_update(Stock.objects.filter(pk=stock_id)).get()
+        pairs = {(stock.store_id, stock.product_id), (store.pk, product.pk)}
+        movements = []
+        if (stock.store_id, stock.product_id) != (store.pk, product.pk):
+            # Moving the row to another pair empties the old one.
+            movements.append(StockMovement(
+                store_id=stock.store_id, product_id=stock.product_id, delta=-stock.quantity, kind=StockMovement.REMOVAL,
+            ))
+            movements.append(StockMovement(store=store, product=product, delta=quantity, kind=StockMovement.ADJUSTMENT))
+        else:
+            movements.append(StockMovement(
+                store=store, product=product, delta=quantity - stock.quantity, kind=StockMovement.ADJUSTMENT,
+            ))
+        stock.store = store
+        stock.product = product
+        stock.quantity = quantity
+        if reorder_level is not None:
+            stock.reorder_level = reorder_level
+        stock.save()
+        # The reorder level may have changed even if the quantity did not.
+        record_movements([movement for movement in movements if movement.delta], pairs)
+    return stock
+
+
+def delete_stock(stock_id):
+    with transaction.atomic():
+        stock = _for_update(Stock.objects.filter(pk=stock_id)).get()
+        stock.delete()
+        if stock.quantity:
+            record_movements([StockMovement(
+                store_id=stock.store_id, product_id=stock.product_id, delta=-stock.quantity, kind=StockMovement.REMOVAL,
+            )])
+    return stock
+
+
+def stock_levels(pairs):
+    """
+    Return ``{(store_id, product_id): quantity}`` for the given pairs in one
+    query, locking the rows until the surrounding transaction ends.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    # Rows of every store and product involved, narrowed down to the pairs
+    # here, as in alerts.evaluate(): one OR term per pair exceeds SQLite's
+    # expression depth limit in a large import batch.
+    rows = _for_update(Stock.objects.filter(
+        store_id__in={store_id for store_id, _ in pairs},
+        product_id__in={product_id for _, product_id in pairs},
+    )).values_list('store_id', 'product_id', 'quantity')
+    return {
+        (store_id, product_id): quantity for store_id, product_id, quantity in rows
+        if (store_id, product_id) in pairs
+    }
+
+
+def apply_stock_deltas(deltas, movements=None):
+    """
+    Apply summed ``{(store_id, product_id): delta}`` changes with one UPDATE.
+
+    ``movements`` are the ``StockMovement`` rows explaining the changes; by
+    default each pair gets one adjustment. Pairs without a stock row get one.
+    Decrements below zero are rejected by the database's CHECK constraint, so
+    callers check sales against ``stock_levels()`` first.
+    """
+    deltas = {pair: delta for pair, delta in deltas.items() if delta}
+    if movements is None:
+        movements = [
+            StockMovement(store_id=store_id, product_id=product_id, delta=delta, kind=StockMovement.ADJUSTMENT)
+            for (store_id, product_id), delta in deltas.items()
+        ]
+    # Movements that cancel out (a purchase and a sale of the same pair) leave
+    # the quantity alone but are still recorded and costed.
+    if not deltas and not movements:
+        return
+    with transaction.atomic():
+        if deltas:
+            # Make sure every pair has a row, then change them all in one
+            # UPDATE. Conflicts with rows created concurrently are ignored
+            # thanks to the (store, product) unique constraint.
+            Stock.objects.bulk_create(
+                [Stock(store_id=store_id, product_id=product_id, quantity=0) for store_id, product_id in deltas],
+                ignore_conflicts=True,
+            )
+            pks = {
+                (store_id, product_id): pk
+                for pk, store_id, product_id in Stock.objects.filter(
+                    store_id__in={store_id for store_id, _ in deltas},
+                    product_id__in={product_id for _, product_id in deltas},
+                ).values_list('pk', 'store_id', 'product_id')
+                if (store_id, product_id) in deltas
+            }
+            Stock.objects.filter(pk__in=pks.values()).update(quantity=Case(
+                *[When(pk=pk, then=F('quantity') + deltas[pair]) for pair, pk in pks.items()],
+                default=F('quantity'),
+                output_field=Stock._meta.get_field('quantity'),
+            ))
+        record_movements(movements)
+        ledger_changed.send(sender=Stock)
+
+
+def record_batch(purchases=(), sales=()):
+    """
+    Insert unsaved Purchase and Sale instances with ``bulk_create`` and apply
+    their summed stock changes and summary totals in the same transaction.
+
+    Callers are responsible for checking sales against ``stock_levels()``.
+    """
+    deltas = defaultdict(int)
+    for purchase in purchases:
+        deltas[(purchase.store_id, purchase.product_id)] += purchase.quantity
+    for sale in sales:
+        deltas[(sale.store_id, sale.product_id)] -= sale.quantity
+
+    with transaction.atomic():
+        Purchase.objects.bulk_create(purchases)
+        Sale.objects.bulk_create(sales)
+        # The source ids are only known on backends that return them from
+        # bulk inserts (PostgreSQL, SQLite 3.35+).
+        movements = [
+            StockMovement(
+                store_id=row.store_id, product_id=row.product_id, delta=sign * row.quantity, kind=kind,
+                occurred_on=getattr(row, date_field), **{f'{kind}_id': row.pk},
+            )
+            for rows, kind, date_field, sign in (
+                (purchases, StockMovement.PURCHASE, 'purchase_date', 1),
+                (sales, StockMovement.SALE, 'sale_date', -1),
+            )
+            for row in rows
+        ]
+        apply_stock_deltas(deltas, movements)
+        for summary, rows, date_field in (
+            (StoreSummary, purchases, 'purchase_date'),
+            (SalesSummary, sales, 'sale_date'),
+        ):
+            amounts = defaultdict(int)
+            for row in rows:
+                amounts[(row.store_id, getattr(row, date_field))] += row.get_total_price()
+            for (store_id, day), amount in sorted(amounts.items(), key=lambda item: item[0][1]):
+                summary.add(store_id, amount, day)
+
+
+def checkout(store, lines, user=None):
+    """
+    Sell a basket of ``(product_id, quantity, unit_price)`` lines at
+    ``store`` and return the ``Receipt`` tying them together. A unit price
+    of ``None`` charges the product's list price.
+
+    The whole basket is checked against the store's stock with one query and
+    written with ``record_batch()``, so it is sold entirely or not at all.
+    Raises ``Product.DoesNotExist`` for unknown products and
+    ``InsufficientStock`` for the first product the store is short of.
+    """
+    lines = list(lines)
+    products = Product.objects.in_bulk({product_id for product_id, _, _ in lines})
+    missing = sorted({product_id for product_id, _, _ in lines} - products.keys())
+    if missing:
+        raise Product.DoesNotExist(f'Unknown products: {", ".join(map(str, missing))}')
+    wanted = defaultdict(int)
+    for product_id, quantity, _ in lines:
+        wanted[product_id] += quantity
+
+    with transaction.atomic():
+        levels = stock_levels((store.pk, product_id) for product_id in wanted)
+        for product_id, quantity in wanted.items():
+            if levels.get((store.pk, product_id), 0) < quantity:
+                raise InsufficientStock(store, products[product_id], quantity)
+        sales = [
+            Sale(
+                store=store, product=products[product_id], quantity=quantity,
+                unit_price=products[product_id].price if unit_price is None else unit_price,
+            )
+            for product_id, quantity, unit_price in lines
+        ]
+        receipt = Receipt.objects.create(store=store, created_by=user, total=sum(sale.get_total_price() for sale in sales))
+        for sale in sales:
+            sale.receipt = receipt
+        record_batch(sales=sales)
+    return receipt
@@ -0,0 +1,141 @@
+# inventory/listings.py
+"""
+Keyset-paginated listings of stock, sales and purchases for the JSON API.
+
+Pages are addressed by an opaque cursor holding the sort key of the last row
+returned, so fetching page N costs the same as fetching page 1 (no OFFSET).
+The sort keys end in ``id`` to make them unique, and match the ledger indexes
+when filtering by store or supplier.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+from .models import Purchase, Sale, Stock
+from .reports import LINE_VALUE
+
+
+MAX_LIMIT = 500
+DEFAULT_LIMIT = 50
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor, fields):
+    """The sort key values in ``cursor``, cleaned by the model ``fields`` they sort on."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Invalid cursor')
+    cleaned = []
+    for field, value in zip(fields, values):
+        # encode_cursor() only writes ids and ISO dates.
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise InvalidCursor('Invalid cursor')
+        try:
+            cleaned.append(field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+    return cleaned
+
+
+def after(keys, values):
+    """
+    Q object matching rows that sort after ``values`` under the ``order_by``
+    style ``keys``: (a > x) OR (a = x AND b > y) ...
+    """
+    condition = Q()
+    for i, key in enumerate(keys):
+        field = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        equal = {prefix.lstrip('-'): value for prefix, value in zip(keys[:i], values)}
+        condition |= Q(**equal, **{f'{field}__{lookup}': values[i]})
+    return condition
+
+
+class Listing:
+    def __init__(self, model, fields, related, sorts, filters, date_field=None):
+        self.model = model
+        # Model columns, and named expressions for related or computed values
+        self.fields = fields
+        self.related = related
+        # Sort option name -> order_by keys, the first option is the default.
+        self.sorts = sorts
+        # Request parameter -> queryset lookup
+        self.filters = filters
+        self.date_field = date_field
+
+    def filter(self, params):
+        """The model's rows matching the cleaned ``ListingForm`` values in ``params``."""
+        queryset = self.model.objects.filter(**{
+            lookup: params[name]
+            for name, lookup in self.filters.items()
+            if params.get(name) is not None
+        })
+        if self.date_field:
+            if params.get('start'):
+                queryset = queryset.filter(**{f'{self.date_field}__gte': params['start']})
+            if params.get('end'):
+                queryset = queryset.filter(**{f'{self.date_field}__lte': params['end']})
+        return queryset
+
+    def page(self, params, cursor=None, sort=None, limit=DEFAULT_LIMIT):
+        """
+        Return ``(rows, next_cursor)``. ``params`` holds cleaned filter values;
+        ``next_cursor`` is None on the last page.
+        """
+        keys = self.sorts[sort or next(iter(self.sorts))]
+        queryset = self.filter(params)
+        if cursor:
+            fields = [self.model._meta.get_field(key.lstrip('-')) for key in keys]
+            queryset = queryset.filter(after(keys, decode_cursor(cursor, fields)))
+
+        rows = list(queryset.order_by(*keys).values(*self.fields, **self.related)[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][key.lstrip('-')] for key in keys])
+        return rows, next_cursor
+
+
+LISTINGS = {
+    'stock': Listing(
+        Stock,
+        fields=('id', 'quantity'),
+        related={'store_name': F('store__name'), 'product_name': F('product__name')},
+        sorts={'id': ('id',), '-id': ('-id',)},
+        filters={'store': 'store_id', 'product': 'product_id'},
+    ),
+    'sales': Listing(
+        Sale,
+        fields=('id', 'sale_date', 'quantity', 'unit_price'),
+        related={'store_name': F('store__name'), 'product_name': F('product__name'), 'total_price': LINE_VALUE},
+        sorts={'-date': ('-sale_date', '-id'), 'date': ('sale_date', 'id')},
+        filters={'store': 'store_id', 'product': 'product_id'},
+        date_field='sale_date',
+    ),
+    'purchases': Listing(
+        Purchase,
+        fields=('id', 'purchase_date', 'quantity', 'unit_price'),
+        related={
+            'store_name': F('store__name'),
+            'product_name': F('product__name'),
+            'supplier_name': F('supplier__name'),
+            'total_price': LINE_VALUE,
+        },
+        sorts={'-date': ('-purchase_date', '-id'), 'date': ('purchase_date', 'id')},
+        filters={'store': 'store_id', 'product': 'product_id', 'supplier': 'supplier_id'},
+        date_field='purchase_date',
+    ),
+}
@@ -0,0 +1,42 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and compare each read-heavy view served sequentially through the '
+        'WSGI handler with its async variant serving the same number of requests concurrently through ASGI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=5)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--suppliers', type=int, default=10)
+        parser.add_argument('--purchases', type=int, default=5000)
+        parser.add_argument('--sales', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=20, help='Requests per view and handler.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        sizes = {name: options[name] for name in ('stores', 'products', 'suppliers', 'purchases', 'sales', 'seed')}
+
+        request_logger = logging.getLogger('inventory.requests')
+        level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+        try:
+            with benchmarks.seeded_database(sizes) as (client, async_client):
+                results = benchmarks.compare_async(client, async_client, options['requests'])
+        finally:
+            request_logger.setLevel(level)
+
+        self.stdout.write(f"{'view':<24} {'status':>6} {'wsgi ms':>9} {'asgi ms':>9} {'speedup':>8}")
+        for name, result in results.items():
+            speedup = result['wsgi_ms'] / result['asgi_ms'] if result['asgi_ms'] else 0
+            self.stdout.write(
+                f"{name:<24} {result['status']:>6} {result['wsgi_ms']:>9.1f} {result['asgi_ms']:>9.1f} {speedup:>7.2f}x"
+            )
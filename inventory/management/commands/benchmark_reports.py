@@ -0,0 +1,95 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from inventory import synthetic
+from inventory.models import Purchase, Sale, Store, Supplier
+from inventory.reports import LINE_PROFIT, LINE_VALUE, period_report, period_starts
+
+
+# Indexes dropped to measure the "before" timings.
+LEDGER_INDEXES = [
+    (Sale, 'sale_store_date_idx'),
+    (Purchase, 'purchase_store_date_idx'),
+    (Purchase, 'purchase_supplier_date_idx'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the per-store and per-supplier report queries with and without the ledger indexes. '
+        'Everything, including any seeded data, runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Seed this many purchases and as many sales first.')
+        parser.add_argument('--stores', type=int, default=20)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--suppliers', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=3, help='Best of this many runs is reported.')
+
+    def handle(self, *args, **options):
+        if not connection.features.can_rollback_ddl:
+            raise CommandError(f'{connection.vendor} cannot roll back DROP INDEX; use SQLite or PostgreSQL.')
+
+        with transaction.atomic():
+            if options['seed']:
+                self.stdout.write(f"Seeding {options['seed']} purchases and sales...")
+                synthetic.seed(
+                    stores=options['stores'], products=options['products'], suppliers=options['suppliers'],
+                    purchases=options['seed'], sales=options['seed'],
+                )
+            self.stdout.write(f'{Sale.objects.count()} sales, {Purchase.objects.count()} purchases')
+
+            after = self.time_queries(options['repeat'])
+            with connection.cursor() as cursor:
+                for model, name in LEDGER_INDEXES:
+                    cursor.execute(connection.schema_editor().sql_delete_index % {
+                        'name': connection.ops.quote_name(name),
+                        'table': connection.ops.quote_name(model._meta.db_table),
+                    })
+            before = self.time_queries(options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'query':<40} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for label in after:
+            speedup = before[label] / after[label] if after[label] else 0
+            self.stdout.write(f'{label:<40} {before[label]:>10.1f} {after[label]:>10.1f} {speedup:>7.1f}x')
+
+    def time_queries(self, repeat):
+        starts = period_starts(date.today())
+        store_ids = list(Store.objects.values_list('pk', flat=True))
+        supplier_ids = list(Supplier.objects.values_list('pk', flat=True))
+
+        queries = {
+            'sales per store, this month': lambda: [
+                Sale.objects.filter(store_id=pk, sale_date__gte=starts['month']).aggregate(total=Sum(LINE_VALUE))
+                for pk in store_ids
+            ],
+            'purchases per store, this month': lambda: [
+                Purchase.objects.filter(store_id=pk, purchase_date__gte=starts['month']).aggregate(total=Sum(LINE_VALUE))
+                for pk in store_ids
+            ],
+            'purchases per supplier, this year': lambda: [
+                Purchase.objects.filter(supplier_id=pk, purchase_date__gte=starts['year']).aggregate(total=Sum(LINE_VALUE))
+                for pk in supplier_ids
+            ],
+            'sales report per store': lambda: [
+                period_report(Sale.objects.filter(store_id=pk), 'sale_date', sales=LINE_VALUE, profit=LINE_PROFIT)
+                for pk in store_ids
+            ],
+        }
+
+        timings = {}
+        for label, query in queries.items():
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+        return timings
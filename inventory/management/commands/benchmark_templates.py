@@ -0,0 +1,116 @@
+from datetime import date
+from decimal import Decimal
+from time import perf_counter
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+
+# Loading templates without the cached loader, as with the default
+# configuration before Django 4.1: read and compiled on every render.
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def _money(i):
+    return Decimal(i * 7919 % 10000000) / 100
+
+
+def _product(i):
+    return SimpleNamespace(name=f'Product {i}')
+
+
+# Template -> function building a context with that many rows.
+CONTEXTS = {
+    'inventory/inventory_value_report.html': lambda rows: {
+        'inventory': [{'product__name': f'Product {i}', 'total_value': _money(i)} for i in range(rows)],
+        'total_inventory_value': sum(_money(i) for i in range(rows)),
+    },
+    'inventory/summary.html': lambda rows: {
+        'store_totals': [{'store__name': f'Store {i}', 'total_value': _money(i)} for i in range(rows)],
+        'totals': {period: _money(rows) for period in ('day', 'week', 'month', 'year')},
+    },
+    'inventory/sales_report_by_store.html': lambda rows: {
+        'data': [
+            {'store': f'Store {i}', 'total_quantity': i, 'total_revenue': _money(i)} for i in range(rows)
+        ],
+        'computed_at': None,
+    },
+    'inventory/profit_loss_full.html': lambda rows: {
+        'store': SimpleNamespace(name='Store 1'),
+        'period': {'start': None, 'end': None},
+        'purchases': [
+            SimpleNamespace(product=_product(i), quantity=i % 50 + 1, unit_price=_money(i), purchase_date=date.today())
+            for i in range(rows)
+        ],
+        'sales': [
+            SimpleNamespace(product=_product(i), quantity=i % 5 + 1, unit_price=_money(i), cost=_money(i) / 2,
+                            sale_date=date.today())
+            for i in range(rows)
+        ],
+        'stock': [
+            SimpleNamespace(product=_product(i), quantity=i % 500, cost_value=_money(i)) for i in range(rows)
+        ],
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the report templates with synthetic rows and time each one compiled on every render, from the '
+        'cached loader, and with its {% cache %} fragments already cached. No database is used.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append', help='Rows per table (repeatable). Default 10000 and 100000.')
+        parser.add_argument('--template', action='append', dest='templates', help='Only render this template (repeatable).')
+        parser.add_argument('--repeat', type=int, default=1, help='Best of this many renders is reported.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        templates = options['templates'] or list(CONTEXTS)
+        unknown = set(templates) - set(CONTEXTS)
+        if unknown:
+            raise CommandError(f'No context for {", ".join(sorted(unknown))}; choose from {", ".join(CONTEXTS)}')
+
+        request = RequestFactory().get('/')
+        request.user = User(username='benchmark', is_staff=True, is_superuser=True)
+        uncached = DjangoTemplates({
+            'NAME': 'uncached',
+            'DIRS': settings.TEMPLATES[0]['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS'], 'loaders': UNCACHED_LOADERS},
+        })
+        cached = engines['django']
+        cache = caches['default']
+
+        self.stdout.write(f"{'template':<42} {'rows':>7} {'compiled ms':>12} {'cached ms':>10} {'fragment ms':>12}")
+        with override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'):
+            for name in templates:
+                for rows in options['rows'] or [10000, 100000]:
+                    context = CONTEXTS[name](rows)
+
+                    def render(engine, clear=True):
+                        if clear:
+                            cache.clear()
+                        started = perf_counter()
+                        engine.get_template(name).render(context, request)
+                        return (perf_counter() - started) * 1000
+
+                    compiled = min(render(uncached) for _ in range(options['repeat']))
+                    render(cached)
+                    loaded = min(render(cached) for _ in range(options['repeat']))
+                    render(cached)
+                    fragment = min(render(cached, clear=False) for _ in range(options['repeat']))
+                    self.stdout.write(f'{name:<42} {rows:>7} {compiled:>12.1f} {loaded:>10.1f} {fragment:>12.1f}')
+        cache.clear()
@@ -0,0 +1,71 @@
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import benchmarks
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, request every inventory URL and record query counts and timings. '
+        'Fails if a view needs more queries than the baseline, or is slower past --tolerance.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=5)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--suppliers', type=int, default=10)
+        parser.add_argument('--purchases', type=int, default=5000)
+        parser.add_argument('--sales', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3, help='Best of this many requests is reported.')
+        parser.add_argument('--view', action='append', dest='views', help='Only benchmark this URL name (repeatable).')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed slowdown, as a fraction of the baseline time.')
+        parser.add_argument('--update-baseline', action='store_true', help='Store these results as the new baseline.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        sizes = {name: options[name] for name in ('stores', 'products', 'suppliers', 'purchases', 'sales', 'seed')}
+        results = self.measure(sizes, options['repeat'], options['views'])
+
+        self.stdout.write(f"{'view':<28} {'status':>6} {'queries':>8} {'ms':>9}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<28} {result['status']:>6} {result['queries']:>8} {result['ms']:>9.1f}")
+        if options['output']:
+            benchmarks.save(options['output'], results, sizes)
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            benchmarks.save(baseline_path, results, sizes)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f'No baseline at {baseline_path}; run with --update-baseline to create one.')
+            return
+
+        problems = benchmarks.regressions(results, benchmarks.load(baseline_path), options['tolerance'])
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f'{len(problems)} regressions against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
+
+    def measure(self, sizes, repeat, views):
+        request_logger = logging.getLogger('inventory.requests')
+        level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+        try:
+            self.stdout.write(f"Seeding {sizes['purchases']} purchases and {sizes['sales']} sales...")
+            with benchmarks.seeded_database(sizes) as (client, _):
+                return benchmarks.run(client, repeat, views)
+        finally:
+            request_logger.setLevel(level)
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importers import DEFAULT_BATCH_SIZE, TransactionImporter, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import purchase and sale lines from a CSV or JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        def progress(result):
+            self.stdout.write(f'{result.rows} rows, {result.rows_per_second:.0f} rows/sec')
+
+        importer = TransactionImporter(batch_size=options['batch_size'])
+        if path == '-':
+            result = importer.run(read_rows(sys.stdin, fmt), progress=progress)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(e)
+            with stream:
+                result = importer.run(read_rows(stream, fmt), progress=progress)
+
+        for line, error in result.errors:
+            self.stderr.write(f'line {line}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.purchases} purchases and {result.sales} sales from {result.rows} rows '
+            f'in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/sec), {len(result.errors)} rejected'
+        ))
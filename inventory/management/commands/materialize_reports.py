@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import materialize
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every store's sales, purchases, profit/loss and inventory value into the StoreReport "
+        'table, spreading the stores over a pool of worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Pool size; defaults to the number of CPUs. 0 works in this process.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=None, help='Stores per task.')
+        parser.add_argument('--resume', action='store_true', help='Only compute the stores the latest run did not reach.')
+
+    def handle(self, *args, **options):
+        if options['processes'] is not None and options['processes'] < 0:
+            raise CommandError('--processes must not be negative')
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} stores ({done * 100 // total}%)')
+
+        run_started, count = materialize.run(
+            processes=options['processes'],
+            chunk_size=options['chunk_size'],
+            resume=options['resume'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Materialized {count} store reports for the run started {run_started}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stock snapshots from the stock movement ledger, then check that the movements '
+        'add up to the current Stock quantities.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', choices=snapshots.INTERVALS, default='month', help='Snapshot at the end of each week or month.')
+        parser.add_argument('--check-only', action='store_true', help='Only compare the ledger with Stock.')
+
+    def handle(self, *args, **options):
+        if not options['check_only']:
+            count = snapshots.rebuild(options['interval'])
+            self.stdout.write(self.style.SUCCESS(f'Wrote {count} stock snapshot rows'))
+
+        mismatches = snapshots.discrepancies()
+        for store_id, product_id, stock, ledger in mismatches:
+            self.stdout.write(f'store {store_id} product {product_id}: stock {stock}, ledger {ledger}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} stock rows do not match the movement ledger')
+        self.stdout.write(self.style.SUCCESS('Stock matches the movement ledger'))
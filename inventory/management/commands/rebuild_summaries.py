@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import SalesSummary, StoreSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-store purchase and sales summaries from the Purchase and Sale tables.'
+
+    def handle(self, *args, **options):
+        for summary in (StoreSummary, SalesSummary):
+            count = summary.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} {summary._meta.verbose_name} rows'))
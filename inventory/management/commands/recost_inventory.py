@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory import costing
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay every store and product from its first stock movement, recomputing the cost layers, the cost '
+        'of each sale and the cost value of the stock with the INVENTORY_COSTING method.'
+    )
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} stores ({done * 100 // total}%)')
+
+        count = costing.rebuild(progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Replayed {count} store/product pairs with {costing.method()} costing'))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued report and export jobs in a pool of worker processes, storing the results under '
+        'MEDIA_ROOT. Several workers may share the queue.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help='Pool size; defaults to the number of CPUs.')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between checks of an empty queue.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument(
+            '--stale-after', type=int, default=60,
+            help='Requeue jobs a dead worker left running for more than this many minutes.',
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] is not None and options['processes'] < 1:
+            raise CommandError('--processes must be at least 1')
+        try:
+            count = jobs.run_worker(
+                processes=options['processes'],
+                poll=options['poll'],
+                once=options['once'],
+                stale_after=timedelta(minutes=options['stale_after']),
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert a deterministic synthetic dataset: stores, products, suppliers, a stock row for every '
+        '(store, product) pair, and purchase and sale lines spread over the last --days days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=10)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--suppliers', type=int, default=20)
+        parser.add_argument('--purchases', type=int, default=100000)
+        parser.add_argument('--sales', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for name in ('stores', 'products', 'suppliers', 'days', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+
+        started = time.perf_counter()
+        counts = synthetic.seed(
+            stores=options['stores'], products=options['products'], suppliers=options['suppliers'],
+            purchases=options['purchases'], sales=options['sales'], days=options['days'],
+            seed=options['seed'], batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        self.stdout.write(', '.join(f'{count} {name}' for name, count in counts.items()))
+        self.stdout.write(self.style.SUCCESS(f'Inserted {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/sec)'))
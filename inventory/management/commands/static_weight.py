@@ -0,0 +1,80 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from inventory import assets, benchmarks
+
+
+# Admin pages weighed alongside the inventory views.
+ADMIN_PAGES = ('admin:index', 'admin:inventory_sale_changelist', 'admin:inventory_sale_add')
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every inventory page and the main admin pages from a seeded throwaway database and report the '
+        'static files each one loads from STATIC_ROOT: their count and bytes as collected, gzipped and brotli-'
+        'compressed. Run collectstatic first. Fails if a page sends more than --budget kB.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, help='Most kB of static files a page may send, compressed.')
+        parser.add_argument('--page', action='append', dest='pages', help='Only weigh this URL name (repeatable).')
+
+    def handle(self, *args, **options):
+        if not os.path.isfile(os.path.join(settings.STATIC_ROOT, 'staticfiles.json')):
+            raise CommandError(f'No staticfiles.json in {settings.STATIC_ROOT}; run collectstatic first.')
+
+        weights = self.measure(options['pages'])
+        self.stdout.write(f"{'page':<32} {'files':>5} {'kB':>8} {'gzip kB':>8} {'br kB':>8} {'external':>8}")
+        for name, weight in weights.items():
+            self.stdout.write(
+                f'{name:<32} {weight.files:>5} {weight.bytes / 1024:>8.1f} '
+                f'{weight.gzip_bytes / 1024:>8.1f} {weight.brotli_bytes / 1024:>8.1f} {len(weight.external):>8}'
+            )
+
+        # asset -> pages that load it, so shared assets are reported once.
+        problems = {}
+        for name, weight in weights.items():
+            for asset in weight.missing:
+                problems.setdefault(f'{asset} is not in STATIC_ROOT', []).append(name)
+            for asset in weight.unhashed:
+                problems.setdefault(f'{asset} has no content hash in its name', []).append(name)
+            for url in weight.external:
+                problems.setdefault(f'{url} is loaded from another site', []).append(name)
+        for problem, names in sorted(problems.items()):
+            self.stderr.write(f'{problem} ({len(names)} pages)')
+
+        budget = options['budget']
+        if budget is not None:
+            over = [name for name, weight in weights.items() if weight.brotli_bytes / 1024 > budget]
+            if over:
+                raise CommandError(f'{len(over)} pages send more than {budget:g} kB of static files: {", ".join(over)}')
+            self.stdout.write(self.style.SUCCESS(f'Every page sends at most {budget:g} kB of static files'))
+
+    def measure(self, pages):
+        request_logger = logging.getLogger('inventory.requests')
+        level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+        sizes = {'stores': 2, 'products': 20, 'suppliers': 2, 'purchases': 50, 'sales': 50, 'seed': 0}
+        try:
+            with benchmarks.seeded_database(sizes, settings.STATICFILES_STORAGE) as (client, _):
+                paths = {
+                    name: path for name, path in benchmarks.view_urls().items()
+                    # The async variants render the same templates.
+                    if name not in benchmarks.ASYNC_VARIANTS.values()
+                }
+                paths.update((name, reverse(name)) for name in ADMIN_PAGES)
+                weights = {}
+                for name, path in paths.items():
+                    if pages and name not in pages:
+                        continue
+                    response = client.get(path)
+                    if response.streaming or not response.get('Content-Type', '').startswith('text/html'):
+                        continue
+                    weights[name] = assets.weigh(response.content.decode(response.charset or 'utf-8'))
+                return weights
+        finally:
+            request_logger.setLevel(level)
@@ -0,0 +1,115 @@
+# inventory/materialize.py
+"""
+Precomputed per-store report totals.
+
+``run()`` computes every store's sales, purchases, profit/loss and inventory
+value and upserts them into ``StoreReport``, which the per-store sales
+report reads. Stores are split into chunks that a pool of spawned processes
+works through, each with its own database connection; every chunk costs
+three grouped queries and one upsert, whatever the number of stores in it.
+
+Each row records when the run that wrote it started. ``run(resume=True)``
+carries on with the latest run, computing only the stores it has not
+written yet.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import django
+from django.db import connections
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import Purchase, Sale, Stock, Store, StoreReport
+from .reports import LINE_VALUE
+from .signals import ledger_changed
+
+
+FIELDS = ['sales_quantity', 'sales_value', 'purchases_quantity', 'purchases_value', 'profit_loss', 'inventory_value']
+
+# Chunks per pool process, so a slow chunk does not hold up the end of a run.
+CHUNKS_PER_PROCESS = 4
+
+
+def store_totals(store_ids):
+    """``{store_id: {field: value}}`` for each of ``FIELDS``."""
+    totals = {pk: dict.fromkeys(FIELDS, 0) for pk in store_ids}
+    for model, prefix in ((Sale, 'sales'), (Purchase, 'purchases')):
+        rows = model.objects.filter(store_id__in=store_ids).values('store_id').annotate(
+            units=Sum('quantity'), value=Sum(LINE_VALUE),
+        ).order_by()
+        for row in rows:
+            totals[row['store_id']][f'{prefix}_quantity'] = row['units'] or 0
+            totals[row['store_id']][f'{prefix}_value'] = row['value'] or 0
+    rows = Stock.objects.filter(store_id__in=store_ids).values('store_id').annotate(value=Sum('cost_value')).order_by()
+    for row in rows:
+        totals[row['store_id']]['inventory_value'] = row['value'] or 0
+    for values in totals.values():
+        values['profit_loss'] = values['sales_value'] - values['purchases_value']
+    return totals
+
+
+def materialize(store_ids, run_started):
+    """Compute and upsert the reports of ``store_ids``. Returns how many were written."""
+    computed_at = timezone.now()
+    StoreReport.objects.bulk_create(
+        [
+            StoreReport(store_id=pk, run_started=run_started, computed_at=computed_at, **values)
+            for pk, values in store_totals(store_ids).items()
+        ],
+        update_conflicts=True,
+        unique_fields=['store'],
+        update_fields=FIELDS + ['run_started', 'computed_at'],
+    )
+    return len(store_ids)
+
+
+def latest_run():
+    return StoreReport.objects.aggregate(latest=Max('run_started'))['latest']
+
+
+def pending_stores(run_started):
+    """Ids of the stores the run started at ``run_started`` has not written."""
+    return list(
+        Store.objects.exclude(storereport__run_started=run_started).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def run(processes=None, chunk_size=None, resume=False, progress=None):
+    """
+    Materialize every store's report, or with ``resume`` those the latest
+    run has not reached. ``processes=0`` works in this process. ``progress``
+    is called with ``(stores done, stores to do)`` after each chunk.
+    Returns ``(run_started, stores written)``.
+    """
+    run_started = (resume and latest_run()) or timezone.now()
+    store_ids = pending_stores(run_started)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if not chunk_size:
+        chunk_size = max(1, -(-len(store_ids) // max(1, processes * CHUNKS_PER_PROCESS)))
+    chunks = [store_ids[i:i + chunk_size] for i in range(0, len(store_ids), chunk_size)]
+
+    done = 0
+    if processes == 0:
+        for chunk in chunks:
+            done += materialize(chunk, run_started)
+            if progress:
+                progress(done, len(store_ids))
+        ledger_changed.send(sender=StoreReport)
+        return run_started, done
+
+    # Spawned processes set Django up afresh and open their own connections.
+    connections.close_all()
+    with ProcessPoolExecutor(processes, mp_context=get_context('spawn'), initializer=django.setup) as pool:
+        futures = [pool.submit(materialize, chunk, run_started) for chunk in chunks]
+        for future in as_completed(futures):
+            done += future.result()
+            if progress:
+                progress(done, len(store_ids))
+    # Sent here rather than from the pool, whose processes have their own
+    # locmem caches.
+    ledger_changed.send(sender=StoreReport)
+    return run_started, done
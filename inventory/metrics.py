@@ -0,0 +1,192 @@
+# inventory/metrics.py
+"""
+Per-request instrumentation.
+
+``RequestMetricsMiddleware`` measures each request's wall time, number of
+SQL queries, time spent in SQL and time spent rendering templates. Each
+sample goes to a bounded in-process ring buffer, summarised per URL name by
+``report()``, and to the ``inventory.requests`` logger as one JSON line.
+
+Queries are counted by an execute wrapper added to each database connection
+and templates are timed by wrapping the Django template backend's
+``render()``, so nothing depends on ``DEBUG`` and the cost is a couple of
+``perf_counter()`` calls per query and per page. The middleware works for
+sync and async requests; per-request state lives in a context variable,
+which follows async ORM calls into their worker thread. Streaming responses
+are timed up to the first byte.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import threading
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import Template
+
+
+logger = logging.getLogger('inventory.requests')
+
+DEFAULT_BUFFER_SIZE = 5000
+PERCENTILES = (50, 95, 99)
+
+_current = contextvars.ContextVar('inventory_request_metrics', default=None)
+_lock = threading.Lock()
+_buffer = None
+
+
+@dataclass
+class Sample:
+    view: str
+    method: str
+    status: int
+    wall_ms: float = 0.0
+    sql_ms: float = 0.0
+    queries: int = 0
+    template_ms: float = 0.0
+
+
+class _Collector:
+    __slots__ = ('queries', 'sql', 'template', 'rendering')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.rendering = False
+
+
+def samples():
+    """The ring buffer, created on first use with ``REQUEST_METRICS_BUFFER_SIZE`` slots."""
+    global _buffer
+    if _buffer is None:
+        with _lock:
+            if _buffer is None:
+                _buffer = deque(maxlen=getattr(settings, 'REQUEST_METRICS_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+    return _buffer
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile of an already sorted list.
+    index = max(0, -(-len(values) * pct // 100) - 1)
+    return values[index]
+
+
+def report():
+    """Per-view request count and p50/p95/p99 of each measurement, slowest p95 first."""
+    by_view = defaultdict(list)
+    for sample in list(samples()):
+        by_view[sample.view].append(sample)
+
+    rows = []
+    for view, view_samples in by_view.items():
+        row = {'view': view, 'requests': len(view_samples)}
+        for field in ('wall_ms', 'sql_ms', 'queries', 'template_ms'):
+            values = sorted(getattr(sample, field) for sample in view_samples)
+            row[field] = {f'p{pct}': round(percentile(values, pct), 2) for pct in PERCENTILES}
+            row[field]['max'] = round(values[-1], 2)
+        rows.append(row)
+    rows.sort(key=lambda row: row['wall_ms']['p95'], reverse=True)
+    return rows
+
+
+def _count_query(execute, sql, params, many, context):
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.queries += 1
+        collector.sql += perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # First in the list, so execute_wrapper() blocks that pop the last
+    # wrapper on exit leave it in place.
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_query)
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, *args, **kwargs):
+        collector = _current.get()
+        # Only the outermost render is timed; it includes any nested ones.
+        if collector is None or collector.rendering:
+            return render(self, *args, **kwargs)
+        collector.rendering = True
+        started = perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            collector.template += perf_counter() - started
+            collector.rendering = False
+    wrapper.timed = True
+    return wrapper
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if not getattr(Template.render, 'timed', False):
+            Template.render = _timed_render(Template.render)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        # Connections opened before this module was loaded.
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(None, connection)
+        collector = _Collector()
+        token = _current.set(collector)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, collector, started)
+        return response
+
+    async def __acall__(self, request):
+        collector = _Collector()
+        token = _current.set(collector)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, collector, started)
+        return response
+
+    def record(self, request, response, collector, started):
+        match = request.resolver_match
+        sample = Sample(
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=response.status_code,
+            wall_ms=(perf_counter() - started) * 1000,
+            sql_ms=collector.sql * 1000,
+            queries=collector.queries,
+            template_ms=collector.template * 1000,
+        )
+        samples().append(sample)
+        if logger.isEnabledFor(logging.INFO):
+            fields = {name: round(value, 3) if isinstance(value, float) else value for name, value in asdict(sample).items()}
+            logger.info(json.dumps({'event': 'request', 'path': request.path, **fields}))
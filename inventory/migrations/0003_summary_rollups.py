@@ -0,0 +1,71 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:33
+
+from datetime import date, timedelta
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    today = date.today()
+    starts = {
+        'day': today,
+        'week': today - timedelta(days=today.weekday()),
+        'month': today.replace(day=1),
+        'year': today.replace(month=1, day=1),
+    }
+    value = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    for ledger, date_field, summary, prefix in (
+        ('Purchase', 'purchase_date', 'StoreSummary', 'total_purchases'),
+        ('Sale', 'sale_date', 'SalesSummary', 'total_sales'),
+    ):
+        Ledger = apps.get_model('inventory', ledger)
+        Summary = apps.get_model('inventory', summary)
+        rows = Ledger.objects.values('store').annotate(
+            total=Sum(value),
+            **{period: Sum(value, filter=Q(**{f'{date_field}__gte': start})) for period, start in starts.items()}
+        )
+        Summary.objects.all().delete()
+        Summary.objects.bulk_create([
+            Summary(
+                store_id=row['store'],
+                total_value=row['total'],
+                as_of=today,
+                **{f'{prefix}_{period}': row[period] or 0 for period in starts}
+            )
+            for row in rows
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_storesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storesummary',
+            name='as_of',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('as_of', models.DateField(blank=True, null=True)),
+                ('total_sales_day', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_sales_week', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_sales_month', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_sales_year', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
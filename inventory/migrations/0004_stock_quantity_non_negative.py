@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_summary_rollups'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.CheckConstraint(check=models.Q(('quantity__gte', 0)), name='stock_quantity_non_negative'),
+        ),
+    ]
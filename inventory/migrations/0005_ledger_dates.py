@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:36
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stock_quantity_non_negative'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchase',
+            name='purchase_date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='sale_date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:38
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_stock(apps, schema_editor):
+    # Fold duplicate (store, product) rows into the oldest one so the unique
+    # constraint can be added.
+    Stock = apps.get_model('inventory', 'Stock')
+    duplicates = (
+        Stock.objects.values('store', 'product')
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        Stock.objects.filter(pk=row['keep']).update(quantity=row['total'])
+        Stock.objects.filter(store=row['store'], product=row['product']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_ledger_dates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['store', 'purchase_date'], name='purchase_store_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['supplier', 'purchase_date'], name='purchase_supplier_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['store', 'sale_date'], name='sale_store_date_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.UniqueConstraint(fields=('store', 'product'), name='stock_store_product_unique'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.2 on 2026-10-18 08:48
+
+import datetime
+from collections import defaultdict
+from datetime import date
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_movements(apps, schema_editor):
+    # Replay existing purchases and sales, then add one adjustment per stock
+    # row for whatever the ledger does not explain (manual edits so far).
+    Purchase = apps.get_model('inventory', 'Purchase')
+    Sale = apps.get_model('inventory', 'Sale')
+    Stock = apps.get_model('inventory', 'Stock')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+
+    totals = defaultdict(int)
+    batch = []
+    rows = [
+        (Purchase, 'purchase', 'purchase_date', 1),
+        (Sale, 'sale', 'sale_date', -1),
+    ]
+    for model, kind, date_field, sign in rows:
+        for pk, store_id, product_id, quantity, day in model.objects.values_list(
+            'pk', 'store_id', 'product_id', 'quantity', date_field
+        ).iterator():
+            totals[(store_id, product_id)] += sign * quantity
+            batch.append(StockMovement(
+                store_id=store_id, product_id=product_id, delta=sign * quantity, kind=kind,
+                occurred_on=day, **{f'{kind}_id': pk},
+            ))
+            if len(batch) >= 1000:
+                StockMovement.objects.bulk_create(batch)
+                batch = []
+
+    for store_id, product_id, quantity in Stock.objects.values_list('store_id', 'product_id', 'quantity').iterator():
+        difference = quantity - totals.pop((store_id, product_id), 0)
+        if difference:
+            batch.append(StockMovement(
+                store_id=store_id, product_id=product_id, delta=difference, kind='adjustment', occurred_on=date.today(),
+            ))
+    # Pairs with ledger rows but no stock row hold nothing now.
+    for (store_id, product_id), total in totals.items():
+        if total:
+            batch.append(StockMovement(
+                store_id=store_id, product_id=product_id, delta=-total, kind='adjustment', occurred_on=date.today(),
+            ))
+    StockMovement.objects.bulk_create(batch, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_unique_ledger_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('kind', models.CharField(choices=[('purchase', 'Purchase'), ('sale', 'Sale'), ('adjustment', 'Adjustment'), ('removal', 'Removal')], max_length=20)),
+                ('occurred_on', models.DateField(default=datetime.date.today)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.purchase')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.sale')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'store', 'product'), name='snapshot_date_store_product_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['store', 'product', 'occurred_on'], name='movement_pair_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['occurred_on'], name='movement_date_idx'),
+        ),
+        migrations.RunPython(backfill_movements, migrations.RunPython.noop),
+    ]
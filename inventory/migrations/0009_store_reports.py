@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_quantity', models.IntegerField(default=0)),
+                ('sales_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('purchases_quantity', models.IntegerField(default=0)),
+                ('purchases_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit_loss', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('inventory_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('run_started', models.DateTimeField()),
+                ('computed_at', models.DateTimeField()),
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+            ],
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:18
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def value_at_list_price(apps, schema_editor):
+    # Start from the list-price valuation the reports used so far: existing
+    # sales cost their list price, and each stock row becomes one layer at
+    # it. manage.py recost_inventory replaces this with purchase costs.
+    Product = apps.get_model('inventory', 'Product')
+    Sale = apps.get_model('inventory', 'Sale')
+    Stock = apps.get_model('inventory', 'Stock')
+    CostLayer = apps.get_model('inventory', 'CostLayer')
+
+    price = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    Sale.objects.update(cost=F('quantity') * price)
+    Stock.objects.update(cost_value=F('quantity') * price)
+    today = date.today()
+    CostLayer.objects.bulk_create((
+        CostLayer(store_id=store_id, product_id=product_id, quantity=quantity, unit_cost=unit_cost, received_on=today)
+        for store_id, product_id, quantity, unit_cost in Stock.objects.filter(quantity__gt=0).values_list(
+            'store_id', 'product_id', 'quantity', 'product__price',
+        ).iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='cost',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='cost_value',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('received_on', models.DateField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', 'product'], name='cost_layer_pair_idx')],
+            },
+        ),
+        migrations.RunPython(value_at_list_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_ledger_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('received_on', models.DateField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', 'product', 'as_of'], name='cost_checkpoint_pair_idx')],
+            },
+        ),
+    ]
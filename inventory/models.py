@@ -1,9 +1,15 @@
 # inventory/models.py
 
-from django.db import models
-from django.db.models import Sum
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
 from django.utils import timezone
 
+from .reports import LINE_VALUE, PERIODS, PeriodTotals, period_aggregates, period_starts
+
 
 class Store(models.Model):
     name = models.CharField(max_length=100)
@@ -36,35 +42,383 @@ class Purchase(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=8, decimal_places=2)
-    purchase_date = models.DateField(auto_now_add=True)
+    purchase_date = models.DateField(default=date.today)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'purchase_date'], name='purchase_store_date_idx'),
+            models.Index(fields=['supplier', 'purchase_date'], name='purchase_supplier_date_idx'),
+            # For the admin's date drill-down across all stores.
+            models.Index(fields=['purchase_date'], name='purchase_date_idx'),
+        ]
 
     def __str__(self):
         return f'{self.product.name} - {self.purchase_date}'
-    
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                StoreSummary.add(self.store_id, self.get_total_price(), self.purchase_date)
+
     def get_total_price(self):
         return self.quantity * self.unit_price
 
 
+class Receipt(models.Model):
+    """The bill for a basket of sales rung up together by ``ledger.checkout()``."""
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'Receipt #{self.pk} - {self.store}'
+
+
 class Sale(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=8, decimal_places=2)
-    sale_date = models.DateField(auto_now_add=True)
+    sale_date = models.DateField(default=date.today)
+    receipt = models.ForeignKey(Receipt, null=True, blank=True, on_delete=models.PROTECT, related_name='sales')
+    # Cost of the goods sold, set by inventory.costing when the sale moves stock.
+    cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'sale_date'], name='sale_store_date_idx'),
+            models.Index(fields=['sale_date'], name='sale_date_idx'),
+        ]
 
     def __str__(self):
         return f'{self.product.name} - {self.sale_date}'
-    
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                SalesSummary.add(self.store_id, self.get_total_price(), self.sale_date)
+
     def get_total_price(self):
         return self.quantity * self.unit_price
 
 
+# Stock rows at or below their reorder level; a level of 0 turns alerts off.
+LOW_STOCK = Q(reorder_level__gt=0, quantity__lte=F('reorder_level'))
+
+
 class Stock(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
+    reorder_level = models.PositiveIntegerField(default=0, help_text='Alert when stock falls to this level; 0 for never.')
+    # What the quantity held cost, kept by inventory.costing.
+    cost_value = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=Q(quantity__gte=0), name='stock_quantity_non_negative'),
+            models.UniqueConstraint(fields=['store', 'product'], name='stock_store_product_unique'),
+        ]
+        indexes = [
+            # Holds only the low rows, so listing them reads no others.
+            models.Index(fields=['store', 'quantity'], condition=LOW_STOCK, name='stock_low_idx'),
+        ]
 
     def __str__(self):
         return f'{self.product.name} - {self.store.name}'
 
 
+class StockMovement(models.Model):
+    """
+    One change to a store's stock of a product. Rows are only ever added, so
+    the sum of ``delta`` up to a date is the stock held at the end of it.
+    """
+    PURCHASE = 'purchase'
+    SALE = 'sale'
+    ADJUSTMENT = 'adjustment'
+    REMOVAL = 'removal'
+    KINDS = [
+        (PURCHASE, 'Purchase'),
+        (SALE, 'Sale'),
+        (ADJUSTMENT, 'Adjustment'),
+        (REMOVAL, 'Removal'),
+    ]
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    delta = models.IntegerField()
+    kind = models.CharField(max_length=20, choices=KINDS)
+    occurred_on = models.DateField(default=date.today)
+    created_at = models.DateTimeField(default=timezone.now)
+    purchase = models.ForeignKey(Purchase, null=True, blank=True, on_delete=models.SET_NULL)
+    sale = models.ForeignKey(Sale, null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'product', 'occurred_on'], name='movement_pair_date_idx'),
+            models.Index(fields=['occurred_on'], name='movement_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product} {self.delta:+d} at {self.store} on {self.occurred_on}'
+
+
+class CostLayer(models.Model):
+    """
+    Stock of a product in a store received at one unit cost and not sold or
+    removed yet. Maintained by ``inventory.costing``; a pair's layers are
+    consumed in ``pk`` order.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4)
+    received_on = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'product'], name='cost_layer_pair_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product} at {self.unit_cost} in {self.store}'
+
+
+class CostCheckpoint(models.Model):
+    """
+    A pair's ``CostLayer`` as it stood at the end of ``as_of``, the last day
+    of a month before one the pair moved in. Written by ``inventory.costing``,
+    which replays a back-dated movement from the checkpoint before it. A
+    pair holding nothing that day has one row of ``quantity`` 0.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    as_of = models.DateField()
+    quantity = models.PositiveIntegerField()
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4)
+    received_on = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'product', 'as_of'], name='cost_checkpoint_pair_idx'),
+        ]
+
+
+class StockAlert(models.Model):
+    """
+    A period during which a store's stock of a product was at or below its
+    reorder level. At most one alert per pair is open (``resolved_at`` unset).
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    opened_at = models.DateTimeField(default=timezone.now)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store', 'product'], condition=Q(resolved_at__isnull=True), name='stock_alert_open_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Low stock of {self.product} at {self.store} since {self.opened_at}'
+
+
+class StockSnapshot(models.Model):
+    """Stock held at the end of ``date``, materialized from the movements."""
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    date = models.DateField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'store', 'product'], name='snapshot_date_store_product_unique'),
+        ]
+
+
+class PeriodSummary(models.Model):
+    """
+    Running per-store totals, kept up to date as ledger rows are written.
+
+    The day/week/month/year buckets hold the totals of the periods containing
+    ``as_of``; when a newer row arrives the buckets whose period has ended are
+    reset before the amount is added, so no periodic job is needed.
+    """
+    # Set by subclasses: the ledger model, its date field and bucket prefix.
+    ledger_model = None
+    date_field = None
+    bucket_prefix = None
+
+    store = models.OneToOneField(Store, on_delete=models.CASCADE)
+    total_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    as_of = models.DateField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f'{self.store} - {self.as_of}'
+
+    @classmethod
+    def bucket(cls, period):
+        return f'{cls.bucket_prefix}_{period}'
+
+    @classmethod
+    def add(cls, store_id, amount, day):
+        """Fold ``amount`` dated ``day`` into the store's running totals."""
+        amount = Decimal(str(amount))
+        with transaction.atomic():
+            cls.objects.get_or_create(store_id=store_id, defaults={'as_of': day})
+
+            # Common case: the row is for the newest day seen so far. Roll the
+            # buckets over and add in a single UPDATE so concurrent writers
+            # cannot lose each other's increments.
+            starts = period_starts(day)
+            updates = {'total_value': F('total_value') + amount, 'as_of': day}
+            for period in PERIODS:
+                field = cls.bucket(period)
+                updates[field] = Case(
+                    When(as_of__gte=starts[period], then=F(field) + amount),
+                    default=Value(amount),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                )
+            current = Q(as_of__lte=day) | Q(as_of__isnull=True)
+            if cls.objects.filter(current, store_id=store_id).update(**updates):
+                return
+
+            # Back-dated row: only the buckets whose period still covers
+            # ``day`` take the amount.
+            summary = cls.objects.select_for_update().get(store_id=store_id)
+            starts = period_starts(summary.as_of)
+            summary.total_value += amount
+            for period in PERIODS:
+                if day >= starts[period]:
+                    field = cls.bucket(period)
+                    setattr(summary, field, getattr(summary, field) + amount)
+            summary.save()
+
+    @classmethod
+    def totals_aggregates(cls, day=None):
+        starts = period_starts(day or date.today())
+        return {
+            'value_total': Sum('total_value'),
+            **{
+                f'value_{period}': Sum(cls.bucket(period), filter=Q(as_of__gte=starts[period]))
+                for period in PERIODS
+            },
+        }
+
+    @classmethod
+    def period_totals(cls, day=None):
+        """All-store ``PeriodTotals`` for the periods containing ``day`` (default today)."""
+        return PeriodTotals.from_row(cls.objects.aggregate(**cls.totals_aggregates(day)), 'value')
+
+    @classmethod
+    async def aperiod_totals(cls, day=None):
+        return PeriodTotals.from_row(await cls.objects.aaggregate(**cls.totals_aggregates(day)), 'value')
+
+    @classmethod
+    def rebuild(cls, day=None):
+        """Recompute every store's row from the ledger. Returns the row count."""
+        day = day or date.today()
+        rows = cls.ledger_model.objects.values('store').annotate(
+            **period_aggregates(cls.date_field, day, total=True, value=LINE_VALUE)
+        )
+        summaries = []
+        for row in rows:
+            totals = PeriodTotals.from_row(row, 'value')
+            summaries.append(cls(
+                store_id=row['store'],
+                total_value=totals.total,
+                as_of=day,
+                **{cls.bucket(period): getattr(totals, period) for period in PERIODS}
+            ))
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(summaries)
+        return len(summaries)
+
+
+class StoreSummary(PeriodSummary):
+    ledger_model = Purchase
+    date_field = 'purchase_date'
+    bucket_prefix = 'total_purchases'
+
+    total_purchases_day = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_purchases_week = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_purchases_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_purchases_year = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+
+class SalesSummary(PeriodSummary):
+    ledger_model = Sale
+    date_field = 'sale_date'
+    bucket_prefix = 'total_sales'
+
+    total_sales_day = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_sales_week = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_sales_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_sales_year = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+
+class StoreReport(models.Model):
+    """
+    A store's all-time report totals, precomputed by ``manage.py
+    materialize_reports``. ``run_started`` identifies the run that wrote the
+    row, so an interrupted run can be resumed.
+    """
+    store = models.OneToOneField(Store, on_delete=models.CASCADE)
+    sales_quantity = models.IntegerField(default=0)
+    sales_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchases_quantity = models.IntegerField(default=0)
+    purchases_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit_loss = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    inventory_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    run_started = models.DateTimeField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.store} report ({self.computed_at})'
+
+
+class Job(models.Model):
+    """
+    A report render or export queued from a view and run by ``manage.py
+    run_worker``. ``params`` holds the request's query parameters; the
+    output file is stored under ``MEDIA_ROOT``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    result = models.FileField(upload_to='jobs/', blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
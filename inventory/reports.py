@@ -0,0 +1,127 @@
+# inventory/reports.py
+"""
+Period reporting shared by the summary tables and the report views.
+
+Day, week, month and year totals are computed in one query using conditional
+aggregation (one ``Sum(..., filter=Q(...))`` per period) rather than one query
+per period.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+PERIODS = ('day', 'week', 'month', 'year')
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+# Value of a Sale/Purchase line, and margin of a Sale over its cost as
+# computed by inventory.costing.
+LINE_VALUE = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=MONEY)
+# Sales costing has not reached (no Sale.cost) count at list price, costing's
+# own fallback, rather than at no cost; profit_loss() reports how many.
+LINE_COST = Coalesce(
+    F('cost'), ExpressionWrapper(F('quantity') * F('product__price'), output_field=MONEY), output_field=MONEY,
+)
+LINE_PROFIT = ExpressionWrapper(F('quantity') * F('unit_price') - LINE_COST, output_field=MONEY)
+
+
+def period_starts(day):
+    # First day of the day/week/month/year periods containing ``day``.
+    # Weeks start on Monday, as in the purchase summary page.
+    return {
+        'day': day,
+        'week': day - timedelta(days=day.weekday()),
+        'month': day.replace(day=1),
+        'year': day.replace(month=1, day=1),
+    }
+
+
+@dataclass(frozen=True)
+class PeriodTotals:
+    day: Decimal = Decimal(0)
+    week: Decimal = Decimal(0)
+    month: Decimal = Decimal(0)
+    year: Decimal = Decimal(0)
+    # All-time total, when the source provides one.
+    total: Decimal = Decimal(0)
+
+    @classmethod
+    def from_row(cls, row, prefix):
+        fields = PERIODS + ('total',)
+        return cls(**{field: row.get(f'{prefix}_{field}') or Decimal(0) for field in fields})
+
+
+def period_aggregates(date_field, day, total=False, **values):
+    """
+    Build the aggregate expressions for each named value expression: one
+    filtered ``Sum`` per period, keyed ``<name>_<period>``, plus
+    ``<name>_total`` when ``total`` is set.
+    """
+    starts = period_starts(day)
+    aggregates = {}
+    for name, value in values.items():
+        for period in PERIODS:
+            aggregates[f'{name}_{period}'] = Sum(value, filter=Q(**{f'{date_field}__gte': starts[period]}))
+        if total:
+            aggregates[f'{name}_total'] = Sum(value)
+    return aggregates
+
+
+def period_report(queryset, date_field, day=None, **values):
+    """
+    Return ``{name: PeriodTotals}`` for each value expression over
+    ``queryset``, computed in a single query.
+
+        period_report(Sale.objects.all(), 'sale_date', sales=LINE_VALUE, profit=LINE_PROFIT)
+    """
+    day = day or date.today()
+    queryset = queryset.filter(**{f'{date_field}__range': (period_starts(day)['year'], day)})
+    row = queryset.aggregate(**period_aggregates(date_field, day, **values))
+    return {name: PeriodTotals.from_row(row, name) for name in values}
+
+
+async def aperiod_report(queryset, date_field, day=None, **values):
+    """``period_report()`` with the async ORM."""
+    day = day or date.today()
+    queryset = queryset.filter(**{f'{date_field}__range': (period_starts(day)['year'], day)})
+    row = await queryset.aaggregate(**period_aggregates(date_field, day, **values))
+    return {name: PeriodTotals.from_row(row, name) for name in values}
+
+
+def profit_loss(purchases, sales, stock, start=None, end=None):
+    """
+    Restrict ``purchases`` and ``sales`` to ``start``..``end`` (either may be
+    None) and return ``(purchases, sales, totals)`` with the purchase, sales
+    and stock value totals, the resulting profit or loss, and the cost of
+    the goods sold and gross profit. ``uncosted_sales`` counts the sales
+    whose cost was taken at list price.
+    """
+    if start:
+        purchases = purchases.filter(purchase_date__gte=start)
+        sales = sales.filter(sale_date__gte=start)
+    if end:
+        purchases = purchases.filter(purchase_date__lte=end)
+        sales = sales.filter(sale_date__lte=end)
+
+    total_purchases = purchases.aggregate(total=Sum(LINE_VALUE))['total'] or 0
+    sales_totals = sales.aggregate(
+        total=Sum(LINE_VALUE), total_cost=Sum(LINE_COST), uncosted=Count('pk', filter=Q(cost__isnull=True)),
+    )
+    total_sales = sales_totals['total'] or 0
+    cost_of_sales = sales_totals['total_cost'] or 0
+    stock_value = stock.aggregate(total=Sum('cost_value'))['total'] or 0
+    totals = {
+        'total_purchases': total_purchases,
+        'total_sales': total_sales,
+        'stock_value': stock_value,
+        'profit_loss': total_sales - total_purchases,
+        'cost_of_sales': cost_of_sales,
+        'gross_profit': total_sales - cost_of_sales,
+        'uncosted_sales': sales_totals['uncosted'],
+    }
+    return purchases, sales, totals
@@ -0,0 +1,155 @@
+# inventory/search.py
+"""
+Name search for the autocomplete widgets on the purchase, sale and stock
+forms.
+
+Every word typed must start a word of the name, so ``blu wid`` finds "Blue
+Widget". Products are matched through an index created by migration 0011:
+an FTS5 table kept in sync by triggers on SQLite, a trigram index on
+PostgreSQL. Other databases, and SQLite builds without FTS5, fall back to a
+``LIKE`` scan; stores and suppliers are few enough to always match that way.
+
+Results are kept in a small per-process LRU cache. Saving or deleting a
+product, store or supplier clears it, and entries expire after
+``SEARCH_CACHE_TIMEOUT`` seconds so changes made in other processes show up.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product, Store, Supplier
+
+
+FTS_TABLE = 'inventory_product_fts'
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TIMEOUT = 60
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache whose entries expire after ``timeout`` seconds."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LRUCache(
+                    getattr(settings, 'SEARCH_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+                    getattr(settings, 'SEARCH_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT),
+                )
+    return _cache
+
+
+def clear():
+    cache().clear()
+
+
+def _words(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def _has_fts():
+    if connection.vendor != 'sqlite':
+        return False
+    # Looked up once per connection; the table only changes with migrations.
+    if not hasattr(connection, 'inventory_fts'):
+        connection.inventory_fts = FTS_TABLE in connection.introspection.table_names()
+    return connection.inventory_fts
+
+
+def _by_name(model, words, limit, fields):
+    # "starts with the word, or has it after a space": word prefixes, as FTS5 matches them.
+    match = Q()
+    for word in words:
+        match &= Q(name__istartswith=word) | Q(name__icontains=f' {word}')
+    return list(model.objects.filter(match).order_by('name', 'pk').values(*fields)[:limit])
+
+
+def products(words, limit):
+    if not _has_fts():
+        return _by_name(Product, words, limit, ['id', 'name', 'price'])
+    # Only \w characters reach here, so quoting each word is enough to keep
+    # the FTS5 query well-formed.
+    query = ' AND '.join(f'"{word}"*' for word in words)
+    rows = Product.objects.raw(
+        f'SELECT p.id, p.name, p.price FROM inventory_product p '
+        f'JOIN {FTS_TABLE} f ON f.rowid = p.id '
+        f'WHERE {FTS_TABLE} MATCH %s ORDER BY f.rank, p.name LIMIT %s',
+        [query, limit],
+    )
+    return [{'id': row.id, 'name': row.name, 'price': row.price} for row in rows]
+
+
+def stores(words, limit):
+    return _by_name(Store, words, limit, ['id', 'name'])
+
+
+def suppliers(words, limit):
+    return _by_name(Supplier, words, limit, ['id', 'name'])
+
+
+SEARCHES = {
+    'product': products,
+    'store': stores,
+    'supplier': suppliers,
+}
+
+
+def search(kind, text, limit=DEFAULT_LIMIT):
+    """Up to ``limit`` ``{'id', 'name', ...}`` dicts of ``kind`` matching ``text``."""
+    words = _words(text)
+    if not words:
+        return []
+    key = (kind, tuple(words), limit)
+    rows = cache().get(key)
+    if rows is None:
+        rows = SEARCHES[kind](words, limit)
+        cache().set(key, rows)
+    return rows
@@ -0,0 +1,43 @@
+# inventory/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import dashboard, search, versioning
+from .models import Product, Purchase, Sale, Stock, Store, Supplier
+
+
+# Sent after writes that bypass post_save, i.e. the ledger's bulk_create()
+# and queryset update() calls, recosting and materialized reports.
+ledger_changed = Signal()
+
+# Sent with ``alerts``, the StockAlert rows just opened, when stock falls to
+# its reorder level. Connect to it to notify someone.
+low_stock = Signal()
+
+
+@receiver(ledger_changed)
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def ledger_written(sender, **kwargs):
+    # Act now, and again once the transaction commits in case a request
+    # cached the old data in between.
+    for func in (dashboard.invalidate, versioning.bump):
+        func()
+        transaction.on_commit(func)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def names_changed(sender, **kwargs):
+    search.clear()
+    # Names and list prices show in cached reports too.
+    ledger_written(sender)
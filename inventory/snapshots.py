@@ -0,0 +1,159 @@
+# inventory/snapshots.py
+"""
+Point-in-time stock levels from the ``StockMovement`` ledger.
+
+``rebuild()`` materializes the stock of every (store, product) pair at the
+end of each week or month into ``StockSnapshot``. ``stock_on()`` then answers
+"what did we hold on day X" from the nearest snapshot plus the movements
+since, so at most one interval of movements is scanned. Snapshots stop at
+yesterday; the ledger adds back-dated movements to the snapshots of their
+pairs taken since with ``add_back_dated()``.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Max, Min, Sum, When
+
+from .models import Stock, StockMovement, StockSnapshot
+
+
+INTERVALS = ('week', 'month')
+
+
+def period_end(day, interval):
+    if interval == 'week':
+        return day + timedelta(days=6 - day.weekday())
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def snapshot_dates(first, last, interval):
+    """Ends of the periods from the one containing ``first`` that are over by ``last``."""
+    dates = []
+    day = period_end(first, interval)
+    while day <= last:
+        dates.append(day)
+        day = period_end(day + timedelta(days=1), interval)
+    return dates
+
+
+def rebuild(interval='month', today=None, batch_size=2000):
+    """Replace all snapshots, returning how many rows were written."""
+    today = today or date.today()
+    with transaction.atomic():
+        StockSnapshot.objects.all().delete()
+        first = StockMovement.objects.aggregate(first=Min('occurred_on'))['first']
+        if first is None:
+            return 0
+        dates = snapshot_dates(first, today - timedelta(days=1), interval)
+        if not dates:
+            return 0
+
+        levels = defaultdict(int)
+        batch = []
+        count = 0
+
+        def take(day):
+            nonlocal batch, count
+            for (store_id, product_id), quantity in levels.items():
+                batch.append(StockSnapshot(store_id=store_id, product_id=product_id, date=day, quantity=quantity))
+            if len(batch) >= batch_size:
+                StockSnapshot.objects.bulk_create(batch, batch_size=batch_size)
+                count += len(batch)
+                batch = []
+
+        pending = iter(dates)
+        next_date = next(pending)
+        rows = (
+            StockMovement.objects.filter(occurred_on__lte=dates[-1])
+            .values('occurred_on', 'store_id', 'product_id')
+            .annotate(delta=Sum('delta'))
+            .order_by('occurred_on')
+        )
+        for row in rows.iterator():
+            while next_date is not None and row['occurred_on'] > next_date:
+                take(next_date)
+                next_date = next(pending, None)
+            levels[(row['store_id'], row['product_id'])] += row['delta']
+        while next_date is not None:
+            take(next_date)
+            next_date = next(pending, None)
+
+        StockSnapshot.objects.bulk_create(batch, batch_size=batch_size)
+        return count + len(batch)
+
+
+def add_back_dated(movements, today=None):
+    """
+    Add the ``movements`` dated before ``today`` to the snapshots of their
+    pairs taken on or after that date, leaving other pairs' snapshots alone.
+    """
+    today = today or date.today()
+    movements = [movement for movement in movements if movement.occurred_on < today and movement.delta]
+    if not movements:
+        return
+    earliest = min(movement.occurred_on for movement in movements)
+    dates = list(StockSnapshot.objects.filter(date__gte=earliest).values_list('date', flat=True).distinct().order_by())
+    changes = defaultdict(int)
+    for movement in movements:
+        for day in dates:
+            if day >= movement.occurred_on:
+                changes[(day, movement.store_id, movement.product_id)] += movement.delta
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    # Snapshots only hold the pairs moved by then; a pair's first movement
+    # may be the back-dated one.
+    StockSnapshot.objects.bulk_create(
+        [StockSnapshot(date=day, store_id=store_id, product_id=product_id, quantity=0) for day, store_id, product_id in changes],
+        ignore_conflicts=True,
+    )
+    pks = {
+        (day, store_id, product_id): pk
+        for pk, day, store_id, product_id in StockSnapshot.objects.filter(
+            date__in={day for day, _, _ in changes},
+            store_id__in={store_id for _, store_id, _ in changes},
+            product_id__in={product_id for _, _, product_id in changes},
+        ).values_list('pk', 'date', 'store_id', 'product_id')
+        if (day, store_id, product_id) in changes
+    }
+    StockSnapshot.objects.filter(pk__in=pks.values()).update(quantity=Case(
+        *[When(pk=pk, then=F('quantity') + changes[key]) for key, pk in pks.items()],
+        default=F('quantity'),
+        output_field=StockSnapshot._meta.get_field('quantity'),
+    ))
+
+
+def stock_on(day, store=None, product=None):
+    """Return ``{(store_id, product_id): quantity}`` held at the end of ``day``."""
+    snapshot_date = StockSnapshot.objects.filter(date__lte=day).aggregate(latest=Max('date'))['latest']
+    snapshots = StockSnapshot.objects.filter(date=snapshot_date)
+    movements = StockMovement.objects.filter(occurred_on__lte=day)
+    if snapshot_date is not None:
+        movements = movements.filter(occurred_on__gt=snapshot_date)
+    if store is not None:
+        snapshots, movements = snapshots.filter(store=store), movements.filter(store=store)
+    if product is not None:
+        snapshots, movements = snapshots.filter(product=product), movements.filter(product=product)
+
+    levels = defaultdict(int)
+    if snapshot_date is not None:
+        for store_id, product_id, quantity in snapshots.values_list('store_id', 'product_id', 'quantity'):
+            levels[(store_id, product_id)] = quantity
+    for row in movements.values('store_id', 'product_id').annotate(total=Sum('delta')).order_by():
+        levels[(row['store_id'], row['product_id'])] += row['total']
+    return dict(levels)
+
+
+def discrepancies():
+    """``(store_id, product_id, stock, ledger)`` for each pair where ``Stock`` and the movements disagree."""
+    stock = {(store_id, product_id): quantity for store_id, product_id, quantity in
+             Stock.objects.values_list('store_id', 'product_id', 'quantity')}
+    ledger = {(row['store_id'], row['product_id']): row['total'] for row in
+              StockMovement.objects.values('store_id', 'product_id').annotate(total=Sum('delta')).order_by()}
+    return [
+        (store_id, product_id, stock.get((store_id, product_id), 0), ledger.get((store_id, product_id), 0))
+        for store_id, product_id in sorted(stock.keys() | ledger.keys())
+        if stock.get((store_id, product_id), 0) != ledger.get((store_id, product_id), 0)
+    ]
@@ -0,0 +1,114 @@
+# inventory/synthetic.py
+"""
+Deterministic synthetic data for benchmarks.
+
+The same arguments always produce the same stores, products, suppliers and
+ledger rows, so timings taken on different branches are comparable.
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import CostLayer, Product, Purchase, Sale, SalesSummary, Stock, StockMovement, Store, StoreSummary, Supplier
+from .signals import ledger_changed
+
+
+def _created_ids(model, count):
+    return sorted(model.objects.order_by('-pk').values_list('pk', flat=True)[:count])
+
+
+def _cents(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def seed(stores=10, products=200, suppliers=20, purchases=10000, sales=10000,
+         days=3 * 365, seed=0, batch_size=5000, today=None):
+    """
+    Insert a synthetic dataset with ``bulk_create`` and return the row counts.
+
+    Ledger rows are spread over the ``days`` days up to ``today``. Stock rows
+    are created for every (store, product) pair and the summary tables are
+    rebuilt at the end.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = today - timedelta(days=days - 1)
+
+    with transaction.atomic():
+        Store.objects.bulk_create([
+            Store(name=f'Store {i:04d}', address=f'Region {i % 25}') for i in range(stores)
+        ])
+        store_ids = _created_ids(Store, stores)
+        Product.objects.bulk_create([
+            Product(name=f'Product {i:06d}', price=_cents(rng.uniform(1, 500))) for i in range(products)
+        ], batch_size=batch_size)
+        product_ids = _created_ids(Product, products)
+        prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'price'))
+        Supplier.objects.bulk_create([
+            Supplier(name=f'Supplier {i:04d}', address=f'Region {i % 25}') for i in range(suppliers)
+        ])
+        supplier_ids = _created_ids(Supplier, suppliers)
+
+        stock = [
+            Stock(store_id=store_id, product_id=product_id, quantity=rng.randint(0, 500))
+            for store_id in store_ids
+            for product_id in product_ids
+        ]
+        # Opening stock is valued at list price, as one cost layer per row.
+        for row in stock:
+            row.cost_value = row.quantity * prices[row.product_id]
+        Stock.objects.bulk_create(stock, batch_size=batch_size)
+        CostLayer.objects.bulk_create([
+            CostLayer(
+                store_id=row.store_id, product_id=row.product_id, quantity=row.quantity,
+                unit_cost=prices[row.product_id], received_on=first_day,
+            )
+            for row in stock if row.quantity
+        ], batch_size=batch_size)
+        # The seeded ledger rows do not move stock; the movement history is
+        # just the opening quantities.
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                store_id=row.store_id, product_id=row.product_id, delta=row.quantity,
+                kind=StockMovement.ADJUSTMENT, occurred_on=first_day,
+            )
+            for row in stock
+        ], batch_size=batch_size)
+
+        def ledger_rows(model, date_field, count, margin, costed=False, **extra):
+            # Generated and inserted batch by batch to keep memory flat.
+            for start in range(0, count, batch_size):
+                batch = []
+                for _ in range(min(batch_size, count - start)):
+                    product_id = rng.choice(product_ids)
+                    fields = {
+                        'store_id': rng.choice(store_ids),
+                        'product_id': product_id,
+                        'quantity': rng.randint(1, 50),
+                        'unit_price': _cents(prices[product_id] * Decimal(str(rng.uniform(*margin)))),
+                        date_field: first_day + timedelta(days=rng.randrange(days)),
+                    }
+                    fields.update({name: rng.choice(choices) for name, choices in extra.items()})
+                    if costed:
+                        fields['cost'] = fields['quantity'] * prices[product_id]
+                    batch.append(model(**fields))
+                model.objects.bulk_create(batch)
+
+        ledger_rows(Purchase, 'purchase_date', purchases, (0.6, 0.9), supplier_id=supplier_ids)
+        ledger_rows(Sale, 'sale_date', sales, (1.1, 1.5), costed=True)
+
+        StoreSummary.rebuild(today)
+        SalesSummary.rebuild(today)
+        ledger_changed.send(sender=Stock)
+
+    return {
+        'stores': stores,
+        'products': products,
+        'suppliers': suppliers,
+        'stock': stores * products,
+        'purchases': purchases,
+        'sales': sales,
+    }
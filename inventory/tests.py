@@ -1,3 +1,1262 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import zlib
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.db.utils import ConnectionHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import admin, alerts, assets, benchmarks, checks, costing, importers, jobs, ledger, listings, materialize, metrics, search, signals, snapshots, synthetic, versioning
+from .models import (
+    CostCheckpoint, CostLayer, Job, Product, Purchase, Receipt, Sale, SalesSummary, Stock, StockAlert, StockMovement,
+    StockSnapshot, Store, StoreReport, StoreSummary, Supplier,
+)
+from .reports import LINE_PROFIT, LINE_VALUE, PeriodTotals, aperiod_report, period_report, profit_loss
+
+
+def setUpModule():
+    # Keep the per-request log lines out of the test output.
+    logging.getLogger('inventory.requests').setLevel(logging.WARNING)
+
+
+def tearDownModule():
+    logging.getLogger('inventory.requests').setLevel(logging.NOTSET)
+
+
+# The manifest storage needs collectstatic output, which tests don't have.
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class QueryCountTests(TestCase):
+    """
+    Each list view must run the same number of queries however many rows it
+    shows. The counts include the two session/user lookups of a logged-in
+    request.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Dar es Salaam')
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.count = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.count += 1
+            store = Store.objects.create(name=f'Store {self.count}', address='Mwanza')
+            supplier = Supplier.objects.create(name=f'Supplier {self.count}', address='Arusha')
+            for product_store in (store, self.store):
+                product = Product.objects.create(name=f'Product {self.count}', price=10)
+                Stock.objects.create(store=product_store, product=product, quantity=5)
+                Purchase.objects.create(
+                    store=product_store, product=product, supplier=supplier, quantity=5, unit_price=8
+                )
+                Sale.objects.create(store=product_store, product=product, quantity=2, unit_price=12)
+
+    def assertConstantQueries(self, num, url):
+        for count in (1, 5):
+            self.add_rows(count)
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_homepage(self):
+        self.assertConstantQueries(9, reverse('home'))
+
+    def test_products(self):
+        self.assertConstantQueries(3, reverse('products'))
+
+    def test_product_stock_report(self):
+        self.assertConstantQueries(3, reverse('stock_report'))
+
+    def test_stock_data(self):
+        self.assertConstantQueries(3, reverse('stock'))
+
+    def test_profit_loss(self):
+        self.assertConstantQueries(12, reverse('profit_loss', args=[self.store.pk]))
+
+    def test_supplier_purchase_history(self):
+        self.assertConstantQueries(3, reverse('supplier-purchase'))
+
+    def test_sales_report_by_store(self):
+        # Not materialized: the store reports check plus the live totals
+        self.assertConstantQueries(4, reverse('sales_report_by_store'))
+
+    def test_stock_listing(self):
+        self.assertConstantQueries(3, reverse('api_stock'))
+
+    def test_sales_listing(self):
+        self.assertConstantQueries(3, reverse('api_sales') + f'?store={self.store.pk}')
+
+    def test_purchases_listing(self):
+        self.assertConstantQueries(3, reverse('api_purchases') + '?limit=3')
+
+    def test_timeseries(self):
+        self.assertConstantQueries(7, reverse('api_timeseries') + '?granularity=week')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+
+    def test_cached_until_ledger_changes(self):
+        ledger.record_purchase(self.store, self.product, self.supplier, 5, 8)
+        self.client.get(reverse('home'))
+        # Only the session and user lookups once the payload is cached
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Geita Store Stock: 5')
+
+        ledger.record_sale(self.store, self.product, 2, 12)
+        self.assertContains(self.client.get(reverse('home')), 'Geita Store Stock: 3')
+
+        ledger.apply_stock_deltas({(self.store.pk, self.product.pk): 4})
+        self.assertContains(self.client.get(reverse('home')), 'Geita Store Stock: 7')
+
+    def test_inventory_value_table_cached_until_ledger_changes(self):
+        ledger.record_purchase(self.store, self.product, self.supplier, 5, 8)
+        self.assertContains(self.client.get(reverse('inventory_value')), 'Total Inventory Value: TZS 40<')
+        # The cached table needs neither the rows nor the total
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('inventory_value'))
+        self.assertContains(response, 'Total Inventory Value: TZS 40<')
+
+        ledger.record_sale(self.store, self.product, 2, 12)
+        self.assertContains(self.client.get(reverse('inventory_value')), 'Total Inventory Value: TZS 24<')
+
+        self.product.name = 'Renamed Product'
+        self.product.save()
+        self.assertContains(self.client.get(reverse('inventory_value')), 'Renamed Product')
+
+    def test_commands_change_ledger_version(self):
+        ledger.record_purchase(self.store, self.product, self.supplier, 5, 8)
+        for command, options in (('recost_inventory', {}), ('materialize_reports', {'processes': 0})):
+            version = versioning.ledger_version()
+            call_command(command, stdout=StringIO(), **options)
+            self.assertNotEqual(versioning.ledger_version(), version, command)
+
+    def test_lists_every_store(self):
+        Store.objects.create(name='Dodoma Store', address='Dodoma')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Geita Store Stock: 0')
+        self.assertContains(response, 'Dodoma Store Stock: 0')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TimeSeriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        self.today = date.today()
+        ledger.record_purchase(self.store, self.product, self.supplier, 10, 8)
+        Purchase.objects.update(purchase_date=self.today - timedelta(days=2))
+        StockMovement.objects.filter(kind=StockMovement.PURCHASE).update(occurred_on=self.today - timedelta(days=2))
+        ledger.record_sale(self.store, self.product, 4, 12)
+        self.params = {'start': self.today - timedelta(days=3)}
+
+    def test_daily_series(self):
+        data = self.client.get(reverse('api_timeseries'), self.params).json()
+        self.assertEqual(data['labels'], [str(self.today - timedelta(days=n)) for n in (3, 2, 1, 0)])
+        self.assertEqual([float(value) for value in data['totals']['purchases']], [0, 80, 0, 0])
+        self.assertEqual([float(value) for value in data['totals']['sales']], [0, 0, 0, 48])
+        self.assertEqual(data['totals']['stock'], [0, 10, 10, 6])
+
+    def test_downsampled(self):
+        data = self.client.get(reverse('api_timeseries'), {**self.params, 'max_points': 2}).json()
+        self.assertEqual(len(data['labels']), 2)
+        self.assertEqual([float(value) for value in data['totals']['purchases']], [80, 0])
+        self.assertEqual(data['totals']['stock'], [10, 6])
+
+    def test_start_after_end(self):
+        future = {'start': self.today + timedelta(days=1)}
+        self.assertEqual(self.client.get(reverse('api_timeseries'), future).status_code, 400)
+        backwards = {'start': self.today, 'end': self.today - timedelta(days=1)}
+        self.assertEqual(self.client.get(reverse('api_timeseries'), backwards).status_code, 400)
+
+    def test_nothing_after_end_counted(self):
+        # Today's sale falls in the last weekly bucket when the week began
+        # before yesterday, but is after ``end``.
+        params = {**self.params, 'end': self.today - timedelta(days=1), 'granularity': 'week'}
+        data = self.client.get(reverse('api_timeseries'), params).json()
+        self.assertEqual(sum(float(value) for value in data['totals']['sales']), 0)
+        self.assertEqual(sum(float(value) for value in data['totals']['purchases']), 80)
+        self.assertEqual(data['totals']['stock'][-1], 10)
+
+    def test_not_modified_until_ledger_changes(self):
+        response = self.client.get(reverse('api_timeseries'), self.params)
+        etag = response['ETag']
+        response = self.client.get(reverse('api_timeseries'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        ledger.record_sale(self.store, self.product, 1, 12)
+        response = self.client.get(reverse('api_timeseries'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class StockMovementTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.other_store = Store.objects.create(name='Mwanza Store', address='Mwanza')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+
+    def test_every_change_is_recorded(self):
+        ledger.record_purchase(self.store, self.product, self.supplier, 10, 8)
+        ledger.record_sale(self.store, self.product, 3, 12)
+        stock = Stock.objects.get(store=self.store, product=self.product)
+        ledger.set_stock(stock.pk, self.store, self.product, 5)
+        ledger.apply_stock_deltas({(self.store.pk, self.product.pk): 2})
+        ledger.set_stock(stock.pk, self.other_store, self.product, 4)
+
+        kinds = list(StockMovement.objects.order_by('pk').values_list('kind', 'delta'))
+        self.assertEqual(kinds, [
+            ('purchase', 10), ('sale', -3), ('adjustment', -2), ('adjustment', 2), ('removal', -7), ('adjustment', 4),
+        ])
+        self.assertEqual(snapshots.discrepancies(), [])
+
+        ledger.delete_stock(stock.pk)
+        self.assertEqual(snapshots.discrepancies(), [])
+        self.assertEqual(snapshots.stock_on(date.today()), {(self.store.pk, self.product.pk): 0,
+                                                           (self.other_store.pk, self.product.pk): 0})
+
+    def test_discrepancy_reported(self):
+        ledger.record_purchase(self.store, self.product, self.supplier, 10, 8)
+        Stock.objects.update(quantity=12)
+        self.assertEqual(snapshots.discrepancies(), [(self.store.pk, self.product.pk, 12, 10)])
+
+    def test_stock_on_uses_snapshots(self):
+        today = date.today()
+        for days_ago, quantity in ((70, 10), (40, 5), (3, 1)):
+            ledger.adjust_stock(self.store, self.product, quantity, occurred_on=today - timedelta(days=days_ago))
+        history = {days_ago: snapshots.stock_on(today - timedelta(days=days_ago)) for days_ago in (80, 50, 20, 0)}
+
+        self.assertGreater(snapshots.rebuild('month'), 0)
+        pair = (self.store.pk, self.product.pk)
+        for days_ago, levels in history.items():
+            self.assertEqual(snapshots.stock_on(today - timedelta(days=days_ago)).get(pair, 0), levels.get(pair, 0))
+        # Latest snapshot date, its rows, and the movements since
+        with self.assertNumQueries(3):
+            snapshots.stock_on(today)
+        self.assertEqual(history[20][pair], 15)
+
+        # A back-dated movement is added to its pair's snapshots since;
+        # other pairs' snapshots are left alone.
+        other = (self.other_store.pk, self.product.pk)
+        ledger.adjust_stock(self.other_store, self.product, 4, occurred_on=today - timedelta(days=75))
+        untouched = list(StockSnapshot.objects.filter(store=self.store).order_by('date').values_list('date', 'quantity'))
+        ledger.adjust_stock(self.store, self.product, 2, occurred_on=today - timedelta(days=60))
+        self.assertEqual(
+            list(StockSnapshot.objects.filter(store=self.store).order_by('date').values_list('date', 'quantity')),
+            [(day, quantity + 2 if day >= today - timedelta(days=60) else quantity) for day, quantity in untouched],
+        )
+        self.assertEqual(snapshots.stock_on(today - timedelta(days=20))[pair], 17)
+        self.assertEqual(snapshots.stock_on(today - timedelta(days=20))[other], 4)
+        self.assertEqual(snapshots.stock_on(today - timedelta(days=80)), {})
+        rebuilt = snapshots.stock_on(today - timedelta(days=20)), snapshots.stock_on(today - timedelta(days=50))
+        snapshots.rebuild('month')
+        self.assertEqual((snapshots.stock_on(today - timedelta(days=20)), snapshots.stock_on(today - timedelta(days=50))), rebuilt)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class StockAlertTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        ledger.record_purchase(self.store, self.product, self.supplier, 20, 8)
+        self.stock = Stock.objects.get()
+        ledger.set_stock(self.stock.pk, self.store, self.product, 20, reorder_level=5)
+
+    def open_alerts(self):
+        return StockAlert.objects.filter(resolved_at__isnull=True)
+
+    def test_opened_and_resolved_by_ledger(self):
+        opened = []
+        signals.low_stock.connect(lambda sender, alerts, **kwargs: opened.extend(alerts), weak=False, dispatch_uid='test')
+        self.addCleanup(signals.low_stock.disconnect, dispatch_uid='test')
+
+        ledger.record_sale(self.store, self.product, 14, 12)
+        self.assertFalse(self.open_alerts().exists())
+        ledger.record_sale(self.store, self.product, 1, 12)
+        self.assertEqual(self.open_alerts().count(), 1)
+        self.assertEqual(len(opened), 1)
+        # Still low: the open alert is kept, not duplicated
+        ledger.record_sale(self.store, self.product, 2, 12)
+        self.assertEqual(StockAlert.objects.count(), 1)
+
+        ledger.apply_stock_deltas({(self.store.pk, self.product.pk): 10})
+        self.assertFalse(self.open_alerts().exists())
+        self.assertEqual(len(opened), 1)
+
+        # Raising the level alone opens one again
+        ledger.set_stock(self.stock.pk, self.store, self.product, 13, reorder_level=15)
+        self.assertEqual(self.open_alerts().count(), 1)
+        ledger.delete_stock(self.stock.pk)
+        self.assertFalse(self.open_alerts().exists())
+
+    def test_feed_and_dashboard(self):
+        ledger.record_sale(self.store, self.product, 14, 12)
+        ledger.record_sale(self.store, self.product, 2, 12)
+        with self.assertNumQueries(4):
+            data = self.client.get(reverse('api_alerts')).json()
+        alert, = data['alerts']
+        self.assertEqual((alert['store_name'], alert['product_name'], alert['quantity']), ('Geita Store', 'Product', 4))
+        # 16 units over 28 days, two weeks of cover beyond the level of 5
+        self.assertEqual(alert['daily_sales'], 0.57)
+        self.assertEqual(alert['suggested_quantity'], 5 + 8 - 4)
+        self.assertIsNotNone(alert['opened_at'])
+        self.assertEqual(self.client.get(reverse('api_alerts'), {'store': self.store.pk + 1}).json()['alerts'], [])
+
+        self.assertContains(self.client.get(reverse('home')), '4/5, order 9')
+
+    def test_suggested_quantity(self):
+        self.assertEqual(alerts.suggested_quantity(0, 10, 2.5, cover_days=14), 45)
+        self.assertEqual(alerts.suggested_quantity(30, 10, 0), 0)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class SearchTests(TestCase):
+    def setUp(self):
+        search.clear()
+        self.addCleanup(search.clear)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.widget = Product.objects.create(name='Blue Widget', price=10)
+        Product.objects.create(name='Red widget large', price=12)
+        Product.objects.create(name='Bluetooth Gadget', price=15)
+        Store.objects.create(name='Geita Store', address='Geita')
+        Supplier.objects.create(name='Arusha Traders', address='Arusha')
+
+    def names(self, kind, text):
+        return [row['name'] for row in search.search(kind, text)]
+
+    def test_word_prefixes(self):
+        self.assertEqual(self.names('product', 'blu wid'), ['Blue Widget'])
+        self.assertEqual(sorted(self.names('product', 'WIDG')), ['Blue Widget', 'Red widget large'])
+        self.assertEqual(self.names('product', 'idget'), [])
+        self.assertEqual(self.names('product', '"*'), [])
+        self.assertEqual(self.names('store', 'sto'), ['Geita Store'])
+        self.assertEqual(self.names('supplier', 'trad'), ['Arusha Traders'])
+
+    def test_index_follows_changes(self):
+        self.widget.name = 'Green Sprocket'
+        self.widget.save()
+        self.assertEqual(self.names('product', 'blue'), ['Bluetooth Gadget'])
+        self.assertEqual(self.names('product', 'spro'), ['Green Sprocket'])
+        self.widget.delete()
+        self.assertEqual(self.names('product', 'spro'), [])
+
+    def test_cached(self):
+        self.names('product', 'blue')
+        with self.assertNumQueries(0):
+            self.names('product', ' Blue ')
+        Product.objects.create(name='Blue Sprocket', price=3)
+        self.assertEqual(len(self.names('product', 'blue')), 3)
+
+        lru = search.LRUCache(maxsize=2, timeout=60)
+        for key in 'abc':
+            lru.set(key, key)
+        self.assertEqual((lru.get('a'), lru.get('c'), len(lru)), (None, 'c', 2))
+
+    def test_endpoint_and_forms(self):
+        data = self.client.get(reverse('api_search', kwargs={'kind': 'product'}), {'q': 'blue w'}).json()
+        self.assertEqual(data['results'], [{'id': self.widget.pk, 'name': 'Blue Widget', 'price': '10.00'}])
+        self.assertEqual(self.client.get(reverse('api_search', kwargs={'kind': 'product'}), {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_search', kwargs={'kind': 'user'}), {'q': 'a'}).status_code, 404)
+
+        # The forms no longer list every product
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('add_purchased_product'))
+        self.assertNotContains(response, 'Bluetooth Gadget')
+        self.assertContains(response, reverse('api_search', kwargs={'kind': 'supplier'}))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CheckoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.soap = Product.objects.create(name='Soap', price=2)
+        self.rice = Product.objects.create(name='Rice', price=5)
+        supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        ledger.record_purchase(self.store, self.soap, supplier, 10, 1)
+        ledger.record_purchase(self.store, self.rice, supplier, 3, 4)
+
+    def post(self, basket):
+        return self.client.post(reverse('api_checkout'), json.dumps(basket), content_type='application/json')
+
+    def quantities(self):
+        return dict(Stock.objects.values_list('product__name', 'quantity'))
+
+    def test_checkout(self):
+        response = self.post({'store': self.store.pk, 'lines': [
+            {'product': self.soap.pk, 'quantity': 4},
+            {'product': self.rice.pk, 'quantity': 3, 'unit_price': '4.50'},
+            {'product': self.soap.pk, 'quantity': 1, 'unit_price': '1.50'},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        receipt = Receipt.objects.get(pk=response.json()['receipt'])
+        self.assertEqual(receipt.total, 8 + 13.5 + 1.5)
+        self.assertEqual(receipt.sales.count(), 3)
+        self.assertEqual(self.quantities(), {'Soap': 5, 'Rice': 0})
+        self.assertEqual(StockMovement.objects.filter(kind=StockMovement.SALE, sale__receipt=receipt).count(), 3)
+        self.assertEqual(SalesSummary.objects.get(store=self.store).total_sales_day, receipt.total)
+
+        page = self.client.get(response.json()['url'])
+        self.assertContains(page, 'Receipt #%d' % receipt.pk)
+        self.assertContains(page, '23.00')
+
+    def test_rejected_baskets_change_nothing(self):
+        response = self.post({'store': self.store.pk, 'lines': [
+            {'product': self.soap.pk, 'quantity': 2},
+            {'product': self.rice.pk, 'quantity': 2},
+            {'product': self.rice.pk, 'quantity': 2},
+        ]})
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Rice', response.json()['errors']['lines'][0])
+
+        self.assertEqual(self.post({'store': self.store.pk, 'lines': [{'product': 999, 'quantity': 1}]}).status_code, 400)
+        self.assertEqual(self.post({'store': self.store.pk, 'lines': [{'product': self.soap.pk, 'quantity': 0}]}).status_code, 400)
+        self.assertEqual(self.post({'store': self.store.pk + 1, 'lines': [{'product': self.soap.pk, 'quantity': 1}]}).status_code, 400)
+        self.assertEqual(self.post({'store': self.store.pk, 'lines': []}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api_checkout'), 'not json', content_type='application/json').status_code, 400)
+
+        self.assertFalse(Receipt.objects.exists())
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(self.quantities(), {'Soap': 10, 'Rice': 3})
+
+
+
+class CostingTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+
+    def purchase(self, quantity, unit_price, days_ago=0):
+        ledger.record_batch(purchases=[Purchase(
+            store=self.store, product=self.product, supplier=self.supplier, quantity=quantity,
+            unit_price=unit_price, purchase_date=date.today() - timedelta(days=days_ago),
+        )])
+
+    def sell(self, quantity, days_ago=0):
+        sale = Sale(
+            store=self.store, product=self.product, quantity=quantity, unit_price=12,
+            sale_date=date.today() - timedelta(days=days_ago),
+        )
+        ledger.record_batch(sales=[sale])
+        return sale
+
+    def costs(self):
+        return list(Sale.objects.order_by('pk').values_list('cost', flat=True)), Stock.objects.get().cost_value
+
+    def test_fifo(self):
+        self.purchase(10, 4)
+        self.purchase(10, 6)
+        self.sell(15)
+        self.assertEqual(self.costs(), ([10 * 4 + 5 * 6], 5 * 6))
+        self.assertEqual(list(CostLayer.objects.values_list('quantity', 'unit_cost')), [(5, 6)])
+
+        # Stock added without a purchase comes in at the average cost held
+        ledger.adjust_stock(self.store, self.product, 5)
+        self.sell(10)
+        self.assertEqual(self.costs(), ([70, 60], 0))
+
+        _, _, totals = profit_loss(Purchase.objects.all(), Sale.objects.all(), Stock.objects.all())
+        self.assertEqual((totals['cost_of_sales'], totals['gross_profit']), (130, 25 * 12 - 130))
+        self.assertEqual(Sale.objects.aggregate(profit=Sum(LINE_PROFIT))['profit'], 25 * 12 - 130)
+
+    @override_settings(INVENTORY_COSTING=costing.AVERAGE)
+    def test_average(self):
+        self.purchase(10, 4)
+        self.purchase(10, 6)
+        self.sell(15)
+        self.assertEqual(self.costs(), ([75], 25))
+        self.assertEqual(CostLayer.objects.count(), 1)
+
+    def test_back_dated(self):
+        self.purchase(10, 6, days_ago=2)
+        self.sell(5, days_ago=1)
+        self.sell(3)
+        self.assertEqual(self.costs(), ([30, 18], 12))
+
+        # An older, cheaper lot is sold first once it is recorded
+        self.purchase(6, 2, days_ago=3)
+        self.assertEqual(self.costs(), ([10, 2 + 2 * 6], 8 * 6))
+
+        before = self.costs(), list(CostLayer.objects.values_list('quantity', 'unit_cost'))
+        self.assertEqual(costing.rebuild(), 1)
+        self.assertEqual((self.costs(), list(CostLayer.objects.values_list('quantity', 'unit_cost'))), before)
+
+    def test_back_dated_replays_from_checkpoint(self):
+        for days_ago, quantity, unit_price in ((200, 10, 4), (140, 10, 6), (20, 5, 8)):
+            self.purchase(quantity, unit_price, days_ago=days_ago)
+        for days_ago, quantity in ((170, 2), (110, 5), (80, 5), (50, 3)):
+            self.sell(quantity, days_ago=days_ago)
+        back_dated = date.today() - timedelta(days=60)
+        restored = CostCheckpoint.objects.filter(as_of__lt=back_dated).latest('as_of').as_of
+        since = StockMovement.objects.filter(occurred_on__gt=restored).count()
+
+        with mock.patch.object(costing, '_cost', wraps=costing._cost) as cost:
+            self.purchase(4, 2, days_ago=60)
+        # The new purchase and what came after the checkpoint, not the
+        # whole history.
+        self.assertEqual(len(cost.call_args.args[0]), since + 1)
+        self.assertLess(since + 1, StockMovement.objects.count())
+
+        def state():
+            return self.costs(), sorted(CostCheckpoint.objects.values_list('as_of', 'quantity', 'unit_cost'))
+
+        before = state()
+        costing.rebuild()
+        self.assertEqual(state(), before)
+
+    def test_uncosted_sales_at_list_price(self):
+        self.purchase(10, 4)
+        self.sell(5)
+        Sale.objects.update(cost=None)
+
+        _, _, totals = profit_loss(Purchase.objects.all(), Sale.objects.all(), Stock.objects.all())
+        self.assertEqual((totals['cost_of_sales'], totals['uncosted_sales']), (5 * 10, 1))
+        self.assertEqual(Sale.objects.aggregate(profit=Sum(LINE_PROFIT))['profit'], 5 * 12 - 5 * 10)
+
+        costing.rebuild()
+        _, _, totals = profit_loss(Purchase.objects.all(), Sale.objects.all(), Stock.objects.all())
+        self.assertEqual((totals['cost_of_sales'], totals['uncosted_sales']), (5 * 4, 0))
+
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        self.count = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.count += 1
+            store = Store.objects.create(name=f'Store {self.count}', address='Mwanza')
+            product = Product.objects.create(name=f'Product {self.count}', price=10)
+            ledger.record_purchase(store, product, self.supplier, 5, 8)
+            ledger.record_sale(store, product, 2, 12)
+
+    def test_changelists_constant_queries(self):
+        for model in ('sale', 'purchase', 'stock'):
+            url = reverse(f'admin:inventory_{model}_changelist')
+            counts = []
+            for rows in (1, 5):
+                self.add_rows(rows)
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                counts.append(len(queries))
+            self.assertEqual(counts[0], counts[1], model)
+
+    def test_writes_go_through_ledger(self):
+        store = Store.objects.create(name='Geita Store', address='Geita')
+        product = Product.objects.create(name='Product', price=10)
+        last_week = date.today() - timedelta(days=7)
+
+        def add(model, **data):
+            return self.client.post(reverse(f'admin:inventory_{model}_add'), {'store': store.pk, 'product': product.pk, **data})
+
+        response = add('purchase', supplier=self.supplier.pk, quantity=5, unit_price='8.00', purchase_date=last_week)
+        self.assertEqual(response.status_code, 302)
+        response = add('sale', quantity=6, unit_price='12.00', sale_date=date.today())
+        self.assertContains(response, 'Geita Store only has 5 of Product in stock.')
+        self.assertEqual(add('sale', quantity=2, unit_price='12.00', sale_date=date.today()).status_code, 302)
+        self.assertEqual(Sale.objects.get().cost, 16)
+        self.assertEqual(StoreSummary.objects.get(store=store).total_value, 40)
+
+        stock = Stock.objects.get()
+        response = self.client.post(reverse('admin:inventory_stock_change', args=[stock.pk]), {
+            'store': store.pk, 'product': product.pk, 'quantity': 4, 'reorder_level': 4,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(StockAlert.objects.filter(store=store, product=product, resolved_at__isnull=True).exists())
+        self.client.post(reverse('admin:inventory_stock_delete', args=[stock.pk]), {'post': 'yes'})
+        self.assertFalse(Stock.objects.exists())
+        self.assertEqual(add('stock', quantity=3, reorder_level=0).status_code, 302)
+
+        self.assertEqual(list(StockMovement.objects.order_by('pk').values_list('kind', 'delta', 'occurred_on')), [
+            ('purchase', 5, last_week), ('sale', -2, date.today()), ('adjustment', 1, date.today()),
+            ('removal', -4, date.today()), ('adjustment', 3, date.today()),
+        ])
+        self.assertEqual(snapshots.discrepancies(), [])
+
+        # Sales and purchases are not changed or deleted behind the ledger
+        sale = Sale.objects.get()
+        self.assertEqual(self.client.get(reverse('admin:inventory_sale_delete', args=[sale.pk])).status_code, 403)
+        response = self.client.get(reverse('admin:inventory_sale_change', args=[sale.pk]))
+        self.assertFalse(response.context['has_change_permission'])
+        self.client.post(reverse('admin:inventory_sale_change', args=[sale.pk]), {'quantity': 50})
+        self.assertEqual(Sale.objects.get().quantity, 2)
+
+    def test_estimated_count(self):
+        self.add_rows(3)
+        Sale.objects.filter(pk=Sale.objects.order_by('pk').values('pk')[:1]).delete()
+        url = reverse('admin:inventory_sale_changelist')
+        self.addCleanup(setattr, admin.EstimatedCountPaginator, 'exact_below', admin.EstimatedCountPaginator.exact_below)
+        admin.EstimatedCountPaginator.exact_below = 0
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        # The highest id, although one row is gone
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+        # Filtered lists are counted
+        response = self.client.get(url, {'store__id__exact': Store.objects.order_by('pk').first().pk})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        self.assertEqual(self.client.get(url, {'q': 'Product 2'}).context['cl'].result_count, 1)
+
+        stock = Stock.objects.order_by('pk').first()
+        ledger.set_stock(stock.pk, stock.store, stock.product, stock.quantity, reorder_level=5)
+        response = self.client.get(reverse('admin:inventory_stock_changelist'), {'low': '1'})
+        self.assertEqual([row.pk for row in response.context['cl'].result_list], [stock.pk])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.samples().clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+
+    def test_samples_and_report(self):
+        with self.assertLogs('inventory.requests', 'INFO') as logs:
+            for _ in range(3):
+                self.client.get(reverse('products'))
+            self.client.get(reverse('api_stock'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'products')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], 3)
+        self.assertGreater(line['template_ms'], 0)
+
+        report = {row['view']: row for row in self.client.get(reverse('request_metrics')).json()['views']}
+        self.assertEqual(report['products']['requests'], 3)
+        self.assertEqual(report['products']['queries']['p95'], 3)
+        self.assertEqual(report['api_stock']['template_ms']['max'], 0)
+
+    def test_superuser_only(self):
+        self.client.force_login(User.objects.create_user('clerk', 'clerk@example.com', 'password'))
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 302)
+
+    def test_buffer_is_bounded(self):
+        buffer = metrics.samples()
+        for _ in range(buffer.maxlen + 10):
+            buffer.append(metrics.Sample('home', 'GET', 200))
+        self.assertEqual(len(buffer), buffer.maxlen)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.samples().clear()
+        synthetic.seed(stores=2, products=5, suppliers=2, purchases=30, sales=30)
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    async def test_same_content_as_sync_views(self):
+        for sync_name, async_name in benchmarks.ASYNC_VARIANTS.items():
+            response = await self.async_client.get(reverse(async_name))
+            self.assertEqual(response.status_code, 200, async_name)
+            await cache.aclear()
+            expected = await sync_to_async(self.client.get)(reverse(sync_name))
+            self.assertEqual(response.content, expected.content, async_name)
+
+    async def test_queries_counted(self):
+        await self.async_client.get(reverse('async_stock'))
+        sample = metrics.samples()[-1]
+        self.assertEqual(sample.view, 'async_stock')
+        # Session, user and the stock query
+        self.assertEqual(sample.queries, 3)
+
+    async def test_login_and_superuser_required(self):
+        path = reverse('async_stock')
+        clerk = await sync_to_async(User.objects.create_user)('clerk', 'clerk@example.com', 'password')
+        await sync_to_async(self.async_client.force_login)(clerk)
+        self.assertEqual((await self.async_client.get(path)).status_code, 302)
+
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(path)
+        self.assertRedirects(response, f'{reverse("login")}?next={path}', fetch_redirect_response=False)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class JobTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        ledger.record_purchase(self.store, self.product, self.supplier, 5, 8)
+        ledger.record_sale(self.store, self.product, 2, 12)
+
+    def run_job(self, response):
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], Job.QUEUED)
+        self.assertEqual(jobs.claim(5), [job['id']])
+        self.assertEqual(jobs.claim(5), [])
+        jobs.execute(job['id'])
+        return self.client.get(job['url']).json()
+
+    def test_export(self):
+        job = self.run_job(self.client.post(reverse('enqueue_export', args=['supplier-purchases']) + '?gzip=0'))
+        self.assertEqual(job['status'], Job.DONE)
+        response = self.client.get(job['download'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('Supplier,Product,Store'))
+        self.assertIn('Supplier,Product,Geita Store,8.00,5,40,', content)
+
+    def test_profit_loss(self):
+        url = reverse('enqueue_profit_loss', args=[self.store.pk])
+        job = self.run_job(self.client.post(url, QUERY_STRING=f'start={date.today()}'))
+        self.assertEqual(job['status'], Job.DONE)
+        content = b''.join(self.client.get(job['download']).streaming_content).decode()
+        self.assertIn('Geita Store Profit/Loss Report', content)
+        self.assertIn('<strong>Profit/Loss</strong>: -16', content)
+
+    def test_failure_is_recorded(self):
+        job = jobs.enqueue('profit-loss', {'store': 0})
+        jobs.claim()
+        with self.assertLogs('inventory.jobs', 'ERROR'):
+            self.assertEqual(jobs.execute(job.pk), Job.FAILED)
+        job.refresh_from_db()
+        self.assertIn('Unknown store', job.error)
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.pk])).status_code, 404)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse('enqueue_export', args=['supplier-purchases'])).status_code, 405)
+        self.assertEqual(self.client.post(reverse('enqueue_export', args=['nope'])).status_code, 404)
+        url = reverse('enqueue_profit_loss', args=[self.store.pk])
+        self.assertEqual(self.client.post(url, QUERY_STRING='start=2024-02-01&end=2024-01-01').status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+    def test_stale_jobs_requeued(self):
+        job = jobs.enqueue('export', {'report': 'product-stock'})
+        jobs.claim()
+        Job.objects.update(started_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.requeue_stale(timedelta(hours=1)), 1)
+        self.assertEqual(jobs.claim(), [job.pk])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class MaterializeTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        synthetic.seed(stores=5, products=10, suppliers=2, purchases=100, sales=100)
+
+    def test_totals_match_ledger(self):
+        run_started, count = materialize.run(processes=0, chunk_size=2)
+        self.assertEqual(count, 5)
+        for store in Store.objects.all():
+            report = store.storereport
+            self.assertEqual(report.run_started, run_started)
+            self.assertEqual(report.sales_quantity, Sale.objects.filter(store=store).aggregate(total=Sum('quantity'))['total'] or 0)
+            self.assertEqual(report.purchases_value, Purchase.objects.filter(store=store).aggregate(total=Sum(LINE_VALUE))['total'] or 0)
+            self.assertEqual(report.profit_loss, report.sales_value - report.purchases_value)
+            self.assertEqual(
+                report.inventory_value,
+                sum(stock.quantity * stock.product.price for stock in Stock.objects.filter(store=store)),
+            )
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('sales_report_by_store'))
+        self.assertContains(response, 'Totals as of')
+
+    def test_resume(self):
+        progress = []
+        run_started, _ = materialize.run(processes=0, chunk_size=2, progress=lambda *args: progress.append(args))
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        Store.objects.create(name='New Store', address='Mbeya')
+        StoreReport.objects.filter(store__in=Store.objects.order_by('pk')[:2]).delete()
+
+        resumed, count = materialize.run(processes=0, resume=True)
+        self.assertEqual((resumed, count), (run_started, 3))
+        self.assertEqual(StoreReport.objects.filter(run_started=run_started).count(), 6)
+        # A fresh run recomputes everything
+        self.assertEqual(materialize.run(processes=0)[1], 6)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class BenchmarkTests(TestCase):
+    """
+    Every URL responds on synthetic data and needs no more queries than the
+    stored baseline (``manage.py benchmark_views`` checks the timings too).
+    """
+
+    def test_views_within_baseline_queries(self):
+        synthetic.seed(stores=3, products=20, suppliers=3, purchases=200, sales=200)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        results = benchmarks.run(self.client, repeat=1)
+        baseline = benchmarks.load(settings.BASE_DIR / 'benchmarks' / 'baseline.json')
+
+        self.assertEqual(results.keys(), baseline.keys())
+        self.assertEqual(benchmarks.regressions(results, baseline, tolerance=float('inf')), [])
+
+
+class TunedSQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/db.sqlite3'
+        self.connection = ConnectionHandler({'default': {
+            'ENGINE': 'inventory.backends.sqlite3',
+            'NAME': self.path,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1000},
+            },
+        }})['default']
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 1000)
+
+    def test_transactions_take_write_lock(self):
+        # The same call atomic() makes to open a transaction
+        self.connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        self.addCleanup(self.connection.set_autocommit, True)
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+            other.execute('BEGIN IMMEDIATE')
+        self.connection.rollback()
+
+
+class StaticAssetTests(SimpleTestCase):
+    def test_collectstatic_skips_unused_vendor_files(self):
+        patterns = apps.get_app_config('staticfiles').ignore_patterns
+        self.assertIn('vendor/bootswatch/darkly/*', patterns)
+        self.assertNotIn(f'vendor/bootswatch/{settings.JAZZMIN_UI_TWEAKS["theme"]}/*', patterns)
+        self.assertIn('CVS', patterns)
+        self.assertEqual(checks.check_ignored_static_files(None), [])
+
+    def test_check_jazzmin_files_not_ignored(self):
+        with override_settings(JAZZMIN_UI_TWEAKS={**settings.JAZZMIN_UI_TWEAKS, 'dark_mode_theme': 'darkly'}):
+            self.assertEqual(
+                [error.msg.split()[0] for error in checks.check_ignored_static_files(None)],
+                ['vendor/bootswatch/darkly/bootstrap.min.css'],
+            )
+        with override_settings(JAZZMIN_SETTINGS={**settings.JAZZMIN_SETTINGS, 'show_ui_builder': True}):
+            errors = checks.check_ignored_static_files(None)
+            self.assertIn('jazzmin/js/ui-builder.js', [error.msg.split()[0] for error in errors])
+            self.assertEqual({error.id for error in errors}, {'inventory.E001'})
+
+    def test_weigh_sums_collected_and_compressed_sizes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = directory.name
+        files = {
+            'app.0123456789ab.js': b'x' * 1000, 'app.0123456789ab.js.gz': b'x' * 100, 'app.0123456789ab.js.br': b'x' * 80,
+            'logo.png': b'x' * 50,
+        }
+        for name, content in files.items():
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(content)
+        html = (
+            '<link rel="stylesheet" href="https://cdn.example.com/a.css"><link rel="canonical" href="/static/x.css">'
+            '<script src="/static/app.0123456789ab.js"></script><script src="/static/app.0123456789ab.js"></script>'
+            '<img src="/static/logo.png?v=1"><script src="/static/gone.js"></script>'
+        )
+        weight = assets.weigh(html, root, '/static/')
+        self.assertEqual((weight.files, weight.bytes, weight.gzip_bytes, weight.brotli_bytes), (2, 1050, 150, 130))
+        self.assertEqual(weight.unhashed, ['logo.png'])
+        self.assertEqual(weight.missing, ['gone.js'])
+        self.assertEqual(weight.external, ['https://cdn.example.com/a.css'])
+
+
+class PeriodSummaryTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+
+    def buckets(self):
+        summary = StoreSummary.objects.get(store=self.store)
+        return summary.as_of, [
+            summary.total_purchases_day, summary.total_purchases_week,
+            summary.total_purchases_month, summary.total_purchases_year, summary.total_value,
+        ]
+
+    def test_rolls_over_week(self):
+        StoreSummary.add(self.store.pk, 10, date(2024, 1, 7))  # Sunday
+        StoreSummary.add(self.store.pk, 5, date(2024, 1, 8))  # Monday
+        self.assertEqual(self.buckets(), (date(2024, 1, 8), [5, 5, 15, 15, 15]))
+
+    def test_rolls_over_month(self):
+        StoreSummary.add(self.store.pk, 10, date(2024, 1, 31))  # Wednesday
+        StoreSummary.add(self.store.pk, 5, date(2024, 2, 1))
+        self.assertEqual(self.buckets(), (date(2024, 2, 1), [5, 15, 5, 15, 15]))
+
+    def test_rolls_over_year(self):
+        StoreSummary.add(self.store.pk, 10, date(2023, 12, 31))
+        StoreSummary.add(self.store.pk, 5, date(2024, 1, 1))
+        self.assertEqual(self.buckets(), (date(2024, 1, 1), [5, 5, 5, 5, 15]))
+
+    def test_same_day_accumulates(self):
+        StoreSummary.add(self.store.pk, 10, date(2024, 3, 14))
+        StoreSummary.add(self.store.pk, 5, date(2024, 3, 14))
+        self.assertEqual(self.buckets(), (date(2024, 3, 14), [15, 15, 15, 15, 15]))
+
+    def test_back_dated_add(self):
+        StoreSummary.add(self.store.pk, 10, date(2024, 3, 14))  # Thursday
+        StoreSummary.add(self.store.pk, 1, date(2024, 3, 11))  # same week
+        StoreSummary.add(self.store.pk, 2, date(2024, 3, 1))  # same month
+        StoreSummary.add(self.store.pk, 4, date(2023, 6, 1))  # a year before
+        self.assertEqual(self.buckets(), (date(2024, 3, 14), [10, 11, 13, 13, 17]))
+
+    def test_rebuild_matches_incremental_totals(self):
+        supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        product = Product.objects.create(name='Product', price=10)
+        today = date.today()
+        # Out of date order, so the back-dated path is taken too.
+        for days, quantity in ((3, 2), (0, 1), (40, 3), (1, 4), (400, 5), (8, 6)):
+            ledger.record_batch(purchases=[Purchase(
+                store=self.store, product=product, supplier=supplier, quantity=quantity, unit_price=7,
+                purchase_date=today - timedelta(days=days),
+            )])
+        incremental = self.buckets()
+        call_command('rebuild_summaries', stdout=StringIO())
+        self.assertEqual(self.buckets(), incremental)
+        self.assertEqual(incremental[1][4], 21 * 7)
+
+
+class PeriodReportTests(TestCase):
+    day = date(2024, 3, 14)  # Thursday
+
+    @classmethod
+    def setUpTestData(cls):
+        store = Store.objects.create(name='Geita Store', address='Geita')
+        product = Product.objects.create(name='Product', price=10)
+        # Each quantity is a distinct bit, so the totals show which sales counted.
+        dates = [
+            (date(2024, 3, 14), 1), (date(2024, 3, 13), 2), (date(2024, 3, 10), 4), (date(2024, 3, 11), 8),
+            (date(2024, 2, 29), 16), (date(2024, 3, 1), 32), (date(2024, 1, 1), 64), (date(2023, 12, 31), 128),
+            (date(2024, 3, 15), 256),
+        ]
+        Sale.objects.bulk_create([
+            Sale(store=store, product=product, quantity=quantity, unit_price=2, cost=quantity, sale_date=day)
+            for day, quantity in dates
+        ])
+
+    def test_period_boundaries_in_one_query(self):
+        with self.assertNumQueries(1):
+            report = period_report(Sale.objects.all(), 'sale_date', self.day, sales=LINE_VALUE, profit=LINE_PROFIT)
+        self.assertEqual(report['sales'], PeriodTotals(day=2, week=22, month=94, year=254))
+        self.assertEqual(report['profit'], PeriodTotals(day=1, week=11, month=47, year=127))
+
+    async def test_async_matches(self):
+        report = await aperiod_report(Sale.objects.all(), 'sale_date', self.day, sales=LINE_VALUE)
+        self.assertEqual(report['sales'], PeriodTotals(day=2, week=22, month=94, year=254))
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+
+    def test_first_purchase_creates_stock_row(self):
+        self.assertFalse(Stock.objects.exists())
+        ledger.record_purchase(self.store, self.product, self.supplier, 5, 8)
+        ledger.record_purchase(self.store, self.product, self.supplier, 2, 8)
+        stock = Stock.objects.get()
+        self.assertEqual((stock.store, stock.product, stock.quantity), (self.store, self.product, 7))
+        self.assertEqual(StockMovement.objects.count(), 2)
+
+    def test_oversell_rejected(self):
+        ledger.record_purchase(self.store, self.product, self.supplier, 3, 8)
+        with self.assertRaises(ledger.InsufficientStock):
+            ledger.record_sale(self.store, self.product, 4, 12)
+        # The sale and its movement were rolled back with the stock change.
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(list(StockMovement.objects.values_list('kind', flat=True)), [StockMovement.PURCHASE])
+        self.assertEqual(Stock.objects.get().quantity, 3)
+        self.assertFalse(SalesSummary.objects.filter(total_value__gt=0).exists())
+
+        ledger.record_sale(self.store, self.product, 3, 12)
+        self.assertEqual(Stock.objects.get().quantity, 0)
+
+    def test_sale_without_stock_row_rejected(self):
+        with self.assertRaises(ledger.InsufficientStock):
+            ledger.record_sale(self.store, self.product, 1, 12)
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(Stock.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_negative_adjustment_rejected(self):
+        ledger.adjust_stock(self.store, self.product, 2)
+        with self.assertRaises(ledger.InsufficientStock):
+            ledger.adjust_stock(self.store, self.product, -3)
+        self.assertEqual(Stock.objects.get().quantity, 2)
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Geita Store', address='Geita')
+        self.product = Product.objects.create(name='Product', price=10)
+        self.supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+
+    def run_jsonl(self, *rows, batch_size=100):
+        lines = '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+        importer = importers.TransactionImporter(batch_size=batch_size)
+        return importer.run(importers.read_rows(StringIO(lines), 'jsonl'))
+
+    def purchase(self, **fields):
+        return {'type': 'purchase', 'store': 'Geita Store', 'product': 'Product', 'supplier': 'Supplier',
+                'quantity': 5, 'unit_price': '8.00', 'date': '2024-03-14', **fields}
+
+    def sale(self, **fields):
+        return {'type': 'sale', 'store': 'Geita Store', 'product': 'Product', 'quantity': '2', 'unit_price': 12, **fields}
+
+    def test_csv(self):
+        lines = (
+            'type,store,product,supplier,quantity,unit_price,date\n'
+            'purchase,Geita Store,Product,Supplier,5,8.00,2024-03-14\n'
+            'sale,Geita Store,Product,,2,12,\n'
+            'sale,Geita Store,Product,,2.7,12,\n'
+        )
+        result = importers.TransactionImporter().run(importers.read_rows(StringIO(lines), 'csv'))
+        self.assertEqual((result.rows, result.purchases, result.sales), (3, 1, 1))
+        self.assertEqual(result.errors, [(4, "quantity must be a whole number, not '2.7'")])
+        self.assertEqual(Purchase.objects.get().purchase_date, date(2024, 3, 14))
+        self.assertEqual(Stock.objects.get().quantity, 3)
+
+    def test_rejected_rows(self):
+        result = self.run_jsonl(
+            self.purchase(),
+            self.purchase(type=5),
+            self.purchase(store=['Geita Store']),
+            self.sale(product={'name': 'Product'}),
+            self.sale(quantity=2.7),
+            self.sale(quantity=True),
+            self.sale(quantity='NaN'),
+            self.sale(quantity=0),
+            self.sale(unit_price=[1]),
+            self.sale(date='14/03/2024'),
+            self.sale(store='Nowhere'),
+            self.purchase(supplier=None),
+            '{"type": "sale",',
+            '[1, 2]',
+            self.sale(quantity=2.0),
+        )
+        self.assertEqual((result.rows, result.purchases, result.sales), (15, 1, 1))
+        self.assertEqual([line for line, _ in result.errors], list(range(2, 15)))
+        self.assertEqual(dict(result.errors)[2], 'type must be text, not 5')
+        self.assertEqual(dict(result.errors)[3], "store must be text, not ['Geita Store']")
+        self.assertEqual(Stock.objects.get().quantity, 3)
+
+    def test_partial_failure(self):
+        # The oversold sale is rejected; the rows around it, in the same
+        # batch and the next one, are imported.
+        result = self.run_jsonl(
+            self.purchase(quantity=3), self.sale(quantity=4), self.sale(quantity=3), self.purchase(quantity=1),
+            batch_size=3,
+        )
+        self.assertEqual((result.rows, result.purchases, result.sales), (4, 2, 1))
+        self.assertEqual(result.errors, [(2, 'insufficient stock')])
+        self.assertEqual(Stock.objects.get().quantity, 1)
+        # Including the first batch's purchase and sale, which cancel out.
+        self.assertEqual(StockMovement.objects.count(), 3)
+        self.assertFalse(Sale.objects.filter(cost__isnull=True).exists())
+
+    def test_view(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        upload = SimpleUploadedFile('lines.jsonl', '\n'.join([
+            json.dumps(self.purchase()), json.dumps(self.sale(quantity=9)), json.dumps(self.purchase(type=5)),
+        ]).encode())
+        response = self.client.post(reverse('import_transactions'), {'file': upload, 'batch_size': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Imported 1 of 3 rows')
+        self.assertContains(response, 'insufficient stock')
+        self.assertContains(response, 'type must be text, not 5')
+        self.assertEqual(Purchase.objects.count(), 1)
+        self.assertFalse(Sale.objects.exists())
+
+        # Rejected whole, before the valid first batch is imported
+        upload = SimpleUploadedFile('lines.jsonl', json.dumps(self.purchase()).encode() + b'\n' + '"Caf\u00e9"'.encode('latin-1'))
+        response = self.client.post(reverse('import_transactions'), {'file': upload, 'batch_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'file', 'The file must be UTF-8 text.')
+        self.assertEqual(Purchase.objects.count(), 1)
+
+    def test_batch_wider_than_sqlite_expression_depth(self):
+        products = Product.objects.bulk_create([Product(name=f'Product {i}', price=10) for i in range(1200)])
+        result = self.run_jsonl(
+            *(self.purchase(product=product.name) for product in products),
+            *(self.sale(product=product.name) for product in products),
+            batch_size=2400,
+        )
+        self.assertEqual((result.purchases, result.sales, result.errors), (1200, 1200, []))
+        self.assertEqual(set(Stock.objects.values_list('quantity', flat=True)), {3})
+
+
+class StockUniqueMigrationTests(TransactionTestCase):
+    before = [('inventory', '0005_ledger_dates')]
+    after = [('inventory', '0006_stock_unique_ledger_indexes')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.latest = executor.loader.graph.leaf_nodes()
+        executor.migrate(self.before)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.latest)
+
+    def test_duplicate_stock_rows_merged(self):
+        apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        Store, Product, Stock = (apps.get_model('inventory', name) for name in ('Store', 'Product', 'Stock'))
+        store = Store.objects.create(name='Geita Store', address='Geita')
+        first, second = (Product.objects.create(name=f'Product {n}', price=10) for n in (1, 2))
+        kept = Stock.objects.create(store=store, product=first, quantity=2)
+        Stock.objects.create(store=store, product=first, quantity=3)
+        Stock.objects.create(store=store, product=first, quantity=4)
+        single = Stock.objects.create(store=store, product=second, quantity=5)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        Stock = executor.loader.project_state(self.after).apps.get_model('inventory', 'Stock')
+        self.assertEqual(
+            sorted(Stock.objects.values_list('pk', 'product_id', 'quantity')),
+            [(kept.pk, first.pk, 9), (single.pk, second.pk, 5)],
+        )
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ListingTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        store = Store.objects.create(name='Geita Store', address='Geita')
+        product = Product.objects.create(name='Product', price=10)
+        self.suppliers = [Supplier.objects.create(name=f'Supplier {n}', address='Arusha') for n in range(3)]
+        for n, supplier in enumerate(self.suppliers * 2):
+            ledger.record_batch(purchases=[Purchase(
+                store=store, product=product, supplier=supplier, quantity=1, unit_price=8,
+                purchase_date=date(2024, 3, 1) + timedelta(days=n),
+            )])
+
+    def test_pages_follow_cursor(self):
+        url = reverse('api_purchases')
+        first = self.client.get(url, {'limit': 4}).json()
+        second = self.client.get(url, {'limit': 4, 'cursor': first['next']}).json()
+        self.assertIsNone(second['next'])
+        dates = [row['purchase_date'] for row in first['results'] + second['results']]
+        self.assertEqual(dates, [str(date(2024, 3, 6) - timedelta(days=n)) for n in range(6)])
+
+        supplier = self.client.get(url, {'supplier': self.suppliers[1].pk}).json()['results']
+        self.assertEqual({row['supplier_name'] for row in supplier}, {'Supplier 1'})
+
+    def test_malformed_cursor(self):
+        for url, values in (
+            (reverse('api_stock'), [{'a': 1}]),
+            (reverse('api_stock'), ['one']),
+            (reverse('api_stock'), [True]),
+            (reverse('api_stock'), [1, 2]),
+            (reverse('api_purchases'), ['2024-13-01', 1]),
+            (reverse('api_purchases'), [20240301, 1]),
+            (reverse('api_purchases'), [None, 1]),
+        ):
+            response = self.client.get(url, {'cursor': listings.encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+        self.assertEqual(self.client.get(reverse('api_stock'), {'cursor': 'not base64!'}).status_code, 400)
+
+    def test_supplier_history_is_one_listing(self):
+        response = self.client.get(reverse('supplier-purchase'))
+        self.assertContains(response, 'data-listing=', count=1)
+        self.assertContains(response, '<option value="%d">Supplier 2</option>' % self.suppliers[2].pk, html=True)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        store = Store.objects.create(name='Geita Store', address='Geita')
+        supplier = Supplier.objects.create(name='Supplier', address='Arusha')
+        for name in ('Beans', 'Rice'):
+            ledger.record_purchase(store, Product.objects.create(name=name, price=10), supplier, 5, 8)
+        self.url = reverse('export_report', args=['product-stock'])
+
+    def test_streams_csv(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="product-stock.csv"')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['Product,Store,Quantity', 'Beans,Geita Store,5', 'Rice,Geita Store,5'])
+
+    def test_gzip_content_encoding(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        content = zlib.decompress(b''.join(response.streaming_content), wbits=31).decode()
+        self.assertTrue(content.startswith('Product,Store,Quantity\r\nBeans,Geita Store,5\r\n'))
+
+    def test_gzip_download(self):
+        # Already a .gz file: not encoded a second time.
+        response = self.client.get(self.url, {'gzip': '1'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="product-stock.csv.gz"')
+        content = zlib.decompress(b''.join(response.streaming_content), wbits=31).decode()
+        self.assertIn('Rice,Geita Store,5', content)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_supplier_filter(self):
+        other = Supplier.objects.create(name='Other Supplier', address='Moshi')
+        ledger.record_purchase(Store.objects.get(), Product.objects.get(name='Rice'), other, 2, 9)
+        url = reverse('export_report', args=['supplier-purchases'])
+        # The page's download link carries the listing's filter
+        self.assertContains(self.client.get(reverse('supplier-purchase')), f'href="{url}" data-listing-export="supplier-purchases"')
+        response = self.client.get(url, {'supplier': other.pk})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1:], [f'Other Supplier,Rice,Geita Store,9.00,2,18,{date.today()}'])
+
+    def test_unknown_report(self):
+        self.assertEqual(self.client.get(reverse('export_report', args=['nothing'])).status_code, 404)
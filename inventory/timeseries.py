@@ -0,0 +1,167 @@
+# inventory/timeseries.py
+"""
+Sales, purchase and stock-level series per store for the dashboard chart.
+
+Rows are grouped into day/week/month buckets by the database
+(``TruncDay``/``TruncWeek``/``TruncMonth``), so each series costs one
+grouped query however many rows it covers. Buckets without activity are
+filled in with zero.
+
+Stock levels are worked back from the current ``Stock`` quantities by
+undoing the ``StockMovement`` rows recorded since.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import Purchase, Sale, Stock, StockMovement, Store
+from .reports import LINE_VALUE
+
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Range used when no start date is given, in buckets.
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12}
+
+MAX_BUCKETS = 5000
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def default_start(end, granularity):
+    start = bucket_start(end, granularity)
+    for _ in range(DEFAULT_BUCKETS[granularity] - 1):
+        start = bucket_start(start - timedelta(days=1), granularity)
+    return start
+
+
+def buckets(start, end, granularity):
+    """Start dates of the buckets covering ``start`` to ``end``."""
+    day = bucket_start(start, granularity)
+    result = []
+    while day <= end:
+        result.append(day)
+        day = next_bucket(day, granularity)
+    return result
+
+
+def _grouped(model, date_field, granularity, start, end, stores):
+    # {(store_id, bucket): value} for rows from ``start`` to ``end``.
+    queryset = model.objects.filter(**{f'{date_field}__range': (start, end)})
+    if stores is not None:
+        queryset = queryset.filter(store_id__in=stores)
+    rows = queryset.annotate(
+        bucket=GRANULARITIES[granularity](date_field),
+    ).values('store_id', 'bucket').annotate(value=Sum(LINE_VALUE)).order_by()
+    return {(row['store_id'], row['bucket']): row['value'] for row in rows}
+
+
+def downsample(labels, flows, levels, max_points):
+    """
+    Merge consecutive buckets so at most ``max_points`` remain: flow series
+    are summed, level series keep the last value of each group.
+    """
+    size = -(-len(labels) // max_points)
+    if size <= 1:
+        return labels, flows, levels
+    groups = range(0, len(labels), size)
+    return (
+        [labels[i] for i in groups],
+        {name: [sum(values[i:i + size], Decimal(0)) for i in groups] for name, values in flows.items()},
+        {name: [values[min(i + size, len(values)) - 1] for i in groups] for name, values in levels.items()},
+    )
+
+
+def store_series(start, end, granularity='day', store=None, max_points=None):
+    """
+    Return the chart payload::
+
+        {'granularity': 'day', 'labels': [...],
+         'totals': {'sales': [...], 'purchases': [...], 'stock': [...]},
+         'stores': [{'id': 1, 'name': ..., 'sales': [...], ...}, ...]}
+
+    ``sales`` and ``purchases`` are values per bucket, ``stock`` is the units
+    on hand at the end of each bucket. Nothing after ``end`` is counted,
+    even when the last bucket runs past it.
+    """
+    labels = buckets(start, end, granularity)
+    first = labels[0]
+
+    stores = Store.objects.order_by('name')
+    if store is not None:
+        stores = stores.filter(pk=store)
+    stores = list(stores.values_list('pk', 'name'))
+    store_ids = [pk for pk, _ in stores] if store is not None else None
+
+    sales = _grouped(Sale, 'sale_date', granularity, first, end, store_ids)
+    purchases = _grouped(Purchase, 'purchase_date', granularity, first, end, store_ids)
+    stock = Stock.objects.all() if store_ids is None else Stock.objects.filter(store_id__in=store_ids)
+    on_hand = dict(stock.values('store_id').annotate(total=Sum('quantity')).values_list('store_id', 'total').order_by())
+
+    # Units moved per store in each bucket, and after ``end``.
+    movements = StockMovement.objects.filter(occurred_on__gte=first)
+    if store_ids is not None:
+        movements = movements.filter(store_id__in=store_ids)
+    moved = defaultdict(int)
+    moved_later = defaultdict(int)
+    for row in movements.annotate(
+        bucket=GRANULARITIES[granularity]('occurred_on'),
+        later=Case(When(occurred_on__gt=end, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    ).values('store_id', 'bucket', 'later').annotate(delta=Sum('delta')).order_by():
+        if row['later']:
+            moved_later[row['store_id']] += row['delta']
+        else:
+            moved[(row['store_id'], row['bucket'])] += row['delta']
+
+    result = []
+    for pk, name in stores:
+        flows = {
+            'sales': [sales.get((pk, day), Decimal(0)) for day in labels],
+            'purchases': [purchases.get((pk, day), Decimal(0)) for day in labels],
+        }
+        level = (on_hand.get(pk) or 0) - moved_later[pk]
+        levels = []
+        for day in reversed(labels):
+            levels.append(level)
+            level -= moved[(pk, day)]
+        levels = {'stock': levels[::-1]}
+        result.append({'id': pk, 'name': name, **flows, **levels})
+
+    totals = {
+        name: [sum((row[name][i] for row in result), zero) for i in range(len(labels))]
+        for name, zero in (('sales', Decimal(0)), ('purchases', Decimal(0)), ('stock', 0))
+    }
+
+    if max_points:
+        for row in result:
+            _, flows, levels = downsample(
+                labels, {'sales': row['sales'], 'purchases': row['purchases']}, {'stock': row['stock']}, max_points
+            )
+            row.update(flows, **levels)
+        flows = {'sales': totals['sales'], 'purchases': totals['purchases']}
+        labels, flows, levels = downsample(labels, flows, {'stock': totals['stock']}, max_points)
+        totals = {**flows, **levels}
+
+    return {'granularity': granularity, 'labels': labels, 'totals': totals, 'stores': result}
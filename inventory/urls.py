@@ -1,5 +1,5 @@
 from django.urls import path
-from .import views
+from .import async_views, views
 
 urlpatterns = [
     path('', views.homepage, name='home'),
@@ -11,6 +11,13 @@ urlpatterns = [
     path('supplier-purchase/', views.supplier_purchase_history, name='supplier-purchase'),
     path('sales-report', views.sales_report, name='sales_reports'),
     path('stock_data/', views.stock_data, name='stock'),
+    path('api/stock/', views.stock_listing, name='api_stock'),
+    path('api/timeseries/', views.timeseries_data, name='api_timeseries'),
+    path('api/alerts/', views.stock_alerts, name='api_alerts'),
+    path('api/search/<slug:kind>/', views.search_names, name='api_search'),
+    path('api/sales/', views.sales_listing, name='api_sales'),
+    path('api/purchases/', views.purchases_listing, name='api_purchases'),
+    path('export/<slug:report>/', views.export_report, name='export_report'),
     path('products/<int:store_id>/', views.product_list, name='product_list'),
     path('purchase-value/', views.purchase_report, name='purchase_value'),
     path('inventory-value/', views.inventory_value_report, name='inventory_value'),
@@ -20,7 +27,25 @@ urlpatterns = [
     path('stores/<int:store_id>/profit_loss/', views.calculate_profit_loss, name='profit_loss'),
     path('add-purchased-product/', views.add_purchased_product, name='add_purchased_product'),
     path('add-sold-product/', views.add_sold_product, name='add_sold_product'),
+    path('api/checkout/', views.checkout, name='api_checkout'),
+    path('receipts/<int:receipt_id>/', views.receipt, name='receipt'),
+    path('import/', views.import_transactions, name='import_transactions'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
     path('stock/add/', views.add_stock, name='add_stock'),
     path('stock/update/<int:stock_id>/', views.update_stock, name='update_stock'),
     path('stock/delete/<int:stock_id>/', views.delete_stock, name='delete_stock'),
+
+    path('jobs/export/<slug:report>/', views.enqueue_export, name='enqueue_export'),
+    path('jobs/profit-loss/<int:store_id>/', views.enqueue_profit_loss, name='enqueue_profit_loss'),
+    path('api/jobs/<int:job_id>/', views.job_status, name='api_job'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+
+    # Async variants of the read-heavy views, for ASGI deployments
+    path('async/', async_views.homepage, name='async_home'),
+    path('async/stock_data/', async_views.stock_data, name='async_stock'),
+    path('async/sales-report', async_views.sales_report, name='async_sales_reports'),
+    path('async/purchase-value/', async_views.purchase_report, name='async_purchase_value'),
+    path('async/summary', async_views.store_purchases, name='async_summary'),
+    path('async/inventory-value/', async_views.inventory_value_report, name='async_inventory_value'),
+    path('async/sales-report/store/', async_views.sales_report_by_store, name='async_sales_report_by_store'),
 ]
\ No newline at end of file
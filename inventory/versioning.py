@@ -0,0 +1,47 @@
+# inventory/versioning.py
+"""
+A version stamp for the ledger, changed on every write to sales, purchases,
+stock, products, stores or suppliers, by recosting and by materialized
+reports (see inventory.signals).
+
+Views use it for ETag/Last-Modified headers and as part of cache keys. It
+lives in the default cache, so with a per-process cache (locmem) a write
+only changes the stamp of the worker that made it, and the others go on
+serving stale pages and fragments. Running several workers, or running
+management commands against a live site, needs a shared cache backend
+(e.g. Redis or memcached).
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+
+VERSION_KEY = 'inventory:ledger-version'
+
+
+def ledger_version():
+    """The time of the last write, as a Unix timestamp."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Nothing recorded (fresh or evicted cache): treat the data as new.
+        version = time.time()
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def ledger_modified():
+    return datetime.fromtimestamp(ledger_version(), tz=timezone.utc)
+
+
+def etag(*parts):
+    """An ETag for a response built from the current ledger plus ``parts``."""
+    key = '|'.join(str(part) for part in (ledger_version(), *parts))
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def bump():
+    cache.set(VERSION_KEY, time.time(), None)
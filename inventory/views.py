@@ -1,61 +1,39 @@
+import io
+import json
+import os
+
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from .models import *
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.contrib import messages
-from django.http import HttpResponse
-from django.template.loader import render_to_string
 from django.db.models.functions import TruncMonth
 from django.utils.timezone import now
-from .forms import StockForm
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
-from datetime import date, timedelta, datetime
+from .forms import AlertsForm, CheckoutForm, CheckoutLineForm, DateRangeForm, ImportTransactionsForm, ListingForm, SearchForm, StockForm, TimeSeriesForm
+from .importers import TransactionImporter, guess_format, read_rows
+from .exports import EXPORTS, export_response
+from .listings import DEFAULT_LIMIT, LISTINGS, MAX_LIMIT, InvalidCursor
+from . import alerts, dashboard, jobs, ledger, metrics, search, timeseries, versioning
+from django.db.models import Sum, F, DecimalField
+from datetime import date, datetime, time, timezone as dt_timezone
 from django.db.models.functions import Coalesce
 from django.views.generic import ListView
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition, require_POST
 from .decorators import super_admin_required
+from .reports import LINE_PROFIT, LINE_VALUE, period_report, profit_loss
+
+
+PROFIT_LOSS_PAGE_SIZE = 50
 
 
 @login_required
 @super_admin_required
 def homepage(request):
-    sales = Sale.objects.all().order_by('-sale_date')[:5]
-    purchases = Purchase.objects.all().order_by('-purchase_date')[:5]
-    
-    geita_store_stock = Stock.objects.filter(store__name='Geita Store').aggregate(sum=Sum('quantity'))['sum']
-    mwanza_store_stock = Stock.objects.filter(store__name='Mwanza Store').aggregate(sum=Sum('quantity'))['sum']
-
-    total_purchase_value = Purchase.objects.aggregate(
-        total_value=ExpressionWrapper(
-            Sum(F('quantity') * F('unit_price')),
-            output_field=DecimalField()
-        )
-    )['total_value']
-
-    store_purchases = Purchase.objects.values('store__name').annotate(total_purchase_value=Sum(models.F('unit_price') * models.F('quantity')))
-
-    total_sales_value = Sale.objects.aggregate(
-        total_value=ExpressionWrapper(
-            Sum(F('quantity') * F('unit_price')),
-            output_field=DecimalField()
-        )
-    )['total_value']
-
-    
-
-    # total_profit = total_sales_value - total_purchase_value
-
-    context = {
-        'sales':sales,
-        'purchases':purchases,
-        'geita_store_stock':geita_store_stock,
-        'mwanza_store_stock':mwanza_store_stock,
-        'total_purchase_value':total_purchase_value,
-        'total_sales_value':total_sales_value,
-        # 'total_profit':total_profit,
-        'store_purchases':store_purchases
-    }
-    
-    return render(request, 'inventory/homepage.html', context)
+    return render(request, 'inventory/homepage.html', dashboard.get())
 
 @login_required
 @super_admin_required
@@ -69,40 +47,36 @@ def store_list(request):
 @super_admin_required
 def products(request):
     
-    products = Stock.objects.all()
-    return render(request, 'inventory/products.html', {'products': products})
+    # Rows are loaded page by page from the stock listing API
+    stores = Store.objects.only('name')
+    return render(request, 'inventory/products.html', {'stores': stores})
 
 
 @login_required
 @super_admin_required
 def product_list(request, store_id):
-    stores = Store.objects.get(pk=store_id)
-    products = Product.objects.filter(stores=stores)
-    return render(request, 'inventory/product_list.html', {'stores': stores, 'products': products})
+    store = get_object_or_404(Store, pk=store_id)
+    products = Product.objects.filter(stock__store=store).annotate(quantity=F('stock__quantity')).order_by('name')
+    return render(request, 'inventory/product_list.html', {'store': store, 'products': products})
 
 @login_required
 @super_admin_required
 def purchase_product(request, store_id, product_id):
     store = Store.objects.get(pk=store_id)
     product = Product.objects.get(pk=product_id)
-    suppliers = Supplier.objects.all()
 
     if request.method == 'POST':
         supplier_id = request.POST['supplier']
         quantity = int(request.POST['quantity'])
         supplier = Supplier.objects.get(pk=supplier_id)
 
-        Purchase.objects.create(product=product, supplier=supplier, quantity=quantity)
-        product.stock += quantity
-        product.save()
-
-        # Calculate total price after purchase
-        total_price = product.price * quantity
+        ledger.record_purchase(store, product, supplier, quantity, product.price)
 
         messages.success(request, f'Product has been successfuly Purchased!')
         return redirect('product_list', store_id=store.id)
 
-    return render(request, 'inventory/purchase_product.html', {'store': store, 'product': product, 'suppliers': suppliers})
+    stock = Stock.objects.filter(store=store, product=product).values_list('quantity', flat=True).first() or 0
+    return render(request, 'inventory/purchase_product.html', {'store': store, 'product': product, 'stock': stock})
 
 
 @login_required
@@ -111,90 +85,247 @@ def sell_product(request, store_id, product_id):
     store = Store.objects.get(id=store_id)
     product = Product.objects.get(id=product_id)
 
+    context = {'store': store, 'product': product}
+
     if request.method == 'POST':
         quantity = int(request.POST['quantity'])
 
-        if product.stock < quantity:
-            return render(request, 'inventory/sell_product.html', {'store': store, 'product': product, 'error': 'Insufficient stock'})
-
-        sale = Sale.objects.create(
-            product=product,
-            quantity=quantity
-        )
-
-        # Update stock after sale
-        product.stock -= quantity
-        product.save()
-
-        # Calculate total price after sale
-        total_price = product.price * quantity
+        try:
+            ledger.record_sale(store, product, quantity, product.price)
+        except ledger.InsufficientStock:
+            context['error'] = 'Insufficient stock'
+        else:
+            # Calculate total price after sale
+            context['total_price'] = product.price * quantity
 
-        return render(request, 'inventory/sell_product.html', {'store': store, 'product': product, 'total_price': total_price})
-
-    return render(request, 'inventory/sell_product.html', {'store': store, 'product': product})
+    context['stock'] = Stock.objects.filter(store=store, product=product).values_list('quantity', flat=True).first() or 0
+    return render(request, 'inventory/sell_product.html', context)
 
 
 
 @login_required
 @super_admin_required
 def product_detail(request, product_id):
-    product = Product.objects.get(id=product_id)
-    purchases = Purchase.objects.filter(product=product)
-    sales = Sale.objects.filter(product=product)
-    context = {'product': product, 'purchases': purchases, 'sales': sales}
+    product = get_object_or_404(Product, id=product_id)
+    # Purchases and sales are loaded page by page from the listing API
+    context = {'product': product}
     return render(request, 'inventory/product_detail.html', context)
 
-# Add views for purchase and sale transactions, and bill generation
-
 
 @login_required
 @super_admin_required
 def stock_data(request):
-    stocks = Stock.objects.all()
+    stocks = Stock.objects.values_list('product__name', 'quantity')
     labels = []
     quantity = []
 
-    for stock in stocks:
-        labels.append(stock.product.name)
-        quantity.append(stock.quantity)
+    for name, stock_quantity in stocks:
+        labels.append(name)
+        quantity.append(stock_quantity)
 
     return JsonResponse({'labels': labels, 'quantity': quantity})
 
 
 
+def _timeseries_etag(request):
+    # Default date ranges end today, so the day is part of the version.
+    return versioning.etag(date.today(), request.GET.urlencode())
+
+
+def _timeseries_last_modified(request):
+    today = datetime.combine(date.today(), time.min, tzinfo=dt_timezone.utc)
+    return max(versioning.ledger_modified(), today)
+
+
 @login_required
 @super_admin_required
+@condition(etag_func=_timeseries_etag, last_modified_func=_timeseries_last_modified)
+def timeseries_data(request):
+    form = TimeSeriesForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    params = form.cleaned_data
+    granularity = params['granularity'] or 'day'
+    end = params['end'] or date.today()
+    start = params['start'] or timeseries.default_start(end, granularity)
+    # The form only compares the dates given; ``end`` may have defaulted to today.
+    labels = timeseries.buckets(start, end, granularity)
+    if start > end or not labels:
+        return JsonResponse({'errors': {'__all__': ['The start date must not be after the end date.']}}, status=400)
+    if len(labels) > timeseries.MAX_BUCKETS:
+        return JsonResponse({'errors': {'start': [f'At most {timeseries.MAX_BUCKETS} buckets can be requested.']}}, status=400)
+
+    data = timeseries.store_series(start, end, granularity, store=params['store'], max_points=params['max_points'])
+    return JsonResponse(data)
+
+
+@login_required
+@super_admin_required
+def stock_alerts(request):
+    form = AlertsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    rows = alerts.current(store=form.cleaned_data['store'], limit=form.cleaned_data['limit'])
+    return JsonResponse({'alerts': rows})
+
+
+@login_required
+@super_admin_required
+def search_names(request, kind):
+    if kind not in search.SEARCHES:
+        raise Http404(f'Unknown search {kind!r}')
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    limit = min(form.cleaned_data['limit'] or search.DEFAULT_LIMIT, search.MAX_LIMIT)
+    return JsonResponse({'results': search.search(kind, form.cleaned_data['q'], limit)})
+
+
+@login_required
+@super_admin_required
+def request_metrics(request):
+    return JsonResponse({'samples': len(metrics.samples()), 'views': metrics.report()})
+
+
+def _listing(request, name):
+    listing = LISTINGS[name]
+    form = ListingForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    params = form.cleaned_data
+    sort = params['sort'] or None
+    if sort is not None and sort not in listing.sorts:
+        return JsonResponse({'errors': {'sort': [f'Choose one of {", ".join(listing.sorts)}.']}}, status=400)
+    limit = min(params['limit'] or DEFAULT_LIMIT, MAX_LIMIT)
+
+    try:
+        rows, next_cursor = listing.page(params, cursor=params['cursor'], sort=sort, limit=limit)
+    except (InvalidCursor, ValidationError):
+        return JsonResponse({'errors': {'cursor': ['Invalid cursor.']}}, status=400)
+    return JsonResponse({'results': rows, 'next': next_cursor})
+
+
+@login_required
+@super_admin_required
+def stock_listing(request):
+    return _listing(request, 'stock')
+
+
+@login_required
+@super_admin_required
+def sales_listing(request):
+    return _listing(request, 'sales')
+
+
+@login_required
+@super_admin_required
+def purchases_listing(request):
+    return _listing(request, 'purchases')
+
+
+@login_required
+@super_admin_required
+def export_report(request, report):
+    if report not in EXPORTS:
+        raise Http404('Unknown report')
+    form = ListingForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    return export_response(
+        report, form.cleaned_data,
+        compress=request.GET.get('gzip') == '1', accept_encoding=request.META.get('HTTP_ACCEPT_ENCODING', ''),
+    )
+
+
+def _job_status(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'error': job.error,
+        'url': reverse('api_job', args=[job.pk]),
+        'download': reverse('job_download', args=[job.pk]) if job.status == Job.DONE else None,
+    }
+
+
+@login_required
+@super_admin_required
+@require_POST
+def enqueue_export(request, report):
+    # Same parameters as export_report, built by run_worker instead
+    if report not in EXPORTS:
+        raise Http404('Unknown report')
+    form = ListingForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    job = jobs.enqueue('export', {**request.GET.dict(), 'report': report}, request.user)
+    return JsonResponse(_job_status(job), status=202)
+
+
+@login_required
+@super_admin_required
+@require_POST
+def enqueue_profit_loss(request, store_id):
+    store = get_object_or_404(Store, pk=store_id)
+    form = DateRangeForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    job = jobs.enqueue('profit-loss', {**request.GET.dict(), 'store': store.pk}, request.user)
+    return JsonResponse(_job_status(job), status=202)
+
+
+@login_required
+@super_admin_required
+def job_status(request, job_id):
+    return JsonResponse(_job_status(get_object_or_404(Job, pk=job_id)))
+
+
+@login_required
+@super_admin_required
+def job_download(request, job_id):
+    job = get_object_or_404(Job, pk=job_id, status=Job.DONE)
+    return FileResponse(job.result.open('rb'), as_attachment=True, filename=os.path.basename(job.result.name))
+
+
+@login_required
+@super_admin_required
+@ensure_csrf_cookie
 def calculate_profit_loss(request, store_id):
-    store = Store.objects.get(pk=store_id)
+    store = get_object_or_404(Store, pk=store_id)
     purchases = Purchase.objects.filter(store=store)
     sales = Sale.objects.filter(store=store)
     stock = Stock.objects.filter(store=store)
 
-    # Calculate total purchases
-    total_purchases = sum(p.quantity * p.unit_price for p in purchases)
-
-    # Calculate total sales
-    total_sales = sum(s.quantity * s.unit_price for s in sales)
-
-    # Calculate total current stock value
-    stock_value = sum(s.quantity * s.product.price for s in stock)
-
-    # Calculate profit/loss
-    profit_loss = total_sales - total_purchases
+    # Optional period; without one the report covers all time
+    form = DateRangeForm(request.GET)
+    period = form.cleaned_data if form.is_valid() else {}
+    purchases, sales, totals = profit_loss(purchases, sales, stock, period.get('start'), period.get('end'))
+
+    # Only one page of each list is loaded and rendered
+    pages = {}
+    for name, queryset, fields in (
+        ('purchases', purchases.order_by('-purchase_date', '-pk'), ('quantity', 'unit_price', 'purchase_date')),
+        ('sales', sales.order_by('-sale_date', '-pk'), ('quantity', 'unit_price', 'sale_date')),
+        ('stock', stock.order_by('product__name'), ('quantity',)),
+    ):
+        queryset = queryset.select_related('product').only('product__name', *fields)
+        param = f'{name}_page'
+        query = request.GET.copy()
+        query.pop(param, None)
+        pages[name] = Paginator(queryset, PROFIT_LOSS_PAGE_SIZE).get_page(request.GET.get(param))
+        pages[f'{name}_query'] = query.urlencode()
 
     context = {
         'store': store,
-        'purchases': purchases,
-        'sales': sales,
-        'stock': stock,
-        'total_purchases': total_purchases,
-        'total_sales': total_sales,
-        'stock_value': stock_value,
-        'profit_loss': profit_loss,
+        'form': form,
+        **totals,
+        **pages,
     }
 
-    html = render_to_string('inventory/profit_loss.html', context)
-    return HttpResponse(html)
+    return render(request, 'inventory/profit_loss.html', context)
 
 
 @login_required
@@ -208,25 +339,16 @@ def add_purchased_product(request):
         quantity = int(request.POST['quantity'])
         unit_price = float(request.POST['unit_price'])
 
-        # Create new purchase record
+        # Create new purchase record and update stock quantity
         store = Store.objects.get(pk=store_id)
         product = Product.objects.get(pk=product_id)
         supplier = Supplier.objects.get(pk=supplier_id)
-        purchase = Purchase(store=store, product=product, supplier=supplier, quantity=quantity, unit_price=unit_price)
-        purchase.save()
-
-        # Update stock quantity
-        stock, created = Stock.objects.get_or_create(store=store, product=product)
-        stock.quantity += quantity
-        stock.save()
+        ledger.record_purchase(store, product, supplier, quantity, unit_price)
 
         messages.success(request, f'Stock has been successfuly Added!')
         return redirect('store_list')
 
-    stores = Store.objects.all()
-    products = Product.objects.all()
-    suppliers = Supplier.objects.all()
-    return render(request, 'inventory/add_purchased_product.html', {'stores': stores, 'products': products, 'suppliers': suppliers})
+    return render(request, 'inventory/add_purchased_product.html')
 
 
 @login_required
@@ -239,24 +361,89 @@ def add_sold_product(request):
         quantity = int(request.POST['quantity'])
         unit_price = float(request.POST['unit_price'])
 
-        # Create new sale record
+        # Create new sale record and update stock quantity
         store = Store.objects.get(pk=store_id)
         product = Product.objects.get(pk=product_id)
-        sale = Sale(store=store, product=product, quantity=quantity, unit_price=unit_price)
-        sale.save()
-
-        # Update stock quantity
-        stock = Stock.objects.get(store=store, product=product)
-        stock.quantity -= quantity
-        stock.save()
+        try:
+            ledger.record_sale(store, product, quantity, unit_price)
+        except ledger.InsufficientStock:
+            messages.error(request, f'Not enough {product.name} in stock at {store.name}!')
+            return redirect('add_sold_product')
 
         messages.success(request, f'Product has been successfuly sold!')
 
         return redirect('store_list')
 
-    stores = Store.objects.all()
-    products = Product.objects.all()
-    return render(request, 'inventory/add_sold_product.html', {'stores': stores, 'products': products})
+    return render(request, 'inventory/add_sold_product.html')
+
+
+@login_required
+@super_admin_required
+@require_POST
+def checkout(request):
+    """
+    Ring up a basket for one store, posted as JSON:
+    ``{"store": 1, "lines": [{"product": 2, "quantity": 3, "unit_price": "4.50"}, ...]}``.
+    ``unit_price`` defaults to the product's price.
+    """
+    try:
+        basket = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'errors': {'__all__': ['Expected a JSON body.']}}, status=400)
+    if not isinstance(basket, dict) or not isinstance(basket.get('lines'), list) or not basket['lines']:
+        return JsonResponse({'errors': {'lines': ['Expected a list of lines.']}}, status=400)
+    form = CheckoutForm(basket)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    store = Store.objects.filter(pk=form.cleaned_data['store']).first()
+    if store is None:
+        return JsonResponse({'errors': {'store': ['Unknown store.']}}, status=400)
+
+    lines = []
+    for number, line in enumerate(basket['lines'], 1):
+        form = CheckoutLineForm(line if isinstance(line, dict) else {})
+        if not form.is_valid():
+            return JsonResponse({'errors': {f'lines.{number}': form.errors}}, status=400)
+        lines.append((form.cleaned_data['product'], form.cleaned_data['quantity'], form.cleaned_data['unit_price']))
+
+    try:
+        receipt = ledger.checkout(store, lines, request.user)
+    except Product.DoesNotExist as exc:
+        return JsonResponse({'errors': {'lines': [str(exc)]}}, status=400)
+    except ledger.InsufficientStock as exc:
+        return JsonResponse({'errors': {'lines': [f'Not enough {exc.product.name} in stock at {store.name}.']}}, status=409)
+    return JsonResponse({
+        'receipt': receipt.pk,
+        'total': receipt.total,
+        'url': reverse('receipt', kwargs={'receipt_id': receipt.pk}),
+    }, status=201)
+
+
+@login_required
+@super_admin_required
+def receipt(request, receipt_id):
+    receipt = get_object_or_404(Receipt.objects.select_related('store', 'created_by'), pk=receipt_id)
+    sales = receipt.sales.select_related('product').order_by('pk')
+    return render(request, 'inventory/receipt.html', {'receipt': receipt, 'sales': sales})
+
+
+@login_required
+@super_admin_required
+def import_transactions(request):
+    result = None
+    if request.method == 'POST':
+        form = ImportTransactionsForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            fmt = form.cleaned_data['format'] or guess_format(upload.name)
+            # Decode the upload as it is read instead of loading it all at once.
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            importer = TransactionImporter(batch_size=form.cleaned_data['batch_size'])
+            result = importer.run(read_rows(stream, fmt))
+            messages.success(request, f'Imported {result.imported} of {result.rows} rows ({result.rows_per_second:.0f} rows/sec)')
+    else:
+        form = ImportTransactionsForm()
+    return render(request, 'inventory/import_transactions.html', {'form': form, 'result': result})
 
 
 @login_required
@@ -270,14 +457,11 @@ def add_stock(request):
         store = Store.objects.get(id=store_id)
         product = Product.objects.get(id=product_id)
 
-        stock, created = Stock.objects.get_or_create(store=store, product=product)
-        stock.quantity += quantity
-        stock.save()
+        ledger.adjust_stock(store, product, quantity)
 
-        return redirect('stock_list')
+        messages.success(request, f'Stock has been successfuly Added!')
+        return redirect('products')
 
-    stores = Store.objects.all()
-    products = Product.objects.all()
     # if request.method == 'POST':
     #     form = StockForm(request.POST)
     #     if form.is_valid():
@@ -286,7 +470,7 @@ def add_stock(request):
     #         return redirect('products')  # Redirect to the stock list view
     # else:
     #     form = StockForm()
-    return render(request, 'inventory/add_stock.html', {'stores': stores, 'products': products})
+    return render(request, 'inventory/add_stock.html')
 
 
 
@@ -297,7 +481,7 @@ def update_stock(request, stock_id):
     if request.method == 'POST':
         form = StockForm(request.POST, instance=stock)
         if form.is_valid():
-            form.save()
+            ledger.set_stock(stock.id, **form.cleaned_data)
             messages.success(request, f'Stock has been successfuly Update!')
             return redirect('products')  # Redirect to the stock list view
     else:
@@ -311,7 +495,7 @@ def update_stock(request, stock_id):
 def delete_stock(request, stock_id):
     stock = get_object_or_404(Stock, id=stock_id)
     if request.method == 'POST':
-        stock.delete()
+        ledger.delete_stock(stock.id)
         messages.error(request, f'Stock has been successfuly Deleted!')
         return redirect('products')  # Redirect to the stock list view
     return render(request, 'inventory/delete_stock.html', {'stock': stock})
@@ -321,37 +505,12 @@ def delete_stock(request, stock_id):
 @login_required
 @super_admin_required
 def sales_report(request):
-    target_date = date.today()
-    start_date = date.today() - timedelta(days=7)
-    month_date = date.today().replace(day=1)
-    year_date = date.today().replace(month=1, day=1)
-    end_date = date.today()
-
-    #daily sales + profit
-    daily_sales = Sale.objects.filter(sale_date=target_date).aggregate(total_sales=Sum(models.F('unit_price') * models.F('quantity')))['total_sales']
-    daily_profit = Sale.objects.filter(sale_date=target_date).aggregate(total_profit=Sum(models.F('unit_price') * models.F('quantity')) - Sum(models.F('product__price') * models.F('quantity')))['total_profit']
-
-    #weekly sales and profit
-    weekly_sales = Sale.objects.filter(sale_date__range=[start_date, end_date]).aggregate(total_sales=Sum(models.F('unit_price') * models.F('quantity')))['total_sales']
-    weekly_profit = Sale.objects.filter(sale_date__range=[start_date, end_date]).aggregate(total_profit=Sum(models.F('unit_price') * models.F('quantity')) - Sum(models.F('product__price') * models.F('quantity')))['total_profit']
-
-    #monthly sales and profit
-    monthly_sales = Sale.objects.filter(sale_date__range=[month_date, end_date]).aggregate(total_sales=Sum(models.F('unit_price') * models.F('quantity')))['total_sales']
-    monthly_profit = Sale.objects.filter(sale_date__range=[month_date, end_date]).aggregate(total_profit=Sum(models.F('unit_price') * models.F('quantity')) - Sum(models.F('product__price') * models.F('quantity')))['total_profit']
-
-    #yearly sales and profits
-    yearly_sales = Sale.objects.filter(sale_date__range=[year_date, end_date]).aggregate(total_sales=Sum(models.F('unit_price') * models.F('quantity')))['total_sales']
-    yearly_profit = Sale.objects.filter(sale_date__range=[year_date, end_date]).aggregate(total_profit=Sum(models.F('unit_price') * models.F('quantity')) - Sum(models.F('product__price') * models.F('quantity')))['total_profit']
+    # Sales and profit for every period in a single pass over this year's sales
+    report = period_report(Sale.objects.all(), 'sale_date', sales=LINE_VALUE, profit=LINE_PROFIT)
 
     context = {
-        'daily_sales':daily_sales,
-        'daily_profit':daily_profit,
-        'weekly_sales':weekly_sales,
-        'weekly_profit':weekly_profit,
-        'monthly_sales':monthly_sales,
-        'monthly_profit':monthly_profit,
-        'yearly_sales':yearly_sales,
-        'yearly_profit':yearly_profit
+        'sales': report['sales'],
+        'profit': report['profit'],
     }
 
     return render(request, 'inventory/sales_reports.html', context)
@@ -362,35 +521,15 @@ def sales_report(request):
 @super_admin_required
 def purchase_report(request):
 
-    today = date.today()
+    # Retrieve the total monetary value for each store
+    store_totals = StoreSummary.objects.select_related('store')
 
-    # Calculate the start and end dates for the week
-    start_of_week = today - timedelta(days=today.weekday())
-    end_of_week = start_of_week + timedelta(days=6)
-
-        # Calculate the start and end dates for the month
-    start_of_month = date(today.year, today.month, 1)
-    end_of_month = date(today.year, today.month + 1, 1) - timedelta(days=1)
-
-        # Calculate the start and end dates for the year
-    start_of_year = date(today.year, 1, 1)
-    end_of_year = date(today.year, 12, 31)
-
-        # Retrieve the total monetary value for each store
-    store_totals = Purchase.objects.values('store').annotate(total=Sum('unit_price') * Sum('quantity'))
-
-        # Retrieve the total purchases for a day, week, month, and year
-    day_total = Purchase.objects.filter(purchase_date=today).aggregate(total=Sum('unit_price') * Sum('quantity'))
-    week_total = Purchase.objects.filter(purchase_date__range=(start_of_week, end_of_week)).aggregate(total=Sum('unit_price') * Sum('quantity'))
-    month_total = Purchase.objects.filter(purchase_date__range=(start_of_month, end_of_month)).aggregate(total=Sum('unit_price') * Sum('quantity'))
-    year_total = Purchase.objects.filter(purchase_date__range=(start_of_year, end_of_year)).aggregate(total=Sum('unit_price') * Sum('quantity'))
+    # Retrieve the total purchases for a day, week, month, and year
+    totals = StoreSummary.period_totals()
 
     context = {
             'store_totals': store_totals,
-            'day_total': day_total,
-            'week_total': week_total,
-            'month_total': month_total,
-            'year_total': year_total
+            'totals': totals,
         }    
 
     return render(request, 'inventory/sales_report.html', context)
@@ -400,27 +539,14 @@ def purchase_report(request):
 @super_admin_required
 def store_purchases(request):
     # Calculate total monetary value for each store
-    store_totals = Purchase.objects.values('store__name').annotate(total_value=Sum(F('quantity') * F('unit_price')))
+    store_totals = StoreSummary.objects.values('store__name', 'total_value')
 
     # Calculate total purchases for a day, week, month, and year
-    today = date.today()
-    day_total = Purchase.objects.filter(purchase_date=today).aggregate(total=Sum('quantity'))
-    week_start = today - timedelta(days=today.weekday())
-    week_end = week_start + timedelta(days=6)
-    week_total = Purchase.objects.filter(purchase_date__range=(week_start, week_end)).aggregate(total=Sum('quantity'))
-    month_start = today.replace(day=1)
-    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-    month_total = Purchase.objects.filter(purchase_date__range=(month_start, month_end)).aggregate(total=Sum('quantity'))
-    year_start = today.replace(month=1, day=1)
-    year_end = today.replace(month=12, day=31)
-    year_total = Purchase.objects.filter(purchase_date__range=(year_start, year_end)).aggregate(total=Sum('quantity'))
+    totals = StoreSummary.period_totals()
 
     context = {
         'store_totals': store_totals,
-        'day_total': day_total,
-        'week_total': week_total,
-        'month_total': month_total,
-        'year_total': year_total
+        'totals': totals,
     }
 
     return render(request, 'inventory/summary.html', context)
@@ -446,16 +572,14 @@ def store_purchases(request):
 @login_required
 @super_admin_required
 def inventory_value_report(request):
-    # Retrieve the total value of each product in stock
-    inventory = Stock.objects.annotate(
-        total_value=F('quantity') * F('product__price')
-    ).values('product__name', 'total_value')
+    # Retrieve the total value of each product in stock, at what it cost
+    inventory = Stock.objects.annotate(total_value=F('cost_value')).values('product__name', 'total_value')
 
     # Calculate the overall inventory value
-    total_inventory_value = Stock.objects.aggregate(
-        total_value=Sum(F('quantity') * F('product__price'))
-    )['total_value']
+    def total_inventory_value():
+        return Stock.objects.aggregate(total_value=Sum('cost_value'))['total_value']
 
+    # Both are only queried when the cached table is out of date.
     context = {
         'inventory': inventory,
         'total_inventory_value': total_inventory_value,
@@ -468,21 +592,32 @@ def inventory_value_report(request):
 @login_required
 @super_admin_required
 def sales_report_by_store(request):
-    stores = Store.objects.all()
-    data = []
-    
-    for store in stores:
-        sales = Sale.objects.filter(store=store)
-        total_quantity = sales.aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
-        total_revenue = sales.aggregate(total_revenue=Sum(F('quantity') * F('unit_price')))['total_revenue'] or 0
-        data.append({
+    # Totals precomputed by manage.py materialize_reports, as of its last run
+    stores = list(Store.objects.select_related('storereport').order_by('pk'))
+    if all(hasattr(store, 'storereport') for store in stores):
+        data = [{
             'store': store,
-            'total_quantity': total_quantity,
-            'total_revenue': total_revenue
-        })
-    
+            'total_quantity': store.storereport.sales_quantity,
+            'total_revenue': store.storereport.sales_value,
+            'report': store.storereport,
+        } for store in stores]
+        computed_at = min((store.storereport.computed_at for store in stores), default=None)
+    else:
+        # Not materialized for every store yet: one grouped query over all stores
+        stores = Store.objects.order_by('pk').annotate(
+            total_quantity=Sum('sale__quantity'),
+            total_revenue=Sum(F('sale__quantity') * F('sale__unit_price'), output_field=DecimalField()),
+        )
+        data = [{
+            'store': store,
+            'total_quantity': store.total_quantity or 0,
+            'total_revenue': store.total_revenue or 0,
+        } for store in stores]
+        computed_at = None
+
     context = {
-        'data': data
+        'data': data,
+        'computed_at': computed_at,
     }
     
     return render(request, 'inventory/sales_report_by_store.html', context)
@@ -492,22 +627,15 @@ def sales_report_by_store(request):
 @login_required
 @super_admin_required
 def product_stock_report(request):
-    # Retrieve all stores and their associated stock information
-# Retrieve the relevant data for the report
-    stock_items = Stock.objects.all()
-
-    # Pass the data to the template for rendering
-    return render(request, 'inventory/product_stock_report.html', {'stock_items': stock_items})
+    # Rows are loaded page by page from the stock listing API
+    stores = Store.objects.only('name')
+    return render(request, 'inventory/product_stock_report.html', {'stores': stores})
 
+@login_required
+@super_admin_required
+@ensure_csrf_cookie
 def supplier_purchase_history(request):
-    suppliers = Supplier.objects.all()
-    purchase_history = []
-
-    for supplier in suppliers:
-        purchases = Purchase.objects.filter(supplier=supplier)
-        purchase_history.append({
-            'supplier': supplier,
-            'purchases': purchases
-        })
+    # Purchases are loaded page by page from the listing API, filtered by supplier on the page
+    suppliers = Supplier.objects.only('name')
 
-    return render(request, 'inventory/supplier_purchase_history.html', {'purchase_history': purchase_history})
\ No newline at end of file
+    return render(request, 'inventory/supplier_purchase_history.html', {'suppliers': suppliers})
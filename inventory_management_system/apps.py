@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.contrib.staticfiles.apps import StaticFilesConfig as BaseStaticFilesConfig
+
+
+class StaticFilesConfig(BaseStaticFilesConfig):
+    """``django.contrib.staticfiles``, with collectstatic also skipping ``STATICFILES_IGNORE_PATTERNS``."""
+
+    def ready(self):
+        super().ready()
+        self.ignore_patterns = [*self.ignore_patterns, *getattr(settings, 'STATICFILES_IGNORE_PATTERNS', [])]
@@ -3,6 +3,19 @@ ASGI config for inventory_management_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server to run the async views under /async/
+concurrently (neither server is in requirements.txt):
+
+    pip install uvicorn
+    uvicorn inventory_management_system.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+    pip install daphne
+    daphne -b 0.0.0.0 -p 8000 inventory_management_system.asgi:application
+
+Run ``collectstatic`` first; WhiteNoise serves the static files as under
+WSGI. With several workers, use a shared cache backend and the
+sqlite-production or postgresql DATABASE_PROFILE.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
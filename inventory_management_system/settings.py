@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,7 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'inventory_management_system.apps.StaticFilesConfig',
     'inventory',
     'users',
     'crispy_forms',
@@ -48,6 +50,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'inventory.metrics.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,18 +61,29 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'inventory_management_system.urls'
 
+# Templates are compiled once per process by the cached loader, with DEBUG on
+# as well: runserver's autoreloader empties it when a template changes.
+# manage.py benchmark_templates compares it with compiling on every render.
+TEMPLATE_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventory.context_processors.fragment_cache',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
@@ -80,13 +94,121 @@ WSGI_APPLICATION = 'inventory_management_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+#
+# DATABASE_PROFILE picks the configuration without editing this file:
+#   sqlite             development default
+#   sqlite-production  WAL journaling, tuned pragmas, BEGIN IMMEDIATE and
+#                      persistent connections, for several tills writing at once
+#   postgresql         POSTGRES_* variables; needs psycopg installed. Set
+#                      POSTGRES_POOLER=pgbouncer behind a transaction pooler.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+# Seconds a connection is kept open between requests; health-checked on reuse.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+if DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite-production':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'inventory.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds to wait for a lock before "database is locked".
+                'timeout': 20,
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'busy_timeout': 20000,
+                    'cache_size': -64000,  # KiB
+                    'mmap_size': 256 * 1024 * 1024,
+                    'temp_store': 'MEMORY',
+                },
+            },
+        }
+    }
+elif DATABASE_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'inventory'),
+            'USER': os.environ.get('POSTGRES_USER', 'inventory'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # A transaction pooler may run each transaction on a different
+            # server connection, which breaks server-side cursors.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('POSTGRES_POOLER') == 'pgbouncer',
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}')
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# The ledger version (inventory.versioning) that cached pages, ETags and
+# report fragments are keyed on lives here. locmem is per process, so it
+# only suits a single worker: with several, or with management commands
+# writing to a live site, use a shared backend such as Redis or memcached.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory',
     }
 }
 
+# The homepage dashboard is cached until the next sale, purchase or stock
+# change, and for at most this many seconds.
+DASHBOARD_CACHE = 'default'
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Report tables cached with {% cache %} are keyed on the ledger version, so a
+# sale, purchase or stock change starts a new copy; old ones expire after this
+# many seconds.
+REPORT_FRAGMENT_TIMEOUT = 3600
+
+# How sales are costed against the purchase lots in stock: 'fifo' or
+# 'average'. Run manage.py recost_inventory after changing it.
+INVENTORY_COSTING = 'fifo'
+
+
+# Request instrumentation: samples kept in memory per process for the
+# /metrics/ report, and one JSON log line per request.
+REQUEST_METRICS_BUFFER_SIZE = 5000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventory.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'inventory.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -204,4 +326,28 @@ LOGIN_URL = 'login'
 LOGOUT_REDIRECT_URL = 'home'
 
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
\ No newline at end of file
+# collectstatic names files after a hash of their contents, which WhiteNoise
+# serves with a far-future immutable Cache-Control, and writes a gzip and
+# (with the Brotli package) a brotli copy of each for it to serve instead.
+# Only the hashed files are kept in STATIC_ROOT.
+STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
+
+# Vendor files no page loads, which collectstatic leaves out: the bootswatch
+# themes jazzmin is not set to use, GeoDjango's map widget images and, unless
+# it is shown, jazzmin's UI builder, which previews every theme. The
+# inventory.E001 check fails if a file jazzmin loads is left out. Check what
+# pages ship with manage.py static_weight.
+BOOTSWATCH_THEMES = [
+    "cerulean", "cosmo", "cyborg", "darkly", "default", "flatly", "journal", "litera", "lumen", "lux", "materia",
+    "minty", "pulse", "sandstone", "simplex", "sketchy", "slate", "solar", "spacelab", "superhero", "united", "yeti",
+]
+if JAZZMIN_SETTINGS.get("show_ui_builder"):
+    JAZZMIN_THEMES = set(BOOTSWATCH_THEMES)
+else:
+    JAZZMIN_THEMES = {JAZZMIN_UI_TWEAKS.get("theme", "default"), JAZZMIN_UI_TWEAKS.get("dark_mode_theme")}
+STATICFILES_IGNORE_PATTERNS = [
+    *(f"vendor/bootswatch/{theme}/*" for theme in BOOTSWATCH_THEMES if theme not in JAZZMIN_THEMES),
+    "admin/img/gis/*",
+    *([] if JAZZMIN_SETTINGS.get("show_ui_builder") else ["jazzmin/js/ui-builder.js"]),
+]
\ No newline at end of file
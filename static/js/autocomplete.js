@@ -0,0 +1,109 @@
+/*
+ * Autocomplete inputs backed by the search API.
+ *
+ *   <div data-autocomplete="/api/search/product/" data-price-field="unit_price">
+ *     <input type="search"> <input type="hidden" name="product"> <ul class="dropdown-menu"></ul>
+ *   </div>
+ *
+ * Typing fetches matching names, debounced; picking one stores its id in the
+ * hidden input. The form cannot be submitted until something is picked.
+ */
+
+(() => {
+  'use strict'
+
+  const DEBOUNCE_MS = 200
+  const NOT_PICKED = 'Pick one of the suggestions.'
+
+  document.querySelectorAll('[data-autocomplete]').forEach(widget => {
+    const input = widget.querySelector('input[type=search]')
+    const hidden = widget.querySelector('input[type=hidden]')
+    const menu = widget.querySelector('.dropdown-menu')
+    const priceField = widget.dataset.priceField && document.getElementById(widget.dataset.priceField)
+    let timer = null
+    let latest = 0
+    let active = -1
+
+    const items = () => menu.querySelectorAll('.dropdown-item')
+
+    const highlight = index => {
+      items().forEach((item, i) => item.classList.toggle('active', i === index))
+      active = index
+    }
+
+    const pick = result => {
+      input.value = result.name
+      hidden.value = result.id
+      input.setCustomValidity('')
+      if (priceField && result.price !== undefined && !priceField.value) {
+        priceField.value = result.price
+      }
+      menu.classList.remove('show')
+    }
+
+    const show = results => {
+      menu.replaceChildren(...results.map(result => {
+        const item = document.createElement('li')
+        const button = document.createElement('button')
+        button.type = 'button'
+        button.className = 'dropdown-item'
+        button.textContent = result.name
+        button.addEventListener('mousedown', event => event.preventDefault())
+        button.addEventListener('click', () => pick(result))
+        item.append(button)
+        return item
+      }))
+      if (!results.length) {
+        const item = document.createElement('li')
+        item.innerHTML = '<span class="dropdown-item-text text-muted">No matches</span>'
+        menu.append(item)
+      }
+      active = -1
+      menu.classList.add('show')
+    }
+
+    const fetchResults = () => {
+      const query = input.value.trim()
+      if (!query) {
+        menu.classList.remove('show')
+        return
+      }
+      // Responses can arrive out of order; only the newest is shown.
+      const request = ++latest
+      fetch(`${widget.dataset.autocomplete}?q=${encodeURIComponent(query)}`)
+        .then(response => response.json())
+        .then(data => {
+          if (request === latest) {
+            show(data.results || [])
+          }
+        })
+    }
+
+    input.setCustomValidity(NOT_PICKED)
+
+    input.addEventListener('input', () => {
+      hidden.value = ''
+      input.setCustomValidity(NOT_PICKED)
+      clearTimeout(timer)
+      timer = setTimeout(fetchResults, DEBOUNCE_MS)
+    })
+
+    input.addEventListener('keydown', event => {
+      const count = items().length
+      if (event.key === 'ArrowDown' && count) {
+        event.preventDefault()
+        highlight((active + 1) % count)
+      } else if (event.key === 'ArrowUp' && count) {
+        event.preventDefault()
+        highlight((active - 1 + count) % count)
+      } else if (event.key === 'Enter' && active >= 0) {
+        event.preventDefault()
+        items()[active].click()
+      } else if (event.key === 'Escape') {
+        menu.classList.remove('show')
+      }
+    })
+
+    input.addEventListener('blur', () => menu.classList.remove('show'))
+  })
+})()
@@ -1,53 +1,75 @@
 /* globals Chart:false, feather:false */
 
+/*
+ * Line chart of the time-series API.
+ *
+ *   <canvas id="activity" data-timeseries="/api/timeseries/" data-params="max_points=60"></canvas>
+ *   <select name="granularity" data-timeseries-filter="activity">...</select>
+ *
+ * Sales and purchase values are drawn against the left axis and units in
+ * stock against the right one, summed over the stores in the response. The
+ * browser revalidates with the ETag, so an unchanged ledger costs a 304.
+ */
+
 (() => {
-    'use strict'
-  
-    feather.replace({ 'aria-hidden': 'true' })
-  
-    // Graphs
-    const ctx = document.getElementById('myChart')
-    // eslint-disable-next-line no-unused-vars
-    const myChart = new Chart(ctx, {
+  'use strict'
+
+  feather.replace({ 'aria-hidden': 'true' })
+
+  const DATASETS = [
+    { key: 'sales', label: 'Sales', color: '#198754', axis: 'value' },
+    { key: 'purchases', label: 'Purchases', color: '#0d6efd', axis: 'value' },
+    { key: 'stock', label: 'Units in stock', color: '#fd7e14', axis: 'units' }
+  ]
+
+  const setup = canvas => {
+    const filters = document.querySelectorAll(`[data-timeseries-filter="${canvas.id}"]`)
+    const chart = new Chart(canvas, {
       type: 'line',
       data: {
-        labels: [
-          'Sunday',
-          'Monday',
-          'Tuesday',
-          'Wednesday',
-          'Thursday',
-          'Friday',
-          'Saturday'
-        ],
-        datasets: [{
-          data: [
-            15339,
-            21345,
-            18483,
-            24003,
-            23489,
-            24092,
-            12034
-          ],
+        labels: [],
+        datasets: DATASETS.map(dataset => ({
+          label: dataset.label,
+          data: [],
+          yAxisID: dataset.axis,
           lineTension: 0,
           backgroundColor: 'transparent',
-          borderColor: '#007bff',
-          borderWidth: 4,
-          pointBackgroundColor: '#007bff'
-        }]
+          borderColor: dataset.color,
+          borderWidth: 2,
+          pointRadius: 0
+        }))
       },
       options: {
         scales: {
-          yAxes: [{
-            ticks: {
-              beginAtZero: false
-            }
-          }]
-        },
-        legend: {
-          display: false
+          yAxes: [
+            { id: 'value', position: 'left', ticks: { beginAtZero: true } },
+            { id: 'units', position: 'right', ticks: { beginAtZero: true }, gridLines: { drawOnChartArea: false } }
+          ]
         }
       }
     })
-  })()
\ No newline at end of file
+
+    const load = () => {
+      const params = new URLSearchParams(canvas.dataset.params || '')
+      filters.forEach(filter => {
+        if (filter.value) {
+          params.set(filter.name, filter.value)
+        }
+      })
+      fetch(`${canvas.dataset.timeseries}?${params}`, { cache: 'no-cache' })
+        .then(response => response.json())
+        .then(data => {
+          chart.data.labels = data.labels
+          DATASETS.forEach((dataset, i) => {
+            chart.data.datasets[i].data = data.totals[dataset.key].map(Number)
+          })
+          chart.update()
+        })
+    }
+
+    filters.forEach(filter => filter.addEventListener('change', load))
+    load()
+  }
+
+  document.querySelectorAll('canvas[data-timeseries]').forEach(setup)
+})()
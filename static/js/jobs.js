@@ -0,0 +1,52 @@
+/*
+ * Background report jobs.
+ *
+ *   <button data-job="/jobs/export/supplier-purchases/">Prepare in background</button>
+ *
+ * A click POSTs to the data-job URL with the page's query string, then polls
+ * the job's status URL until the worker has finished. The button is replaced
+ * by a download link, or by the error when the job failed.
+ */
+
+(() => {
+  'use strict'
+
+  const POLL_MS = 2000
+
+  const csrfToken = () => {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/)
+    return match ? decodeURIComponent(match[1]) : ''
+  }
+
+  const poll = (button, job) => {
+    if (job.status === 'done') {
+      const link = document.createElement('a')
+      link.href = job.download
+      link.className = button.className
+      link.textContent = 'Download report'
+      button.replaceWith(link)
+    } else if (job.status === 'failed') {
+      button.textContent = 'Report failed'
+      button.title = job.error
+    } else {
+      button.textContent = job.status === 'running' ? 'Preparing…' : 'Queued…'
+      setTimeout(() => {
+        fetch(job.url, { cache: 'no-cache' })
+          .then(response => response.json())
+          .then(data => poll(button, data))
+      }, POLL_MS)
+    }
+  }
+
+  document.querySelectorAll('[data-job]').forEach(button => {
+    button.addEventListener('click', () => {
+      button.disabled = true
+      fetch(`${button.dataset.job}${window.location.search}`, {
+        method: 'POST',
+        headers: { 'X-CSRFToken': csrfToken() }
+      })
+        .then(response => response.json())
+        .then(job => poll(button, job))
+    })
+  })
+})()
@@ -0,0 +1,137 @@
+/*
+ * Incremental loading of report tables from the JSON listing API.
+ *
+ *   <table id="stock-table" data-listing="/api/stock/" data-params="store=1">
+ *     <thead><tr><th data-field="product_name">Product</th>...</tr></thead>
+ *     <tbody></tbody>
+ *   </table>
+ *   <button data-listing-more="stock-table">Load more</button>
+ *   <select name="store" data-listing-filter="stock-table">...</select>
+ *   <a href="/export/stock/" data-listing-export="stock-table">Download CSV</a>
+ *
+ * The filters are kept in the page's query string, which jobs.js sends with
+ * background exports, and in the query string of the data-listing-export
+ * links, so exports match the rows on screen.
+ *
+ * Header cells describe the columns: data-field is the row key ("#" for a row
+ * counter), data-format="number" adds thousands separators, and data-href
+ * turns the cell into a link labelled data-label, with the trailing "/0/" of
+ * the URL replaced by the row id.
+ */
+
+(() => {
+  'use strict'
+
+  const renderCell = (th, row, number) => {
+    const td = document.createElement('td')
+    const field = th.dataset.field
+    if (th.dataset.href) {
+      const link = document.createElement('a')
+      link.href = th.dataset.href.replace(/\/0\/$/, `/${row.id}/`)
+      link.className = th.dataset.class || ''
+      link.textContent = th.dataset.label || ''
+      td.appendChild(link)
+    } else if (field === '#') {
+      td.textContent = number
+    } else if (th.dataset.format === 'number') {
+      td.textContent = Number(row[field]).toLocaleString()
+    } else {
+      td.textContent = row[field]
+    }
+    return td
+  }
+
+  const setup = table => {
+    const body = table.tBodies[0]
+    const headers = Array.from(table.tHead.rows[0].cells)
+    const more = document.querySelector(`[data-listing-more="${table.id}"]`)
+    const filters = document.querySelectorAll(`[data-listing-filter="${table.id}"]`)
+    const exports = document.querySelectorAll(`[data-listing-export="${table.id}"]`)
+    let next = null
+    let count = 0
+    // Bumped by reload() so responses to earlier loads are dropped.
+    let generation = 0
+
+    const filterParams = () => {
+      const params = new URLSearchParams()
+      filters.forEach(filter => {
+        if (filter.value) {
+          params.set(filter.name, filter.value)
+        }
+      })
+      return params
+    }
+
+    const load = () => {
+      const started = generation
+      const params = new URLSearchParams(table.dataset.params || '')
+      filterParams().forEach((value, name) => params.set(name, value))
+      if (next) {
+        params.set('cursor', next)
+      }
+      if (more) {
+        // One page at a time, or the same cursor would be loaded twice.
+        more.disabled = true
+      }
+      return fetch(`${table.dataset.listing}?${params}`)
+        .then(response => response.json())
+        .then(data => {
+          if (started !== generation) {
+            return
+          }
+          data.results.forEach(row => {
+            count += 1
+            const tr = document.createElement('tr')
+            headers.forEach(th => tr.appendChild(renderCell(th, row, count)))
+            body.appendChild(tr)
+          })
+          next = data.next
+          if (more) {
+            more.hidden = !next
+            more.disabled = false
+          }
+        })
+    }
+
+    // Sets the filters in a query string, leaving its other parameters.
+    const withFilters = search => {
+      const params = new URLSearchParams(search)
+      filters.forEach(filter => params.delete(filter.name))
+      filterParams().forEach((value, name) => params.set(name, value))
+      const query = params.toString()
+      return query ? `?${query}` : ''
+    }
+
+    const showFilters = () => {
+      exports.forEach(link => {
+        link.search = withFilters(link.search)
+      })
+      window.history.replaceState(null, '', `${window.location.pathname}${withFilters(window.location.search)}`)
+    }
+
+    const reload = () => {
+      generation += 1
+      body.replaceChildren()
+      next = null
+      count = 0
+      showFilters()
+      load()
+    }
+
+    if (more) {
+      more.addEventListener('click', load)
+    }
+    // Filters start from the query string, e.g. after a refresh.
+    const initial = new URLSearchParams(window.location.search)
+    filters.forEach(filter => {
+      if (initial.has(filter.name)) {
+        filter.value = initial.get(filter.name)
+      }
+      filter.addEventListener('change', reload)
+    })
+    showFilters()
+    load()
+  }
+
+  document.querySelectorAll('table[data-listing]').forEach(setup)
+})()